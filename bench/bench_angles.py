@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Benchmark the array versions of angles.sep, angles.bear,
+angles.normalize, angles.fmt_angle and angles.phmsdms against a python
+loop over the scalar functions.
+
+Usage: python bench/bench_angles.py [npos ...]
+"""
+from __future__ import print_function, division
+
+import sys
+import math
+import timeit
+import warnings
+
+import numpy as np
+
+from evla_mcast import angles
+
+
+def main(sizes):
+    print('%8s %10s %12s %12s %8s' % ('npos', 'func', 'scalar_ms',
+                                       'array_ms', 'speedup'))
+    rng = np.random.RandomState(0)
+    for n in sizes:
+        a1 = rng.uniform(0, 2 * math.pi, n)
+        b1 = rng.uniform(-math.pi / 2, math.pi / 2, n)
+        a2 = rng.uniform(0, 2 * math.pi, n)
+        b2 = rng.uniform(-math.pi / 2, math.pi / 2, n)
+        x = rng.uniform(-1000, 1000, n)
+        la1, lb1, la2, lb2, lx = [v.tolist() for v in (a1, b1, a2, b2, x)]
+        strings = angles.fmt_angle_array(x, ':', ':', '')
+        cases = [
+            ('sep', lambda: [angles.sep(*v) for v in zip(la1, lb1, la2, lb2)],
+             lambda: angles.sep_array(a1, b1, a2, b2)),
+            ('bear',
+             lambda: [angles.bear(*v) for v in zip(la1, lb1, la2, lb2)],
+             lambda: angles.bear_array(a1, b1, a2, b2)),
+            ('normalize',
+             lambda: [angles.normalize(v, -180, 180) for v in lx],
+             lambda: angles.normalize_array(x, -180, 180)),
+            ('r2d', lambda: [angles.r2d(v) for v in la1],
+             lambda: angles.r2d(a1)),
+            ('fmt_angle',
+             lambda: [angles.fmt_angle(v, ':', ':') for v in lx],
+             lambda: angles.fmt_angle_array(x, ':', ':')),
+            ('phmsdms', lambda: [angles.phmsdms(s) for s in strings],
+             lambda: angles.phmsdms_array(strings)),
+        ]
+        for (name, scalar, array) in cases:
+            t_s = min(timeit.repeat(scalar, number=1, repeat=3))
+            t_a = min(timeit.repeat(array, number=1, repeat=3))
+            print('%8d %10s %12.3f %12.3f %8.1f' % (n, name, 1e3 * t_s,
+                                                    1e3 * t_a, t_s / t_a))
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    main([int(a) for a in sys.argv[1:]] or [1000, 100000])
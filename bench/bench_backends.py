@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Compare the 'objectify' and 'etree' ScanConfig backends.
+
+For each backend the test/data documents are parsed once, then the time
+is measured to construct a ScanConfig and read the properties a typical
+handle_config implementation uses (scan/source info, subbands and
+antennas).
+
+Usage: python bench/bench_backends.py [nloop]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import timeit
+
+from lxml import etree
+
+from evla_mcast.scan_config import ScanConfig
+from evla_mcast import backends
+
+_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'test', 'data')
+
+
+def load(backend):
+    docs = {}
+    for (name, fname) in (('obs', 'test_obs.xml'), ('vci', 'test_vci.xml'),
+                          ('ant', 'test_antprop.xml')):
+        with open(os.path.join(_data_dir, fname), 'rb') as f:
+            docs[name] = etree.fromstring(
+                f.read(), parser=backends.get_backend(backend).parsers[name])
+    return docs
+
+
+def use_config(docs, backend):
+    sc = ScanConfig(requires=['obs', 'vci', 'ant'], backend=backend, **docs)
+    (sc.scanId, sc.source, sc.ra_deg, sc.dec_deg, sc.startTime,
+     sc.startLST, sc.scan_intent, sc.listOfStations)
+    sc.get_subbands()
+    sc.get_antennas()
+    return sc
+
+
+def main(nloop):
+    print('%10s %12s' % ('backend', 'ms/config'))
+    for backend in ('objectify', 'etree'):
+        docs = load(backend)
+        t = min(timeit.repeat(lambda: use_config(docs, backend),
+                              number=nloop, repeat=5)) / nloop
+        print('%10s %12.3f' % (backend, 1e3 * t))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
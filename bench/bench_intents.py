@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Benchmark intent parsing for Observation documents with many intents.
+
+Compares the previous approach (ast.literal_eval of each quoted value on
+every ScanConfig, and conversion on every property access) with the
+cached, typed ScanIntents record now used by ScanConfig.
+
+Usage: python bench/bench_intents.py [nintent ...]
+"""
+from __future__ import print_function, division
+
+import os
+import ast
+import sys
+import timeit
+
+from lxml import objectify
+
+from evla_mcast import scan_config
+from evla_mcast.scan_config import ScanConfig
+from evla_mcast.mcast_clients import _obs_parser
+
+_test_obs = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'test', 'data', 'test_obs.xml')
+
+_props = ['observer', 'projid', 'scan_intent', 'otf', 'otf_rate_ra',
+          'nchan', 'npol', 'foldtime', 'timeres', 'searchdm', 'raw_format']
+
+
+def make_obs(nintent, scanNo=1):
+    with open(_test_obs, 'rb') as f:
+        obs = f.read()
+    intents = [b'<intent>ScanIntent="OBSERVE_TARGET"</intent>',
+               b'<intent>ObserverName="A. Observer"</intent>',
+               b'<intent>PsrNumChan=64</intent>',
+               b'<intent>AntennaRaRate="0.25"</intent>']
+    intents += [('<intent>Extra%d="value %d"</intent>' % (i, i)).encode()
+                for i in range(nintent - len(intents))]
+    obs = obs.replace(b'<intent>ScanIntent="SYSTEM_CONFIGURATION"</intent>'
+                      b'<intent>VLITE_OFF=0</intent>', b''.join(intents))
+    obs = obs.replace(b'<scanNo>1</scanNo>',
+                      ('<scanNo>%d</scanNo>' % scanNo).encode())
+    return objectify.fromstring(obs, parser=_obs_parser)
+
+
+def legacy_parse(obs):
+    d = {}
+    for item in obs.intent:
+        k, v = str(item).split("=")
+        if v[0] == "'" or v[0] == '"':
+            d[k] = ast.literal_eval(v)
+        else:
+            d[k] = v
+    return d
+
+
+def legacy_props(d):
+    return (d.get("ObserverName", "Unknown"), d.get("ProjectID", "Unknown"),
+            d.get("ScanIntent", "None"), d.get("OTF", "0") == "1",
+            float(d.get("AntennaRaRate", "0").strip('"')),
+            int(d.get("PsrNumChan", 32)), int(d.get("PsrNumPol", 4)),
+            float(d.get("PsrFoldIntTime", 10.0)),
+            float(d.get("PsrSearchTimeRes", 1e-3)),
+            float(d.get("PsrSearchDM", 0.0)), d.get("PsrRawFormat", "GUPPI"))
+
+
+def new_props(sc):
+    return tuple(getattr(sc, p) for p in _props)
+
+
+def main(sizes, nscan=50):
+    print('%8s %14s %14s' % ('nintent', 'legacy_us', 'cached_us'))
+    for nintent in sizes:
+        # An SB: nscan scans with identical intents, each read 10 times
+        obs = [make_obs(nintent, i + 1) for i in range(nscan)]
+
+        def legacy():
+            for o in obs:
+                d = legacy_parse(o)
+                for i in range(10):
+                    legacy_props(d)
+
+        def cached():
+            scan_config._intent_cache.clear()
+            for o in obs:
+                sc = ScanConfig(obs=o)
+                for i in range(10):
+                    new_props(sc)
+
+        assert legacy_props(legacy_parse(obs[0])) == \
+            new_props(ScanConfig(obs=obs[0]))
+        t_old = min(timeit.repeat(legacy, number=5, repeat=3)) / 5 / nscan
+        t_new = min(timeit.repeat(cached, number=5, repeat=3)) / 5 / nscan
+        print('%8d %14.1f %14.1f' % (nintent, 1e6 * t_old, 1e6 * t_new))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [4, 20, 100])
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""Datagram loss of the multicast clients under load.
+
+A sender process (simulate.Simulator) sends synthetic SBs over loopback
+multicast at increasing rates and burst sizes, and a Controller in this
+process receives them.  For each receive mode and socket buffer size the
+number of documents that reached Controller.add_obs/add_ant is compared
+with the number sent, and the loss curve and saturation point (highest
+offered rate without loss) are printed.  Kernel drops (UDP RcvbufErrors
+from /proc/net/snmp) are shown where available.
+
+Receive modes:
+  plain       parse obs and ant documents only (use_configUrl off, the
+              VCIs are given to the Controller beforehand)
+  timestamps  as plain, with kernel receive timestamps
+  configUrl   also fetch and parse each VCI from the simulator's server
+  stream_vci  as configUrl, with the streaming VCI loader
+
+Runs on a single Linux host with no external network; nothing leaves the
+loopback interface.
+
+Usage: python bench/bench_mcast_stress.py [ndoc] [mode ...]
+"""
+from __future__ import print_function, division
+
+import sys
+import time
+import asyncore
+import multiprocessing
+
+from lxml import objectify
+
+from evla_mcast import mcast_clients
+from evla_mcast.controller import Controller
+from evla_mcast.simulate import SBGenerator, Simulator
+
+_group = '239.192.3.251'
+_obs_port = 53240
+_ant_port = 53241
+
+modes = dict(plain=dict(use_configUrl=False),
+             timestamps=dict(use_configUrl=False, timestamps=True),
+             configUrl=dict(),
+             stream_vci=dict(stream_vci=True))
+rates = [100, 300, 1000, 3000, 10000, None]  # documents/s, None = no limit
+bursts = [1, 10, 100]
+rcvbufs = [None, 1 << 16, 1 << 22]
+
+
+def sb_events(ndoc, url=None):
+    # SBs of 20 scans (21 obs and one ant document each)
+    gen = SBGenerator(nant=27, nsubband=8)
+    if url is not None:
+        gen.url = url
+    return gen.sbs(nsubarray=max(1, ndoc // 22), nscan=20)
+
+
+class CountingController(Controller):
+
+    def __init__(self, ndoc, use_configUrl=True, **kwargs):
+        Controller.__init__(self, obs_group=_group, obs_port=_obs_port,
+                            ant_group=_group, ant_port=_ant_port,
+                            interface='127.0.0.1', **kwargs)
+        self.obs_client.use_configUrl = use_configUrl
+        if not use_configUrl:
+            for (t, kind, configId, doc) in sb_events(ndoc):
+                if kind == 'vci':
+                    self.add_vci(objectify.fromstring(
+                        doc, parser=mcast_clients._vci_parser))
+        self.nobs = 0
+        self.nant = 0
+
+    def add_obs(self, obs, recv_time=None):
+        self.nobs += 1
+        Controller.add_obs(self, obs, recv_time=recv_time)
+
+    def add_ant(self, ant, recv_time=None):
+        self.nant += 1
+        Controller.add_ant(self, ant, recv_time=recv_time)
+
+    def close(self):
+        self.obs_client.close()
+        self.ant_client.close()
+
+
+def udp_rcvbuf_errors():
+    # Kernel count of UDP datagrams dropped for lack of buffer space.
+    try:
+        with open('/proc/net/snmp') as f:
+            lines = [l.split() for l in f if l.startswith('Udp:')]
+        return int(lines[1][lines[0].index('RcvbufErrors')])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+
+
+def sender(ndoc, rate, burst, ready, go, done, results):
+    gen = SBGenerator()
+    sim = Simulator(gen, obs_group=_group, obs_port=_obs_port,
+                    ant_group=_group, ant_port=_ant_port, rate=rate,
+                    burst=burst).start()
+    events = sb_events(ndoc, url=gen.url)
+    ready.set()
+    go.wait()
+    elapsed = sim.send(events)
+    results.put((sim.sent['obs'] + sim.sent['ant'], elapsed))
+    done.wait()  # keep serving VCIs until the receiver has drained
+    sim.close()
+
+
+def run(mode, rcvbuf, burst, rate, ndoc, quiet=0.5):
+    ctrl = CountingController(ndoc, rcvbuf=rcvbuf, **modes[mode])
+    ready = multiprocessing.Event()
+    go = multiprocessing.Event()
+    done = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=sender,
+                                   args=(ndoc, rate, burst, ready, go, done,
+                                         results))
+    proc.start()
+    ready.wait()
+    drops0 = udp_rcvbuf_errors()
+    go.set()
+    t0 = time.time()
+    sent = None
+    last = (0, time.time())
+    while True:
+        asyncore.loop(timeout=0.01, count=1)
+        n = ctrl.nobs + ctrl.nant
+        if n != last[0]:
+            last = (n, time.time())
+        if sent is None and not results.empty():
+            (sent, elapsed) = results.get()
+        if sent is not None and (n >= sent or time.time() - last[1] > quiet):
+            break
+    t_recv = last[1] - t0
+    done.set()
+    proc.join()
+    drops1 = udp_rcvbuf_errors()
+    ctrl.close()
+    received = ctrl.nobs + ctrl.nant
+    return dict(mode=mode, rcvbuf=ctrl.obs_client.rcvbuf, burst=burst,
+                rate=rate, sent=sent, received=received,
+                loss=1.0 - received / float(sent),
+                drops=None if drops0 is None else drops1 - drops0,
+                send_rate=sent / elapsed if elapsed else float('inf'),
+                recv_rate=received / t_recv if t_recv > 0 else float('inf'))
+
+
+def main(ndoc=2000, *names):
+    ndoc = int(ndoc)
+    names = names or sorted(modes)
+    print('%-10s %8s %5s %6s %6s %6s %7s %6s %9s %9s' % (
+        'mode', 'rcvbuf', 'burst', 'rate', 'sent', 'recv', 'loss%', 'drops',
+        'send/s', 'recv/s'))
+    for mode in names:
+        for rcvbuf in rcvbufs:
+            for burst in bursts:
+                saturation = None
+                for rate in rates:
+                    r = run(mode, rcvbuf, burst, rate, ndoc)
+                    print('%-10s %8d %5d %6s %6d %6d %7.2f %6s %9.0f %9.0f' % (
+                        r['mode'], r['rcvbuf'], r['burst'],
+                        r['rate'] or 'max', r['sent'], r['received'],
+                        100 * r['loss'],
+                        '-' if r['drops'] is None else r['drops'],
+                        r['send_rate'], r['recv_rate']))
+                    sys.stdout.flush()
+                    if r['loss'] > 0:
+                        break
+                    saturation = r['send_rate']
+                if r['loss'] == 0:
+                    result = 'no loss up to %.0f docs/s' % saturation
+                elif saturation is None:
+                    result = 'loss at all rates'
+                else:
+                    result = '%.0f docs/s' % saturation
+                print('%-10s %8d %5d saturation: %s' % (mode, r['rcvbuf'],
+                                                         burst, result))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Time to restore a Controller from its checkpoint journal.
+
+A journal is written for ndataset live SBs of nscan scans each (using
+the test/data documents), then a new Controller (without sockets) is
+created and restored from it.  The time to write the journal (with and
+without fsync on every record) and the restart-to-ready time are
+printed.
+
+Usage: python bench/bench_restart.py [nscan ...]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import shutil
+import timeit
+import tempfile
+
+from lxml import objectify
+
+from evla_mcast import mcast_clients
+from evla_mcast.controller import Controller
+
+_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'test', 'data')
+
+
+def read(name):
+    with open(os.path.join(_data_dir, name), 'rb') as f:
+        return f.read()
+
+
+def documents(ndataset, nscan):
+    # Parsed (kind, doc) in arrival order.
+    docs = [('vci', objectify.fromstring(read('test_vci.xml'),
+                                         parser=mcast_clients._vci_parser))]
+    obs = read('test_obs.xml')
+    ant = read('test_antprop.xml')
+    for d in range(ndataset):
+        dsid = b'L_realfast.57897.87981900463.ds%d' % d
+        docs.append(('ant', objectify.fromstring(
+            ant.replace(b'L_realfast.57897.87981900463', dsid),
+            parser=mcast_clients._ant_parser)))
+    for i in range(nscan):
+        for d in range(ndataset):
+            dsid = b'L_realfast.57897.87981900463.ds%d"' % d
+            data = obs.replace(b'L_realfast.57897.87981900463"', dsid)
+            data = data.replace(b'<scanNo>1</scanNo>',
+                                b'<scanNo>%d</scanNo>' % (i + 1))
+            data = data.replace(b'startTime="57897.87983680556"',
+                                b'startTime="%.10f"' % (57897.9 + i * 1e-3))
+            docs.append(('obs', objectify.fromstring(
+                data, parser=mcast_clients._obs_parser)))
+    return docs
+
+
+def write(path, docs, sync_interval):
+    if os.path.exists(path):
+        os.unlink(path)
+    ctrl = Controller(listen=False, checkpoint=path)
+    ctrl.checkpoint.sync_interval = sync_interval
+    for (kind, doc) in docs:
+        getattr(ctrl, 'add_' + kind)(doc)
+    ctrl.checkpoint.close()
+
+
+def restore(path):
+    ctrl = Controller(listen=False, checkpoint=path)
+    ctrl.restore()
+    return ctrl
+
+
+def main(sizes, ndataset=4):
+    print('%7s %7s %10s %12s %12s %12s' % (
+        'nscan', 'ndoc', 'size_kB', 'write_ms', 'fsync_ms', 'restore_ms'))
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'ctrl.ckpt')
+    try:
+        for nscan in sizes:
+            docs = documents(ndataset, nscan)
+            t_write = min(timeit.repeat(lambda: write(path, docs, None),
+                                        number=1, repeat=3))
+            t_fsync = min(timeit.repeat(lambda: write(path, docs, 0),
+                                        number=1, repeat=1))
+            t_restore = min(timeit.repeat(lambda: restore(path), number=1,
+                                          repeat=3))
+            ctrl = restore(path)
+            assert sum(len(ds.handled) + len(ds.queued)
+                       for ds in ctrl._datasets.values()) == nscan * ndataset
+            print('%7d %7d %10.1f %12.1f %12.1f %12.1f' % (
+                nscan, len(docs), os.path.getsize(path) / 1e3,
+                1e3 * t_write, 1e3 * t_fsync, 1e3 * t_restore))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [10, 100, 500])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Time of "active at t" and "next start" queries.
+
+nscan scans of ndataset interleaved datasets are indexed, and the
+ScanIndex queries are compared with looping over every dataset's scan
+lists (what was needed before the index existed).
+
+Usage: python bench/bench_scan_index.py [nscan] [ndataset]
+"""
+from __future__ import print_function, division
+
+import sys
+import timeit
+
+import numpy as np
+
+from evla_mcast.scan_index import ScanIndex
+
+
+class Scan(object):
+    def __init__(self, startTime, stopTime):
+        self.startTime = startTime
+        self.stopTime = stopTime
+
+    @property
+    def subscans(self):
+        return [self]
+
+
+def make(nscan, ndataset):
+    rng = np.random.RandomState(0)
+    datasets = [[] for i in range(ndataset)]
+    for d in range(ndataset):
+        t = rng.uniform(0, 0.01)
+        for i in range(nscan // ndataset):
+            dt = rng.uniform(5, 300) / 86400.0
+            datasets[d].append(Scan(t, t + dt))
+            t += dt
+        datasets[d][-1].stopTime = None
+    return datasets
+
+
+def loop_active(datasets, t):
+    return [s for ds in datasets for s in ds if s.startTime <= t and
+            (s.stopTime is None or s.stopTime > t)]
+
+
+def loop_next(datasets, t):
+    later = [s for ds in datasets for s in ds if s.startTime > t]
+    return min(later, key=lambda s: s.startTime) if later else None
+
+
+def main(nscan=10000, ndataset=10):
+    datasets = make(int(nscan), int(ndataset))
+    index = ScanIndex()
+    t = timeit.default_timer()
+    for ds in datasets:
+        for s in ds:
+            index.add(s)
+    t_build = timeit.default_timer() - t
+    tmax = max(s.startTime for ds in datasets for s in ds)
+    times = np.random.RandomState(1).uniform(0, tmax, 200)
+    nloop = len(times)
+    print('%d scans in %d datasets, index built in %.1f ms' % (
+        len(index), len(datasets), 1e3 * t_build))
+    for (name, f) in (('active (loop)', lambda t: loop_active(datasets, t)),
+                      ('active (index)', index.active),
+                      ('next_start (loop)', lambda t: loop_next(datasets, t)),
+                      ('next_start (index)', index.next_start)):
+        dt = min(timeit.repeat(lambda: [f(t) for t in times], number=1,
+                               repeat=3)) / nloop
+        print('%-20s %10.2f us/query' % (name, 1e6 * dt))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Time and size of ScanConfig serialization.
+
+Compares pickling a ScanConfig (which sends the raw XML of its
+documents, see ScanConfig.to_state) and its JSON form against pickling
+the parsed objectify documents themselves, which is what the default
+pickling of the ScanConfig attributes amounted to.  Deserialization is
+timed both for a worker seeing the configuration for the first time
+('cold', VCI and antenna table parsed) and for later scans of the same
+configuration ('warm', parsed documents reused).
+
+Usage: python bench/bench_serialize.py [nloop]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import pickle
+import timeit
+
+from evla_mcast import scan_config
+from evla_mcast.scan_config import ScanConfig
+
+_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'test', 'data')
+
+
+def make_config(backend):
+    return ScanConfig(vci=os.path.join(_data_dir, 'test_vci.xml'),
+                      obs=os.path.join(_data_dir, 'test_obs.xml'),
+                      ant=os.path.join(_data_dir, 'test_antprop.xml'),
+                      requires=['obs', 'vci', 'ant'], backend=backend)
+
+
+def cold(loads, data):
+    scan_config._state_docs.clear()
+    return loads(data)
+
+
+def main(nloop=200):
+    print('%-22s %10s %10s %10s %10s' % ('method', 'bytes', 'dump_us',
+                                         'cold_us', 'warm_us'))
+
+    def report(name, dumps, loads, obj):
+        data = dumps(obj)
+        t_dump = min(timeit.repeat(lambda: dumps(obj), number=nloop,
+                                   repeat=3)) / nloop
+        t_cold = min(timeit.repeat(lambda: cold(loads, data), number=nloop,
+                                   repeat=3)) / nloop
+        t_warm = min(timeit.repeat(lambda: loads(data), number=nloop,
+                                   repeat=3)) / nloop
+        print('%-22s %10d %10.1f %10.1f %10.1f' % (
+            name, len(data), 1e6 * t_dump, 1e6 * t_cold, 1e6 * t_warm))
+
+    sc = make_config('objectify')
+    docs = dict(vci=sc.vci, obs=sc.obs, ant=sc.ant)
+    report('objectify docs', pickle.dumps, pickle.loads, docs)
+    for backend in ('objectify', 'etree'):
+        sc = make_config(backend)
+        report('pickle (%s)' % backend, lambda o: pickle.dumps(o, -1),
+               pickle.loads, sc)
+    report('json (etree)', ScanConfig.to_json, ScanConfig.from_json, sc)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Compare cone search and nearest neighbour queries with a SkyIndex
+against a scan of the whole catalog with angles.sep_array, and the time
+to build the index versus loading it from disk.
+
+Usage: python bench/bench_spatial.py [ncat ...]
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import math
+import timeit
+import tempfile
+
+import numpy as np
+
+from evla_mcast import angles
+from evla_mcast.spatial import SkyIndex
+
+
+def main(sizes, radius=math.radians(0.5), nquery=200):
+    print('%9s %10s %10s %10s %10s %10s %10s' % (
+        'ncat', 'build_ms', 'load_ms', 'scan_us', 'cone_us', 'nn_us',
+        'nmatch'))
+    rng = np.random.RandomState(0)
+    qra = rng.uniform(0, 2 * math.pi, nquery)
+    qdec = np.arcsin(rng.uniform(-1, 1, nquery))
+    for n in sizes:
+        ra = rng.uniform(0, 2 * math.pi, n)
+        dec = np.arcsin(rng.uniform(-1, 1, n))
+        t_build = min(timeit.repeat(lambda: SkyIndex(ra, dec), number=1,
+                                    repeat=3))
+        index = SkyIndex(ra, dec)
+        fname = os.path.join(tempfile.mkdtemp(), 'index.npz')
+        index.save(fname)
+        t_load = min(timeit.repeat(lambda: SkyIndex.load(fname), number=1,
+                                   repeat=3))
+        os.unlink(fname)
+
+        def scan():
+            for (a, b) in zip(qra, qdec):
+                np.nonzero(angles.sep_array(a, b, ra, dec) <= radius)
+
+        def cone():
+            return sum(len(index.cone_search(a, b, radius)[0])
+                       for (a, b) in zip(qra, qdec))
+
+        def nearest():
+            for (a, b) in zip(qra, qdec):
+                index.nearest(a, b)
+
+        t_scan = min(timeit.repeat(scan, number=1, repeat=3)) / nquery
+        t_cone = min(timeit.repeat(cone, number=1, repeat=3)) / nquery
+        t_nn = min(timeit.repeat(nearest, number=1, repeat=3)) / nquery
+        print('%9d %10.1f %10.1f %10.1f %10.1f %10.1f %10.2f' % (
+            n, 1e3 * t_build, 1e3 * t_load, 1e6 * t_scan, 1e6 * t_cone,
+            1e6 * t_nn, cone() / nquery))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [10000, 1000000])
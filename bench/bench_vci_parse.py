@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Compare VCI parse time and peak memory for objectify.fromstring and
+the streaming vci_stream.parse_vci loader.
+
+Large VCIs are synthesized from test/data/test_vci.xml by adding VDIF
+output to every subband and repeating the stationInputOutput element
+(as for per-station overrides), and the baseBand subbands.  Note the
+objectify timings include schema validation, which the streaming loader
+does not do.
+
+Usage: python bench/bench_vci_parse.py [nsio ...]
+"""
+from __future__ import print_function, division
+
+import os
+import re
+import sys
+import timeit
+import tempfile
+import subprocess
+
+_test_vci = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'test', 'data', 'test_vci.xml')
+
+_vdif = (b'<ns2:summedArray sid="1"><ns2:vdif stationId="1" '
+         b'aDestIP="10.80.200.201" bDestIP="10.80.200.202"/>'
+         b'</ns2:summedArray></ns2:subBand>')
+
+
+def make_vci(nsio, nsub_repeat=2):
+    """Return a VCI document with nsio stationInputOutput elements."""
+    with open(_test_vci, 'rb') as f:
+        vci = f.read()
+    vci = vci.replace(b'</ns2:subBand>', _vdif)
+    # Repeat the subbands within each baseband (up to 18 allowed)
+    bb_re = re.compile(br'(<ns2:baseBand [^>]*>)(.*?)(</ns2:baseBand>)',
+                       re.S)
+    vci = bb_re.sub(lambda m: m.group(1) + m.group(2) * nsub_repeat
+                    + m.group(3), vci)
+    sio_re = re.compile(br'<ns2:stationInputOutput sid="all">.*?'
+                        br'</ns2:stationInputOutput>', re.S)
+    sio = sio_re.search(vci).group(0)
+    extra = [sio.replace(b'sid="all"', ('sid="%d"' % (i % 27 + 1)).encode())
+             for i in range(nsio - 1)]
+    return sio_re.sub(lambda m: sio + b''.join(extra), vci)
+
+
+_mem_script = '''
+import sys
+from lxml import objectify
+from evla_mcast import vci_stream
+from evla_mcast.mcast_clients import _vci_parser
+
+def status_kb(key):
+    for line in open('/proc/self/status'):
+        if line.startswith(key + ':'):
+            return int(line.split()[1])
+
+data = open(sys.argv[2], 'rb').read()
+# Reset the peak RSS counter (Linux >= 4.0)
+with open('/proc/self/clear_refs', 'w') as f:
+    f.write('5')
+before = status_kb('VmRSS')
+if sys.argv[1] == 'objectify':
+    vci = objectify.fromstring(data, parser=_vci_parser)
+else:
+    vci = vci_stream.parse_vci(data)
+print(status_kb('VmHWM') - before)
+'''
+
+
+def peak_kb(method, fname):
+    """Peak RSS increase (kB) while parsing, measured in a fresh process.
+    Linux only."""
+    out = subprocess.check_output([sys.executable, '-W', 'ignore', '-c',
+                                   _mem_script, method, fname])
+    return int(out.strip())
+
+
+def main(sizes):
+    from lxml import objectify
+    from evla_mcast import vci_stream
+    from evla_mcast.mcast_clients import _vci_parser
+
+    print('%6s %10s %12s %12s %12s %12s' % ('nsio', 'size_kB', 'obj_ms',
+                                            'stream_ms', 'obj_kB',
+                                            'stream_kB'))
+    for nsio in sizes:
+        data = make_vci(nsio)
+        nrep = max(1, int(200 / nsio))
+        t_obj = min(timeit.repeat(
+            lambda: objectify.fromstring(data, parser=_vci_parser),
+            number=nrep, repeat=3)) / nrep
+        t_str = min(timeit.repeat(lambda: vci_stream.parse_vci(data),
+                                  number=nrep, repeat=3)) / nrep
+        with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+            f.write(data)
+            f.flush()
+            m_obj = peak_kb('objectify', f.name)
+            m_str = peak_kb('stream', f.name)
+        print('%6d %10.1f %12.3f %12.3f %12d %12d' % (
+            nsio, len(data) / 1024.0, 1e3 * t_obj, 1e3 * t_str,
+            m_obj, m_str))
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1, 10, 50, 200]
+    main(sizes)
@@ -55,6 +55,22 @@ angles are normalized i.e., [0, 360.0) or [0, 2pi) or [0, 24.0). The
 other method normalizes angles in the manner that latitudinal angles
 are normalized i.e., [-90, 90] or [-pi/2, pi2].
 
+The unit conversion functions (`r2d`, `d2r`, `h2r` etc.) accept NumPy
+arrays as well as scalars. `normalize_array`, `sep_array` and
+`bear_array` are array versions of `normalize`, `sep` and `bear` that
+broadcast over their arguments. `normalize_array` gives results
+identical to calling `normalize` element by element; `sep_array` and
+`bear_array` agree with `sep` and `bear` to within a few units in the
+last place (NumPy's arctan2 may round differently from math.atan2).
+
+`AngleArray`, `AlphaAngleArray`, `DeltaAngleArray` and `PositionArray`
+are array counterparts of the classes, holding N angles or positions in
+contiguous float64 arrays (in radians) instead of one object each.
+They provide the same unit attributes and normalization, sexagesimal
+parts and strings in bulk (see `deci2sexa_array`), and separations
+between all pairs of positions. `fmt_angle_array` and `phmsdms_array`
+format and parse many sexagesimal strings at a time.
+
 See docstrings of classes and functions for documentation and examples.
 
 :author: Prasanth Nair
@@ -65,15 +81,23 @@ import warnings
 import math
 import re
 
+import numpy as np
+
+# Same constants as used by math.degrees() and math.radians(), so that
+# r2d and d2r give identical results for scalars and also work with
+# NumPy arrays.
+_R2D = 180.0 / math.pi
+_D2R = math.pi / 180.0
+
 
 def r2d(r):
     """Convert radians into degrees."""
-    return math.degrees(r)
+    return r * _R2D
 
 
 def d2r(d):
     """Convert degrees into radians."""
-    return math.radians(d)
+    return d * _D2R
 
 
 def h2d(h):
@@ -536,7 +560,7 @@ def fmt_angle(val, s1=" ", s2=" ", s3=" ", pre=3, trunc=False,
         n = normalize(val, lower=lower, upper=upper, b=b)
 
     x = deci2sexa(n, pre=pre, trunc=trunc, lower=lower, upper=upper,
-                  upper_trim=upper_trim)
+                  b=b, upper_trim=upper_trim)
 
     p = "{3:0" + "{0}.{1}".format(pre + 3, pre) + "f}" + s3
     p = "{0}{1:02d}" + s1 + "{2:02d}" + s2 + p
@@ -544,6 +568,19 @@ def fmt_angle(val, s1=" ", s2=" ", s3=" ", pre=3, trunc=False,
     return p.format("-" if x[0] < 0 else "+", *x[1:])
 
 
+# Floating point regex:
+# http://www.regular-expressions.info/floatingpoint.html
+#
+# _sexa_pattern1: find a decimal number (int or float) and any
+# characters following it upto the next decimal number.  [^0-9\-+]* =>
+# keep gathering elements until we get to a digit, a - or a +. These
+# three indicates the possible start of the next number.
+_sexa_pattern1 = re.compile(r"([-+]?[0-9]*\.?[0-9]+[^0-9\-+]*)")
+
+# _sexa_pattern2: find decimal number (int or float) in string.
+_sexa_pattern2 = re.compile(r"([-+]?[0-9]*\.?[0-9]+)")
+
+
 def phmsdms(hmsdms):
     """Parse a string containing a sexageismal number.
 
@@ -631,17 +668,8 @@ def phmsdms(hmsdms):
     """
     units = None
     sign = None
-    # Floating point regex:
-    # http://www.regular-expressions.info/floatingpoint.html
-    #
-    # pattern1: find a decimal number (int or float) and any
-    # characters following it upto the next decimal number.  [^0-9\-+]*
-    # => keep gathering elements until we get to a digit, a - or a
-    # +. These three indicates the possible start of the next number.
-    pattern1 = re.compile(r"([-+]?[0-9]*\.?[0-9]+[^0-9\-+]*)")
-
-    # pattern2: find decimal number (int or float) in string.
-    pattern2 = re.compile(r"([-+]?[0-9]*\.?[0-9]+)")
+    pattern1 = _sexa_pattern1
+    pattern2 = _sexa_pattern2
 
     hmsdms = hmsdms.lower()
     hdlist = pattern1.findall(hmsdms)
@@ -711,8 +739,9 @@ def phmsdms(hmsdms):
             units = "degrees"
 
     # Find sign. Only the first identified part can have a -ve sign.
+    # copysign so that "-00 30 00" is negative.
     for i in parts:
-        if i and i < 0.0:
+        if i is not None and math.copysign(1.0, i) < 0.0:
             if sign is None:
                 sign = -1
             else:
@@ -893,6 +922,298 @@ def bear(a1, b1, a2, b2):
         return x
 
 
+def normalize_array(num, lower=0, upper=360, b=False):
+    """Normalize an array of numbers to range [lower, upper) or
+    [lower, upper].
+
+    Array version of `normalize`, which see for the meaning of the
+    arguments. Returns a float64 array with the shape of `num`.
+
+    Examples
+    --------
+    >>> normalize_array([-270, 181, 180], -180, 180)
+    array([  90., -179., -180.])
+    >>> normalize_array([-100, 100, 181], -90, 90, b=True)
+    array([-80.,  80.,  -1.])
+    """
+    num = np.array(num, dtype=np.float64)
+    if not b:
+        if lower >= upper:
+            raise ValueError("Invalid lower and upper limits: (%s, %s)" %
+                             (lower, upper))
+        rng = abs(lower) + abs(upper)
+        num = np.where((num > upper) | (num == lower),
+                       lower + np.abs(num + upper) % rng, num)
+        num = np.where((num < lower) | (num == upper),
+                       upper - np.abs(num - lower) % rng, num)
+        num = np.where(num == upper, float(lower), num)
+    else:
+        total_length = abs(lower) + abs(upper)
+        num = np.where(num < -total_length,
+                       num + np.ceil(num / (-2 * total_length))
+                       * 2 * total_length, num)
+        num = np.where(num > total_length,
+                       num - np.floor(num / (2 * total_length))
+                       * 2 * total_length, num)
+        num = np.where(num > upper, total_length - num, num)
+        num = np.where(num < lower, -total_length - num, num)
+
+    return num
+
+
+def _from_s_array(alpha, delta):
+    # Unit Cartesian vectors, as CartesianVector.from_s(1.0, alpha, delta)
+    cd = 1.0 * np.cos(delta)
+    return (cd * np.cos(alpha), cd * np.sin(alpha), 1.0 * np.sin(delta))
+
+
+def _cross_array(x1, y1, z1, x2, y2, z2):
+    # As CartesianVector.cross
+    return (y1 * z2 - z1 * y2,
+            - (x1 * z2 - z1 * x2),
+            x1 * y2 - y1 * x2)
+
+
+def _mod_array(x, y, z):
+    return np.sqrt(x ** 2 + y ** 2 + z ** 2)
+
+
+def sep_array(a1, b1, a2, b2):
+    """Angular separation between arrays of points on a unit sphere.
+
+    Array version of `sep`. All arguments are in radians and are
+    broadcast against each other, so eg a single point can be compared
+    with many, or an outer product formed with a1[:, None] etc.
+    Returns an array of separations in the range [0, pi].
+
+    Examples
+    --------
+    >>> r2d(sep_array(0, d2r(np.array([45.0, -45.0])), 0, d2r(90.0)))
+    array([ 45., 135.])
+    """
+    # Tolerance to decide if the calculated separation is zero.
+    tol = 1e-15
+
+    (x1, y1, z1) = _from_s_array(np.asarray(a1, dtype=np.float64),
+                                 np.asarray(b1, dtype=np.float64))
+    (x2, y2, z2) = _from_s_array(np.asarray(a2, dtype=np.float64),
+                                 np.asarray(b2, dtype=np.float64))
+    d = x1 * x2 + y1 * y2 + z1 * z2
+    c = _mod_array(*_cross_array(x1, y1, z1, x2, y2, z2))
+
+    res = np.arctan2(c, d)
+    return np.where(np.abs(res) < tol, 0.0, res)
+
+
+def bear_array(a1, b1, a2, b2):
+    """Bearing/position angle between arrays of points on a unit sphere.
+
+    Array version of `bear`. All arguments are in radians and are
+    broadcast against each other. Where the first point is on the pole
+    the bearing is undefined and 0 is returned (with a single warning).
+
+    Examples
+    --------
+    >>> r2d(bear_array(d2r(45.0), d2r(45.0), d2r(np.array([60.0, 44.0])),
+    ...     d2r(45.0)))
+    array([ 84.68152816, -89.64644212])
+    """
+    # See bear() for the method.
+    tol = 1e-15
+
+    (x1, y1, z1) = _from_s_array(np.asarray(a1, dtype=np.float64),
+                                 np.asarray(b1, dtype=np.float64))
+    (x2, y2, z2) = _from_s_array(np.asarray(a2, dtype=np.float64),
+                                 np.asarray(b2, dtype=np.float64))
+
+    # Z-axis
+    v0 = CartesianVector()
+    v0.from_s(r=1.0, alpha=0.0, delta=d2r(90.0))
+
+    # Vector perpendicular to great circle containing base and
+    # Z-axis.
+    v10 = _cross_array(x1, y1, z1, v0.x, v0.y, v0.z)
+    on_pole = _mod_array(*v10) < tol
+    if np.any(on_pole):
+        warnings.warn(
+            "First point is on the pole. Bearing undefined.")
+
+    # Vector perpendicular to great circle containing two points.
+    v12 = _cross_array(x1, y1, z1, x2, y2, z2)
+
+    # Find angle between these two vectors.
+    dot = v12[0] * v10[0] + v12[1] * v10[1] + v12[2] * v10[2]
+    cross = _mod_array(*_cross_array(*(v12 + v10)))
+    x = np.arctan2(cross, dot)
+
+    # If z is negative then we are in the 3rd or 4th quadrant.
+    x = np.where(v12[2] < 0, -x, x)
+
+    return np.where(on_pole | (np.abs(x) < tol), 0.0, x)
+
+
+def deci2sexa_array(deci, pre=3, trunc=False, lower=None, upper=None,
+                    b=False, upper_trim=False):
+    """Sexagesimal parts of an array of decimal numbers.
+
+    Array version of `deci2sexa`, which see for the meaning of the
+    arguments. The parts are identical to those from calling
+    `deci2sexa` element by element.
+
+    Returns
+    -------
+    s : 4 element tuple of arrays; (int, int, int, float)
+        Arrays of the sign and the three parts of the sexagesimal
+        numbers, each with the shape of `deci`.
+
+    Examples
+    --------
+    >>> deci2sexa_array([-11.2345678, 12.5])
+    (array([-1,  1]), array([11, 12]), array([14, 30]), array([4.444, 0.   ]))
+    """
+    deci = np.asarray(deci, dtype=np.float64)
+    if lower is not None and upper is not None:
+        deci = normalize_array(deci, lower=lower, upper=upper, b=b)
+
+    sign = np.where(deci < 0, -1, 1)
+    deci = np.abs(deci)
+
+    hd, f1 = np.divmod(deci, 1)
+    mm, f2 = np.divmod(f1 * 60.0, 1)
+    sf = f2 * 60.0
+
+    # Seconds part to required precision. np.rint rounds half to even,
+    # as round() does.
+    fp = 10 ** pre
+    if trunc:
+        ss = np.floor(sf * fp)
+    else:
+        ss = np.rint(sf * fp)
+    ss = ss.astype(np.int64)
+
+    # Carry over ss == 60 and mm == 60.
+    carry = ss == 60 * fp
+    mm = np.where(carry, mm + 1, mm)
+    ss = np.where(carry, 0, ss)
+    carry = mm == 60
+    hd = np.where(carry, hd + 1, hd)
+    mm = np.where(carry, 0, mm)
+
+    hd = hd.astype(np.int64)
+    mm = mm.astype(np.int64)
+    if lower is not None and upper is not None and upper_trim:
+        hd = np.where(hd == upper, lower, hd)
+
+    sign = np.where((hd == 0) & (mm == 0) & (ss == 0), 1, sign)
+
+    return (sign, hd, mm, ss / float(fp))
+
+
+def _fmt_sexa_array(parts, s1=" ", s2=" ", s3=" ", pre=3):
+    # List of strings, as from fmt_angle, from deci2sexa_array output.
+    # %-formatting of a tuple is quicker than str.format.
+    (s1, s2, s3) = (s.replace("%", "%%") for s in (s1, s2, s3))
+    p = "%s%02d" + s1 + "%02d" + s2 + "%0{0}.{1}f".format(pre + 3, pre) + s3
+    (sign, hd, mm, ss) = (np.ravel(x).tolist() for x in parts)
+    return [p % ("-" if sg < 0 else "+", h, m, s)
+            for (sg, h, m, s) in zip(sign, hd, mm, ss)]
+
+
+def fmt_angle_array(val, s1=" ", s2=" ", s3=" ", pre=3, trunc=False,
+                    lower=None, upper=None, b=False, upper_trim=False):
+    """Return sexagesimal strings of an array of angles.
+
+    Array version of `fmt_angle`, which see for the meaning of the
+    arguments. Returns a list of strings, identical to those from
+    calling `fmt_angle` on each element of (the flattened) `val`.
+
+    Examples
+    --------
+    >>> fmt_angle_array([12.348978659, -0.5], s1=":", s2=":", s3="")
+    ['+12:20:56.323', '-00:30:00.000']
+    """
+    val = np.asarray(val, dtype=np.float64)
+    if lower is not None and upper is not None:
+        val = normalize_array(val, lower=lower, upper=upper, b=b)
+    x = deci2sexa_array(val, pre=pre, trunc=trunc, lower=lower, upper=upper,
+                        b=b, upper_trim=upper_trim)
+    return _fmt_sexa_array(x, s1=s1, s2=s2, s3=s3, pre=pre)
+
+
+# Precompiled patterns for the common, unambiguous forms of sexagesimal
+# strings: "[+-]12:34:56.7", "[+-]12h34m56.7s" (or d, hh, dd, etc.) and
+# "[+-]12 34 56.7". Anything else is parsed by phmsdms.
+_sexa_num = r"([0-9]*\.?[0-9]+)"
+_sexa_fast_patterns = [re.compile(p.format(n=_sexa_num)) for p in (
+    r"\s*([-+]?){n}\s*(:)\s*{n}\s*:\s*{n}\s*(?:ss?|\")?\s*$",
+    r"\s*([-+]?){n}\s*(hh?|dd?)\s*{n}\s*(?:mm?|')\s*{n}\s*(?:ss?|\")?\s*$",
+    r"\s*([-+]?){n}(\s)\s*{n}\s+{n}\s*$")]
+
+
+def phmsdms_array(strings):
+    """Parse a sequence of sexagesimal strings.
+
+    Bulk version of `phmsdms`. Common forms of string are matched with
+    precompiled patterns, and the rest are passed to `phmsdms`; the
+    results are the same as calling `phmsdms` on each string.
+
+    Returns
+    -------
+    d : dict
+        sign : int array of shape (N, )
+        vals : float array of shape (N, 3)
+        units : list of N strings, "degrees" or "hours"
+
+    Examples
+    --------
+    >>> d = phmsdms_array(["12h13m12.4s", "-00:30:00"])
+    >>> d['sign'], d['units']
+    (array([ 1, -1]), ['hours', 'degrees'])
+    >>> d['vals']
+    array([[12. , 13. , 12.4],
+           [ 0. , 30. ,  0. ]])
+    """
+    signs = []
+    vals = []
+    units = []
+    for s in strings:
+        s = s.lower()
+        for p in _sexa_fast_patterns:
+            m = p.match(s)
+            if m is not None:
+                (sg, hd, u, mm, ss) = m.groups()
+                signs.append(-1 if sg == "-" else 1)
+                vals.append((float(hd), float(mm), float(ss)))
+                units.append("hours" if u[0] == "h" else "degrees")
+                break
+        else:
+            x = phmsdms(s)
+            signs.append(x['sign'])
+            vals.append(x['vals'])
+            units.append(x['units'])
+    return dict(sign=np.array(signs, dtype=int),
+                vals=np.array(vals, dtype=np.float64).reshape(-1, 3),
+                units=units)
+
+
+def sexa2deci_array(sign, hd, mm, ss, todeg=False):
+    """Combine arrays of sexagesimal components into decimal numbers.
+
+    Array version of `sexa2deci`; the arguments are broadcast against
+    each other.
+    """
+    sign = np.asarray(sign)
+    if not np.all((sign == 1) | (sign == -1)):
+        raise ValueError("Sign has to be -1 or 1.")
+    d = (np.asarray(hd, dtype=np.float64) / 1.0 + np.asarray(mm) / 60.0
+         + np.asarray(ss) / 3600.0)
+    d = d * sign
+    if todeg:
+        d = h2d(d)
+    return d
+
+
+
 class Angle(object):
     """A class for representing angles, including string formatting.
 
@@ -1887,6 +2208,355 @@ class AngularPosition(object):
         return self.sep(other)
 
 
+class AngleArray(object):
+    """An array of angles, stored as a contiguous float64 array.
+
+    Array counterpart of `Angle`. The N angles are held in radians in a
+    single NumPy array, and the values in different units are available
+    as array attributes, so no Python object is created per angle.
+
+    Parameters
+    ----------
+    r : array_like
+        Angles in radians.
+    d : array_like
+        Angles in degrees.
+    h : array_like
+        Angles in hours.
+    arcs : array_like
+        Angles in arc-seconds.
+
+    Only one of the keywords may be given. The input is copied.
+
+    Attributes
+    ----------
+    r, d, h, arcs : ndarray
+        Angles in radians, degrees, hours and arc-seconds. Assigning to
+        one of these replaces all the angles.
+    pre, trunc, s1, s2, s3 :
+        As for `Angle`; used by `sexa` and `to_strings`.
+
+    Notes
+    -----
+    Indexing with an integer returns an `Angle` (or `AlphaAngle`,
+    `DeltaAngle` for the subclasses); indexing with a slice, index array
+    or mask returns a new array object of the same class.
+
+    Examples
+    --------
+    >>> a = AngleArray(d=[10.0, -20.5])
+    >>> a.h
+    array([ 0.66666667, -1.36666667])
+    >>> a.sexa()
+    (array([ 1, -1]), array([10, 20]), array([ 0, 30]), array([0., 0.]))
+    >>> a.to_strings()
+    ['+10 00 00.000 ', '-20 30 00.000 ']
+    """
+    # As for Angle, subclasses override `_setnorm` and the sexagesimal
+    # parameters.
+    _item_class = Angle
+    _keyws = ('r', 'd', 'h', 'arcs')
+    _sexa_unit = 'd'
+    _sexa_kw = {}
+    pre = 3
+    trunc = False
+    s1 = " "
+    s2 = " "
+    s3 = " "
+
+    def __init__(self, **kwargs):
+        if not all(k in self._keyws for k in kwargs):
+            raise TypeError("Only {0} are allowed.".format(self._keyws))
+        if len(kwargs) > 1:
+            raise TypeError("Only one of {0} can be given."
+                            .format(self._keyws))
+        (key, val) = (list(kwargs.items()) or [('r', [])])[0]
+        val = np.array(val, dtype=np.float64, ndmin=1)
+        if key == 'd':
+            val = d2r(val)
+        elif key == 'h':
+            val = h2r(val)
+        elif key == 'arcs':
+            val = arcs2r(val)
+        self._setnorm(val)
+
+    @classmethod
+    def from_strings(cls, strings, units=None):
+        """Array of angles from a sequence of sexagesimal strings.
+
+        The units of each string are inferred as for `Angle` (see
+        `phmsdms`), unless `units` ("degrees" or "hours") is given.
+        """
+        x = phmsdms_array(strings)
+        d = sexa2deci_array(x['sign'], *x['vals'].T)
+        if units is None:
+            hours = np.array([u == "hours" for u in x['units']], dtype=bool)
+        elif units in ("degrees", "hours"):
+            hours = units == "hours"
+        else:
+            raise ValueError("Unknow units: {0}".format(units))
+        return cls(r=np.where(hours, h2r(d), d2r(d)))
+
+    def _setnorm(self, val):
+        # Override this method in other classes.
+        self._raw = np.ascontiguousarray(val, dtype=np.float64)
+
+    def __getr(self):
+        return self._raw
+
+    def __setr(self, val):
+        self._setnorm(np.array(val, dtype=np.float64, ndmin=1))
+
+    r = property(__getr, __setr, doc="Angles in radians.")
+
+    def __getd(self):
+        return r2d(self._raw)
+
+    def __setd(self, val):
+        self._setnorm(d2r(np.array(val, dtype=np.float64, ndmin=1)))
+
+    d = property(__getd, __setd, doc="Angles in degrees.")
+
+    def __geth(self):
+        return r2h(self._raw)
+
+    def __seth(self, val):
+        self._setnorm(h2r(np.array(val, dtype=np.float64, ndmin=1)))
+
+    h = property(__geth, __seth, doc="Angles in hours.")
+
+    def __getarcs(self):
+        return r2arcs(self._raw)
+
+    def __setarcs(self, val):
+        self._setnorm(arcs2r(np.array(val, dtype=np.float64, ndmin=1)))
+
+    arcs = property(__getarcs, __setarcs, doc="Angles in arcseconds.")
+
+    def sexa(self):
+        """Sexagesimal parts of all angles as a tuple of arrays (sign,
+        first, second, third part), see `deci2sexa_array`."""
+        return deci2sexa_array(getattr(self, self._sexa_unit),
+                               pre=self.pre, trunc=self.trunc,
+                               **self._sexa_kw)
+
+    def to_strings(self):
+        """List of sexagesimal strings, as from str() of each angle."""
+        return _fmt_sexa_array(self.sexa(), s1=self.s1, s2=self.s2,
+                               s3=self.s3, pre=self.pre)
+
+    def _new(self, raw):
+        # New object of this class, sharing formatting settings.
+        a = self.__class__.__new__(self.__class__)
+        a.__dict__.update(self.__dict__)
+        a._raw = np.ascontiguousarray(raw, dtype=np.float64)
+        return a
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            a = self._item_class(r=float(self._raw[idx]))
+            (a.pre, a.trunc) = (self.pre, self.trunc)
+            return a
+        return self._new(self._raw[idx])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self._raw, dtype=dtype)
+
+    def __repr__(self):
+        return "{0}(r={1!r})".format(self.__class__.__name__, self._raw)
+
+    def __str__(self):
+        return "[" + ", ".join(self.to_strings()) + "]"
+
+
+class AlphaAngleArray(AngleArray):
+    """An array of longitudinal angles, normalized to [0, 24) hours.
+
+    Array counterpart of `AlphaAngle`; see `AngleArray`. The `hms`
+    attribute gives the sexagesimal parts in hours.
+
+    Examples
+    --------
+    >>> a = AlphaAngleArray(h=[-1.0, 25.5])
+    >>> a.h
+    array([23. ,  1.5])
+    >>> a.to_strings()
+    ['+23HH 00MM 00.000SS', '+01HH 30MM 00.000SS']
+    """
+    _item_class = AlphaAngle
+    _sexa_unit = 'h'
+    _sexa_kw = dict(lower=0, upper=24, upper_trim=True)
+    s1 = "HH "
+    s2 = "MM "
+    s3 = "SS"
+
+    def _setnorm(self, val):
+        # [0, 2pi) i.e., h = [0, 24).
+        self._raw = normalize_array(val, 0, 2 * math.pi)
+
+    hms = property(AngleArray.sexa, doc="HMS tuple of arrays.")
+
+
+class DeltaAngleArray(AngleArray):
+    """An array of latitudinal angles, normalized to [-90, 90] degrees.
+
+    Array counterpart of `DeltaAngle`; see `AngleArray`. The `dms`
+    attribute gives the sexagesimal parts in degrees.
+
+    Notes
+    -----
+    The values are normalized in radians into [-pi/2, pi/2], so that
+    100 degrees becomes 80 degrees. (`DeltaAngle` only applies this
+    normalization when formatting the angle.)
+
+    Examples
+    --------
+    >>> a = DeltaAngleArray(d=[100.0, -45.25])
+    >>> a.d
+    array([ 80.  , -45.25])
+    >>> a.to_strings()
+    ['+80DD 00MM 00.000SS', '-45DD 15MM 00.000SS']
+    """
+    _item_class = DeltaAngle
+    s1 = "DD "
+    s2 = "MM "
+    s3 = "SS"
+
+    def _setnorm(self, val):
+        self._raw = normalize_array(val, -math.pi / 2, math.pi / 2, b=True)
+
+    dms = property(AngleArray.sexa, doc="DMS tuple of arrays.")
+
+
+class PositionArray(object):
+    """An array of points on a unit sphere, say (RA, DEC).
+
+    Array counterpart of `AngularPosition`. The longitudinal and
+    latitudinal angles are stored in an `AlphaAngleArray` and a
+    `DeltaAngleArray` of the same length.
+
+    Parameters
+    ----------
+    alpha : array_like or AlphaAngleArray
+        The longitudinal angles. Numbers are taken to be in hours.
+    delta : array_like or DeltaAngleArray
+        The latitudinal angles. Numbers are taken to be in degrees.
+
+    Attributes
+    ----------
+    alpha : AlphaAngleArray
+    delta : DeltaAngleArray
+    xyz : ndarray
+        (N, 3) array of unit Cartesian vectors.
+    dlim : str
+        Delimiter between alpha and delta in `to_strings`.
+
+    Methods
+    -------
+    sep : element by element separation in radians.
+    sep_matrix : separation between all pairs of points in radians.
+    bear : element by element bearing/position angle in radians.
+
+    Examples
+    --------
+    >>> p = PositionArray(alpha=[0.0, 12.0], delta=[0.0, 45.0])
+    >>> r2d(p.sep(AngularPosition(alpha=0.0, delta=90.0)))
+    array([90., 45.])
+    >>> r2d(p.sep_matrix())
+    array([[  0., 135.],
+           [135.,   0.]])
+    >>> p.to_strings()
+    ['+00HH 00MM 00.000SS +00DD 00MM 00.000SS', '+12HH 00MM 00.000SS +45DD 00MM 00.000SS']
+    """
+    dlim = " "
+
+    def __init__(self, alpha=(), delta=()):
+        if not isinstance(alpha, AlphaAngleArray):
+            alpha = AlphaAngleArray(h=alpha)
+        if not isinstance(delta, DeltaAngleArray):
+            delta = DeltaAngleArray(d=delta)
+        if len(alpha) != len(delta):
+            raise ValueError("alpha and delta must have the same length.")
+        self._alpha = alpha
+        self._delta = delta
+
+    @classmethod
+    def from_r(cls, alpha, delta):
+        """PositionArray from longitudes and latitudes in radians."""
+        return cls(AlphaAngleArray(r=alpha), DeltaAngleArray(r=delta))
+
+    @classmethod
+    def from_strings(cls, alpha, delta, alpha_units=None, delta_units=None):
+        """PositionArray from sequences of sexagesimal strings. Units
+        are inferred as for `AngularPosition` unless given, see
+        `AngleArray.from_strings`."""
+        return cls(AlphaAngleArray.from_strings(alpha, alpha_units),
+                   DeltaAngleArray.from_strings(delta, delta_units))
+
+    @classmethod
+    def from_positions(cls, positions):
+        """PositionArray from a sequence of AngularPosition objects."""
+        positions = list(positions)
+        return cls.from_r([p.alpha.r for p in positions],
+                          [p.delta.r for p in positions])
+
+    alpha = property(lambda self: self._alpha,
+                     doc="Longitudinal angles (AlphaAngleArray).")
+    delta = property(lambda self: self._delta,
+                     doc="Latitudinal angles (DeltaAngleArray).")
+
+    @property
+    def xyz(self):
+        """(N, 3) array of unit Cartesian vectors."""
+        return np.column_stack(_from_s_array(self._alpha.r, self._delta.r))
+
+    @staticmethod
+    def _radians(p):
+        # (alpha, delta) in radians of a PositionArray or AngularPosition.
+        return (np.asarray(p.alpha.r), np.asarray(p.delta.r))
+
+    def sep(self, p):
+        """Angular separation in radians to `p`, a PositionArray of the
+        same length or a single AngularPosition. See `sep_array`."""
+        return sep_array(self._alpha.r, self._delta.r, *self._radians(p))
+
+    def sep_matrix(self, p=None):
+        """(N, M) array of separations in radians between each of these
+        N points and each of the M points of PositionArray `p` (default
+        this array)."""
+        (a2, b2) = self._radians(self if p is None else p)
+        return sep_array(self._alpha.r[:, None], self._delta.r[:, None],
+                         a2[None, :], b2[None, :])
+
+    def bear(self, p):
+        """Bearing/position angle in radians to `p`, a PositionArray of
+        the same length or a single AngularPosition. See `bear_array`."""
+        return bear_array(self._alpha.r, self._delta.r, *self._radians(p))
+
+    def to_strings(self):
+        """List of strings, as from str() of each AngularPosition."""
+        return [self.dlim.join(x) for x in
+                zip(self._alpha.to_strings(), self._delta.to_strings())]
+
+    def __len__(self):
+        return len(self._alpha)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            p = AngularPosition()
+            p.alpha = self._alpha[idx]
+            p.delta = self._delta[idx]
+            return p
+        return PositionArray(self._alpha[idx], self._delta[idx])
+
+    def __repr__(self):
+        return "PositionArray(alpha={0!r}, delta={1!r})".format(
+            self._alpha.h, self._delta.d)
+
+
 # Test for AngularPosition methods sep() and bear() with SLALIB
 # sla_dsep and sla_bear respectively. Needs PySLALIB. On my computer
 # the results are identical to those from SLALIB.
@@ -1936,6 +2606,19 @@ def _test_with_slalib():
     assert abs(min(d)) <= 1e-8
     assert abs(max(d)) <= 1e-8
 
+    # Array versions
+    s1 = bear_array(alpha, delta, alpha1, delta1)
+    d = [i - j for i, j in zip(s, s1)]
+    assert abs(min(d)) <= 1e-8
+    assert abs(max(d)) <= 1e-8
+
+    s = [slalib.sla_dsep(alpha[i], delta[i], alpha1[i], delta1[i])
+         for i in range(100)]
+    s1 = sep_array(alpha, delta, alpha1, delta1)
+    d = [i - j for i, j in zip(s, s1)]
+    assert abs(min(d)) <= 1e-8
+    assert abs(max(d)) <= 1e-8
+
 
 if __name__ == "__main__":
     # AssertionError will be raised if tests fail. Some message will be
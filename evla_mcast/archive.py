@@ -0,0 +1,464 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import re
+import mmap
+import hashlib
+
+import numpy as np
+from lxml import etree, objectify
+
+from .checkpoint import OBS, ANT, VCI, _pack, _scan
+from .controller import Controller
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Indexed archive of received Observation, AntennaPropertyTable and VCI
+# documents, for reprocessing.
+#
+# The archive is a directory of append-only segment files.  Records use
+# the checkpoint journal layout (kind, recv_time, key, data and a
+# crc32), with the datasetId (obs and ant documents) or configId (VCI)
+# as key.  Each writing session starts a new segment, and a segment is
+# closed once it reaches segment_bytes, so existing segments are never
+# modified.  When a segment is closed its index is saved next to it
+# (seg-NNNNNN.idx.npz); segments without one (eg after a crash) are
+# re-indexed when the archive is opened.
+#
+# The index is a NumPy structured array with one row per document
+# (kind, segment, offset and length of the document, recv_time, and for
+# obs documents startTime, scanNo and subscanNo), with the datasetId and
+# configId as indices into a string table.  It is small enough to keep
+# in memory for months of traffic; documents are read on demand from
+# memory-mapped segments.  Rows are appended to a buffer that doubles
+# in size when full, and the obs rows are sorted by start time only when
+# a query needs them, so adding a document does not copy the index.
+#
+# VCIs arrive again with every obs document (see ObsClient); a VCI is
+# only archived when it differs from the last one of its configId.
+#
+# scans() rebuilds ScanConfigs for a dataset or time range by feeding
+# just the documents of the datasets involved, in archive order, through
+# a Controller, so subscans and stop times are resolved exactly as they
+# were in real time.
+
+_index_dtype = np.dtype([
+    ('kind', np.uint8), ('segment', np.int32), ('offset', np.int64),
+    ('length', np.int64), ('recv_time', np.float64),
+    ('startTime', np.float64), ('scanNo', np.int32),
+    ('subscanNo', np.int32), ('dataset', np.int32), ('config', np.int32)])
+
+_segment_re = re.compile(r'^seg-(\d{6})\.dat$')
+
+# Documents in the archive were validated when received.
+_parser = objectify.makeparser()
+
+
+def _segment_name(n):
+    return 'seg-%06d.dat' % n
+
+
+def _int_or(text, default=-1):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return default
+
+
+def _groups(keys):
+    # Group keys: (distinct keys, the positions in keys sorted by key
+    # (stable), and the bounds of each key's run in that order).
+    order = np.argsort(keys, kind='mergesort')
+    (uniq, first) = np.unique(keys[order], return_index=True)
+    return (uniq, order, np.append(first, len(keys)))
+
+
+class Archive(object):
+    """Segment archive of documents in directory path.
+
+    mode: 'r' to read, 'a' to also add documents (the directory is
+        created if needed).
+    segment_bytes: size at which a segment is closed and a new one
+        started.
+    """
+
+    def __init__(self, path, mode='r', segment_bytes=256 << 20):
+        if mode not in ('r', 'a'):
+            raise ValueError("mode must be 'r' or 'a'")
+        self.path = path
+        self.mode = mode
+        self.segment_bytes = segment_bytes
+        if mode == 'a' and not os.path.isdir(path):
+            os.makedirs(path)
+        self._strings = []
+        self._string_ids = {}
+        self._maps = {}
+        self._file = None
+        segments = sorted(int(m.group(1)) for m in
+                          (_segment_re.match(n) for n in os.listdir(path))
+                          if m)
+        self._nsegment = segments[-1] + 1 if segments else 0
+        self._segment = None
+        self._vci_digests = {}  # configId -> digest of its last VCI
+        self._vci_rows = None
+        self._rows = np.concatenate(
+            [np.zeros(0, _index_dtype)] +
+            [self._load_index(n) for n in segments])
+        self._nrows = len(self._rows)
+        self._sort()
+
+    # Index
+
+    def _intern(self, s):
+        if s is None:
+            return -1
+        try:
+            return self._string_ids[s]
+        except KeyError:
+            self._string_ids[s] = len(self._strings)
+            self._strings.append(s)
+            return self._string_ids[s]
+
+    def _string(self, i):
+        return None if i < 0 else self._strings[i]
+
+    def _load_index(self, n):
+        fname = os.path.join(self.path, _segment_name(n))
+        try:
+            with np.load(fname + '.idx.npz') as f:
+                rows = f['rows']
+                strings = [str(s) for s in f['strings']]
+            remap = np.array([self._intern(s) for s in strings] + [-1],
+                             dtype=np.int32)
+            for field in ('dataset', 'config'):
+                rows[field] = remap[rows[field]]
+            return rows
+        except (IOError, OSError, KeyError, ValueError):
+            logger.info('Indexing archive segment {0}'.format(fname))
+        rows = []
+        for (end, (kind, key, recv_time, data)) in _scan(fname):
+            rows.append(self._row(kind, key, data, recv_time, n,
+                                  end - 4 - len(data)))
+        rows = np.array(rows, dtype=_index_dtype)
+        if self.mode == 'a':
+            self._save_index(n, rows)
+        return rows
+
+    def _save_index(self, n, rows):
+        # Save with a local string table
+        rows = rows.copy()
+        used = sorted((set(rows['dataset']) | set(rows['config'])) -
+                      set([-1]))
+        local = dict((g, i) for (i, g) in enumerate(used))
+        for field in ('dataset', 'config'):
+            rows[field] = [local.get(g, -1) for g in rows[field]]
+        fname = os.path.join(self.path, _segment_name(n)) + '.idx.npz'
+        tmp = fname + '.tmp.npz'
+        np.savez(tmp, rows=rows,
+                 strings=np.array([self._strings[g] for g in used], dtype=str))
+        os.rename(tmp, fname)
+
+    def _row(self, kind, key, data, recv_time, segment, offset):
+        startTime = np.nan
+        scanNo = subscanNo = -1
+        dataset = config = -1
+        if kind == VCI:
+            config = self._intern(key)
+        else:
+            dataset = self._intern(key)
+        if kind == OBS:
+            root = etree.fromstring(data)
+            config = self._intern(root.get('configId'))
+            startTime = float(root.get('startTime', 'nan'))
+            scanNo = _int_or(root.findtext('scanNo'))
+            subscanNo = _int_or(root.findtext('subscanNo'))
+        return (kind, segment, offset, len(data),
+                np.nan if recv_time is None else recv_time, startTime,
+                scanNo, subscanNo, dataset, config)
+
+    @property
+    def index(self):
+        # The rows in use of the index buffer
+        return self._rows[:self._nrows]
+
+    def _sort(self):
+        # Index rows in archive order.
+        self._rows[:self._nrows] = np.sort(self.index,
+                                           order=('segment', 'offset'))
+        self._obs_sorted = None
+
+    @property
+    def _obs(self):
+        # Index rows of obs documents ordered by start time, sorted when
+        # first needed after documents were added.
+        if self._obs_sorted is None:
+            obs = np.nonzero(self.index['kind'] == OBS)[0]
+            self._obs_sorted = obs[np.argsort(self.index['startTime'][obs],
+                                              kind='mergesort')]
+        return self._obs_sorted
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def datasetIds(self):
+        return sorted(set(self._string(i) for i in
+                          np.unique(self.index['dataset']) if i >= 0))
+
+    # Writing
+
+    def _open_segment(self):
+        if self._file is None:
+            self._segment = self._nsegment
+            self._nsegment += 1
+            self._file = open(os.path.join(self.path,
+                                           _segment_name(self._segment)),
+                              'ab')
+        return self._file
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._save_index(self._segment,
+                         self.index[self.index['segment'] == self._segment])
+
+    def close(self):
+        self._close_segment()
+        for m in self._maps.values():
+            m.close()
+        self._maps = {}
+
+    def _add(self, kind, key, data, recv_time):
+        if self.mode != 'a':
+            raise IOError('Archive {0} is read-only'.format(self.path))
+        f = self._open_segment()
+        offset = f.tell()
+        record = _pack(kind, key, data, recv_time)
+        f.write(record)
+        f.flush()
+        if self._nrows == len(self._rows):
+            # Grow the index buffer geometrically, so adding a document
+            # copies the index only O(log n) times in all
+            rows = np.zeros(max(1024, 2 * len(self._rows)), _index_dtype)
+            rows[:self._nrows] = self.index
+            self._rows = rows
+        self._rows[self._nrows] = self._row(
+            kind, key, data, recv_time, self._segment,
+            offset + len(record) - 4 - len(data))
+        self._nrows += 1
+        if kind == OBS:
+            self._obs_sorted = None
+        if f.tell() >= self.segment_bytes:
+            self._close_segment()
+
+    @staticmethod
+    def _bytes(doc):
+        return doc if isinstance(doc, (bytes, type(b''))) \
+            else etree.tostring(doc)
+
+    def add_obs(self, obs, recv_time=None):
+        """Add an Observation document (bytes or parsed element)."""
+        data = self._bytes(obs)
+        dsid = etree.fromstring(data).get('datasetId') \
+            if not hasattr(obs, 'attrib') else obs.attrib['datasetId']
+        self._add(OBS, str(dsid), data, recv_time)
+
+    def add_ant(self, ant, recv_time=None):
+        """Add an AntennaPropertyTable document (bytes or parsed
+        element)."""
+        data = self._bytes(ant)
+        dsid = etree.fromstring(data).get('datasetId') \
+            if not hasattr(ant, 'attrib') else ant.attrib['datasetId']
+        self._add(ANT, str(dsid), data, recv_time)
+
+    def add_vci(self, vci, recv_time=None):
+        """Add a VCI document (bytes or parsed element)."""
+        if not isinstance(vci, (bytes, type(b''))) and \
+                not hasattr(vci, 'tag'):
+            logger.warning('Not archiving streamed VCI {0}'
+                           .format(vci.attrib.get('configId')))
+            return
+        data = self._bytes(vci)
+        cfgid = str(etree.fromstring(data).get('configId')
+                    if not hasattr(vci, 'attrib') else vci.attrib['configId'])
+        # The clients pass the VCI again with every obs document; only
+        # archive it when it changed.
+        digest = hashlib.sha1(data).digest()
+        if self._last_vci_digest(cfgid) == digest:
+            return
+        self._add(VCI, cfgid, data, recv_time)
+        self._vci_digests[cfgid] = digest
+
+    def _last_vci_digest(self, cfgid):
+        if self._vci_rows is None:
+            # Last VCI row of each configId archived before opening
+            rows = np.nonzero(self.index['kind'] == VCI)[0]
+            self._vci_rows = dict(
+                (self._string(c), i)
+                for (c, i) in zip(self.index['config'][rows], rows))
+        if cfgid not in self._vci_digests:
+            i = self._vci_rows.get(cfgid)
+            self._vci_digests[cfgid] = None if i is None else \
+                hashlib.sha1(self.document(i)).digest()
+        return self._vci_digests[cfgid]
+
+    # Reading
+
+    def document(self, i):
+        """Raw bytes of the document at index row i."""
+        row = self.index[i]
+        seg = int(row['segment'])
+        (start, length) = (int(row['offset']), int(row['length']))
+        fname = os.path.join(self.path, _segment_name(seg))
+        if seg == self._segment and self._file is not None:
+            # The open segment is still growing, read it directly
+            with open(fname, 'rb') as f:
+                f.seek(start)
+                return f.read(length)
+        m = self._maps.get(seg)
+        if m is None:
+            with open(fname, 'rb') as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[seg] = m
+        return m[start:start + length]
+
+    def parse(self, i):
+        """Parsed (objectify) document at index row i."""
+        return objectify.fromstring(self.document(i), parser=_parser)
+
+    def obs_rows(self, t0=None, t1=None, datasetId=None):
+        """Index rows of obs documents with t0 <= startTime < t1,
+        ordered by startTime."""
+        start = self.index['startTime'][self._obs]
+        i0 = 0 if t0 is None else np.searchsorted(start, t0, 'left')
+        i1 = len(start) if t1 is None else np.searchsorted(start, t1, 'left')
+        rows = self._obs[i0:i1]
+        if datasetId is not None:
+            rows = rows[self.index['dataset'][rows] ==
+                        self._string_ids.get(datasetId, -2)]
+        return rows
+
+    def _dataset_rows(self, datasets):
+        # Yield the rows needed to rebuild each of datasets, in archive
+        # order: its obs and ant documents and the VCIs of its configIds.
+        # The index is grouped by dataset and configId once, so each
+        # dataset only costs the size of its own rows.
+        idx = self.index
+        kind = idx['kind']
+        own = np.nonzero(kind != VCI)[0]
+        (ds_keys, ds_rows, ds_bounds) = _groups(idx['dataset'][own])
+        vcis = np.nonzero(kind == VCI)[0]
+        (cfg_keys, cfg_rows, cfg_bounds) = _groups(idx['config'][vcis])
+        obs = np.nonzero(kind == OBS)[0]
+        # Distinct (dataset, configId) pairs of the obs documents
+        pairs = np.unique((idx['dataset'][obs].astype(np.int64) << 32) |
+                          (idx['config'][obs].astype(np.int64) + 1))
+        pair_ds = pairs >> 32
+        pair_cfg = (pairs & 0xffffffff) - 1
+        for ds in datasets:
+            parts = []
+            i = np.searchsorted(ds_keys, ds)
+            if i < len(ds_keys) and ds_keys[i] == ds:
+                parts.append(own[ds_rows[ds_bounds[i]:ds_bounds[i + 1]]])
+            (p0, p1) = np.searchsorted(pair_ds, [ds, ds + 1])
+            for cfg in pair_cfg[p0:p1]:
+                j = np.searchsorted(cfg_keys, cfg)
+                if j < len(cfg_keys) and cfg_keys[j] == cfg:
+                    parts.append(
+                        vcis[cfg_rows[cfg_bounds[j]:cfg_bounds[j + 1]]])
+            yield np.sort(np.concatenate(parts)) if parts else \
+                np.zeros(0, dtype=np.intp)
+
+    def _datasets(self, t0, t1, datasetId):
+        # Datasets with scans possibly overlapping [t0, t1), ordered by
+        # their first start time.
+        idx = self.index
+        obs = self._obs
+        if datasetId is not None:
+            ds = self._string_ids.get(datasetId)
+            return [] if ds is None else [ds]
+        # Obs rows are sorted by startTime, and stay so within each group
+        (uds, order, bounds) = _groups(idx['dataset'][obs])
+        start = idx['startTime'][obs][order]
+        first = start[bounds[:-1]]
+        last = start[bounds[1:] - 1]
+        # Stop times are at most the last start (FINISH) time
+        sel = np.ones(len(uds), dtype=bool)
+        if t1 is not None:
+            sel &= first < t1
+        if t0 is not None:
+            sel &= last > t0
+        (uds, first) = (uds[sel], first[sel])
+        return [int(d) for d in uds[np.lexsort((uds, first))]]
+
+    def replay(self, controller, rows):
+        """Feed the documents at index rows (in the given order) to
+        controller's add_vci, add_ant and add_obs methods."""
+        for i in rows:
+            kind = self.index['kind'][i]
+            recv_time = self.index['recv_time'][i]
+            try:
+                doc = self.parse(i)
+                if kind == VCI:
+                    controller.add_vci(doc)
+                elif kind == ANT:
+                    controller.add_ant(doc, recv_time=None
+                                       if np.isnan(recv_time) else recv_time)
+                elif kind == OBS:
+                    controller.add_obs(doc, recv_time=None
+                                       if np.isnan(recv_time) else recv_time)
+            except Exception:
+                logger.exception('error replaying archive row {0}'.format(i))
+
+    def scans(self, t0=None, t1=None, datasetId=None, backend='objectify'):
+        """Yield the ScanConfigs (with subscans) of datasetId, or of all
+        datasets, that overlap the MJD range t0 <= t < t1.  Datasets are
+        rebuilt one at a time, in order of their first scan; scans whose
+        stop time is not known (the dataset did not finish in the
+        archive) are yielded last with stopTime None."""
+        datasets = self._datasets(t0, t1, datasetId)
+        for rows in self._dataset_rows(datasets):
+            collector = ScanCollector(backend)
+            self.replay(collector, rows)
+            for sc in collector.all_scans():
+                stop = sc.subscans[-1].stopTime
+                if (t1 is None or sc.startTime < t1) and \
+                        (t0 is None or stop is None or stop > t0):
+                    yield sc
+
+
+class ScanCollector(Controller):
+    """Controller without sockets that keeps the scans it handles, for
+    rebuilding ScanConfigs from saved documents (see Archive.scans and
+    offline.rebuild_scans).  Feed it documents with add_vci, add_ant and
+    add_obs (or Archive.replay).
+
+    backend: ScanConfig backend of the scans.
+
+    Attributes
+    ----------
+    scans : list of handled ScanConfigs, in the order they were handled
+    """
+
+    def __init__(self, backend='objectify'):
+        Controller.__init__(self, listen=False)
+        self.scan_backend = backend
+        self.scans = []
+
+    def handle_config(self, config):
+        self.scans.append(config)
+
+    def all_scans(self):
+        """The handled scans followed by those still queued (their stop
+        time is not known yet, stopTime None)."""
+        return self.scans + [s for d in self._datasets.values()
+                             for s in d.queued]
+
+    def latency_report(self):
+        return ''
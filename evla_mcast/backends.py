@@ -0,0 +1,254 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+from lxml import etree, objectify
+
+from .mcast_clients import (_obs_parser, _vci_parser, _ant_parser,
+                            _obs_etree_parser, _vci_etree_parser,
+                            _ant_etree_parser)
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Document access backends for ScanConfig, SubBand and Antenna.
+#
+# Each backend knows how to parse the Observation, VCI and
+# AntennaPropertyTable documents, and how to pull the individual fields
+# used by ScanConfig out of the parsed trees.  All backends return plain
+# python values (int, float, str, lists of these) or elements whose
+# .attrib holds the XML attributes, so ScanConfig produces identical
+# results whichever is used.
+#
+# ObjectifyBackend: documents are lxml.objectify trees, fields are read
+#   by objectify attribute traversal (obs.scanNo, baseBand.subBand, ...).
+#   This also works on the VCIRecord trees from vci_stream.
+#
+# EtreeBackend: documents are plain lxml.etree trees, fields are read
+#   with XPath expressions compiled once at import.  This avoids the
+#   per-access child lookup and proxy creation of objectify.  Since
+#   objectify trees are also etree trees, it can read those as well.
+
+_widar_ns = 'http://www.nrc.ca/namespaces/widar'
+
+
+def _w(path):
+    """Compile an ETXPath expression, with {w} standing for the widar
+    namespace."""
+    return etree.ETXPath(path.replace('{w}', '{%s}' % _widar_ns))
+
+
+class ObjectifyBackend(object):
+    """Access documents parsed with lxml.objectify."""
+
+    name = 'objectify'
+    parsers = {'obs': _obs_parser, 'vci': _vci_parser, 'ant': _ant_parser}
+    # For re-reading documents that were already validated
+    trusted_parser = objectify.makeparser()
+
+    # Observation document
+
+    def scanNo(self, obs):
+        return int(obs.scanNo)
+
+    def subscanNo(self, obs):
+        return int(obs.subscanNo)
+
+    def source(self, obs):
+        return str(obs.name)
+
+    def ra(self, obs):
+        return float(obs.ra)
+
+    def dec(self, obs):
+        return float(obs.dec)
+
+    def startLST(self, obs):
+        return float(obs.startLST)
+
+    def intents(self, obs):
+        return [str(item) for item in obs.intent]
+
+    def sslo(self, obs):
+        """List of (IFid, Sideband, Receiver, freq) for each sslo element."""
+        return [(str(sslo.attrib['IFid']), int(sslo.attrib['Sideband']),
+                 str(sslo.attrib['Receiver']), float(sslo.freq))
+                for sslo in obs.sslo]
+
+    # VCI document
+
+    def stations(self, vci):
+        return [str(s.attrib['name']) for s in vci.listOfStations.station]
+
+    def baseBands(self, vci):
+        return list(vci.stationInputOutput[0].baseBand)
+
+    def phaseBinning(self, baseBand):
+        return list(getattr(baseBand, 'phaseBinning', []))
+
+    def subBands(self, baseBand):
+        return list(getattr(baseBand, 'subBand', []))
+
+    def pp(self, subBand):
+        return list(subBand.polProducts.pp)
+
+    def blbProdIntegration(self, subBand):
+        return subBand.polProducts.blbProdIntegration
+
+    def vdifs(self, subBand):
+        """List of the vdif elements of all summedArrays in subBand."""
+        vdifs = []
+        for summedArray in getattr(subBand, 'summedArray', []):
+            vdif = getattr(summedArray, 'vdif', None)
+            if vdif is not None:
+                vdifs.append(vdif)
+        return vdifs
+
+    # AntennaPropertyTable document
+
+    def antennas(self, ant):
+        return list(ant.AntennaProperties)
+
+    def eop(self, ant):
+        """List of (epoch, tai_utc, ut1_utc, x_pole, y_pole) for each
+        eopday of the EopSet."""
+        eopset = getattr(ant, 'EopSet', None)
+        if eopset is None:
+            return []
+        return [(float(d.epoch), float(d.tai_utc), float(d.ut1_utc),
+                 float(d.x_pole), float(d.y_pole))
+                for d in getattr(eopset, 'eopday', [])]
+
+    def antenna(self, antprop):
+        """Dict of the fields of an AntennaProperties element."""
+        return {'name': str(antprop.attrib['name']),
+                'widarID': int(antprop.widarID),
+                'pad': str(antprop.pad),
+                'X': float(antprop.X),
+                'Y': float(antprop.Y),
+                'Z': float(antprop.Z),
+                'offset': float(antprop.offset)}
+
+
+# Compiled expressions for EtreeBackend
+_obs_scanNo = etree.XPath('string(scanNo)')
+_obs_subscanNo = etree.XPath('string(subscanNo)')
+_obs_name = etree.XPath('string(name)')
+_obs_ra = etree.XPath('string(ra)')
+_obs_dec = etree.XPath('string(dec)')
+_obs_startLST = etree.XPath('string(startLST)')
+_obs_intent = etree.XPath('intent')
+_obs_sslo = etree.XPath('sslo')
+_sslo_freq = etree.XPath('string(freq)')
+
+_vci_stations = _w('{w}listOfStations/{w}station/@name')
+_vci_baseBands = _w('{w}stationInputOutput[1]/{w}baseBand')
+_bb_phaseBinning = _w('{w}phaseBinning')
+_bb_subBands = _w('{w}subBand')
+_sb_pp = _w('{w}polProducts/{w}pp')
+_sb_blbProdIntegration = _w('{w}polProducts/{w}blbProdIntegration')
+_sb_vdifs = _w('{w}summedArray/{w}vdif')
+
+_ant_props = etree.XPath('AntennaProperties')
+_ant_eop = [etree.XPath('EopSet/eopday/%s/text()' % f) for f in
+            ('epoch', 'tai_utc', 'ut1_utc', 'x_pole', 'y_pole')]
+_antprop_widarID = etree.XPath('string(widarID)')
+_antprop_pad = etree.XPath('string(pad)')
+_antprop_X = etree.XPath('string(X)')
+_antprop_Y = etree.XPath('string(Y)')
+_antprop_Z = etree.XPath('string(Z)')
+_antprop_offset = etree.XPath('string(offset)')
+
+
+class EtreeBackend(object):
+    """Access documents parsed with lxml.etree, using precompiled XPath."""
+
+    name = 'etree'
+    parsers = {'obs': _obs_etree_parser, 'vci': _vci_etree_parser,
+               'ant': _ant_etree_parser}
+    trusted_parser = etree.XMLParser()
+
+    # Observation document
+
+    def scanNo(self, obs):
+        return int(_obs_scanNo(obs))
+
+    def subscanNo(self, obs):
+        return int(_obs_subscanNo(obs))
+
+    def source(self, obs):
+        return str(_obs_name(obs))
+
+    def ra(self, obs):
+        return float(_obs_ra(obs))
+
+    def dec(self, obs):
+        return float(_obs_dec(obs))
+
+    def startLST(self, obs):
+        return float(_obs_startLST(obs))
+
+    def intents(self, obs):
+        return [str(item.text or '') for item in _obs_intent(obs)]
+
+    def sslo(self, obs):
+        return [(str(sslo.attrib['IFid']), int(sslo.attrib['Sideband']),
+                 str(sslo.attrib['Receiver']), float(_sslo_freq(sslo)))
+                for sslo in _obs_sslo(obs)]
+
+    # VCI document
+
+    def stations(self, vci):
+        return [str(name) for name in _vci_stations(vci)]
+
+    def baseBands(self, vci):
+        return _vci_baseBands(vci)
+
+    def phaseBinning(self, baseBand):
+        return _bb_phaseBinning(baseBand)
+
+    def subBands(self, baseBand):
+        return _bb_subBands(baseBand)
+
+    def pp(self, subBand):
+        return _sb_pp(subBand)
+
+    def blbProdIntegration(self, subBand):
+        return _sb_blbProdIntegration(subBand)[0]
+
+    def vdifs(self, subBand):
+        return _sb_vdifs(subBand)
+
+    # AntennaPropertyTable document
+
+    def antennas(self, ant):
+        return _ant_props(ant)
+
+    def eop(self, ant):
+        columns = [[float(v) for v in xp(ant)] for xp in _ant_eop]
+        return list(zip(*columns))
+
+    def antenna(self, antprop):
+        return {'name': str(antprop.attrib['name']),
+                'widarID': int(_antprop_widarID(antprop)),
+                'pad': str(_antprop_pad(antprop)),
+                'X': float(_antprop_X(antprop)),
+                'Y': float(_antprop_Y(antprop)),
+                'Z': float(_antprop_Z(antprop)),
+                'offset': float(_antprop_offset(antprop))}
+
+
+_backends = {'objectify': ObjectifyBackend(), 'etree': EtreeBackend()}
+
+
+def get_backend(backend):
+    """Return the backend instance for a name ('objectify' or 'etree').
+    Backend instances are passed through unchanged."""
+    if isinstance(backend, (ObjectifyBackend, EtreeBackend)):
+        return backend
+    try:
+        return _backends[backend]
+    except KeyError:
+        raise ValueError('Unknown backend {0!r}, expected one of {1}'
+                         .format(backend, sorted(_backends.keys())))
@@ -0,0 +1,273 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import math
+import time
+import struct
+import zlib
+import hashlib
+
+from lxml import etree, objectify
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Crash-safe journal of the documents received by a Controller.
+#
+# Controller state (datasets, queued and handled scans, antenna tables,
+# VCIs) is entirely determined by the sequence of add_vci, add_ant and
+# add_obs calls, so the journal simply records each document as it
+# arrives.  Controller.restore() replays the journal through the same
+# methods with the handle_* callbacks (and latency statistics) disabled,
+# which rebuilds Controller._datasets and Controller.vci as they were,
+# without calling handle_config again for scans that were already
+# handled.
+#
+# Record layout (little endian):
+#
+#   magic 'EVCK', kind (B), recv_time (d, NaN if unknown),
+#   key length (I), data length (I), key, data, crc32 (I)
+#
+# The key is the datasetId (obs, ant and finish records) or configId
+# (vci records); data is the serialized document.  The crc covers the
+# header, key and data.  A torn or corrupt record at the end of the file
+# (eg from a crash while writing) ends the journal and is truncated away
+# when the journal is next opened for writing.
+#
+# The clients pass the VCI of every obs document to add_vci, so a VCI is
+# only recorded when its content differs from the last one recorded for
+# its configId (compared by SHA-1 digest).
+#
+# When a dataset finishes a finish record is written and the journal is
+# compacted: the records of finished datasets are dropped, and of the
+# VCIs of each configId only the latest and those still in effect for
+# some remaining obs record are kept (the last VCI of that configId
+# before it), in their original position.  Replaying the compacted journal thus gives every
+# live obs document the VCI it was received with.  The journal therefore
+# only holds the live SBs and stays small.
+#
+# VCIs loaded with vci_stream (ObsClient stream_vci) can not be
+# serialized and are not journaled; scans using them can not be
+# restored.
+
+OBS = 1
+ANT = 2
+VCI = 3
+FINISH = 4
+
+_magic = b'EVCK'
+_header = struct.Struct('<4sBdII')
+_crc = struct.Struct('<I')
+
+# Documents in the journal were validated when received.
+_restore_parser = objectify.makeparser()
+
+
+def _pack(kind, key, data, recv_time=None):
+    key = key.encode('utf-8')
+    header = _header.pack(_magic, kind,
+                          float('nan') if recv_time is None else recv_time,
+                          len(key), len(data))
+    crc = zlib.crc32(header + key + data) & 0xffffffff
+    return header + key + data + _crc.pack(crc)
+
+
+def read_journal(path):
+    """Yield the (kind, key, recv_time, data) records of a journal file,
+    stopping at the end of the file or at the first incomplete or
+    corrupt record.  recv_time is None if it was not known."""
+    for (end, record) in _scan(path):
+        yield record
+
+
+def _scan(path):
+    # Yield (end offset, record) for each valid record.
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            header = f.read(_header.size)
+            if not header:
+                return
+            if len(header) < _header.size:
+                break
+            (magic, kind, recv_time, nkey, ndata) = _header.unpack(header)
+            if magic != _magic:
+                break
+            body = f.read(nkey + ndata + _crc.size)
+            if len(body) < nkey + ndata + _crc.size:
+                break
+            (crc, ) = _crc.unpack(body[-_crc.size:])
+            if zlib.crc32(header + body[:-_crc.size]) & 0xffffffff != crc:
+                break
+            offset += len(header) + len(body)
+            key = body[:nkey].decode('utf-8')
+            data = body[nkey:nkey + ndata]
+            yield (offset, (kind, key,
+                            None if math.isnan(recv_time) else recv_time,
+                            data))
+    logger.warning('Ignoring incomplete or corrupt checkpoint data after '
+                   'byte {0} of {1}'.format(offset, path))
+
+
+def _fsync_dir(path):
+    # Make a rename in directory path durable.  Not possible on all
+    # platforms (eg Windows), where the rename is left to the OS.
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Checkpoint(object):
+    """Append-only journal of Controller documents.
+
+    path: journal file name.  It is created if it does not exist.
+    sync_interval: the file is fsync'ed after a record if this many
+        seconds have passed since the last sync (0 syncs every record,
+        None never syncs).  Records are always flushed to the OS, which
+        is enough to survive a crash of the process itself.
+    """
+
+    def __init__(self, path, sync_interval=1.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._file = None
+        self._last_sync = 0.0
+        self._vci_digests = {}  # configId -> digest of the last VCI
+
+    def _open(self):
+        if self._file is None:
+            end = 0
+            self._vci_digests = {}
+            for (end, (kind, key, t, data)) in _scan(self.path):
+                if kind == VCI:
+                    self._vci_digests[key] = hashlib.sha1(data).digest()
+            self._file = open(self.path, 'ab')
+            if self._file.tell() != end:
+                # Drop a torn record left by a crash
+                self._file.truncate(end)
+                self._file.seek(end)
+        return self._file
+
+    def close(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.time()
+
+    def _append(self, kind, key, data, recv_time=None):
+        f = self._open()
+        f.write(_pack(kind, key, data, recv_time))
+        f.flush()
+        if self.sync_interval is not None and \
+                time.time() - self._last_sync >= self.sync_interval:
+            self._sync()
+
+    def record_obs(self, obs, recv_time=None):
+        self._append(OBS, str(obs.attrib['datasetId']), etree.tostring(obs),
+                     recv_time)
+
+    def record_ant(self, ant, recv_time=None):
+        self._append(ANT, str(ant.attrib['datasetId']), etree.tostring(ant),
+                     recv_time)
+
+    def record_vci(self, vci):
+        if not hasattr(vci, 'tag'):
+            logger.warning('Not checkpointing streamed VCI {0}'
+                           .format(vci.attrib.get('configId')))
+            return
+        configId = str(vci.attrib['configId'])
+        data = etree.tostring(vci)
+        digest = hashlib.sha1(data).digest()
+        self._open()
+        if self._vci_digests.get(configId) == digest:
+            return
+        self._append(VCI, configId, data)
+        self._vci_digests[configId] = digest
+
+    def record_finish(self, datasetId):
+        """Record the end of a dataset and compact the journal."""
+        self._append(FINISH, str(datasetId), b'')
+        self.compact()
+
+    def records(self):
+        """List of all (kind, key, recv_time, data) records."""
+        return list(read_journal(self.path))
+
+    def compact(self):
+        """Rewrite the journal without the records of finished datasets
+        and VCIs that no remaining obs record was received with."""
+        was_open = self._file is not None
+        self.close()
+        records = self.records()
+        finished = set(key for (kind, key, t, data) in records
+                       if kind == FINISH)
+        live = [r[0] in (OBS, ANT) and r[1] not in finished
+                for r in records]
+        configIds = [str(etree.fromstring(r[3]).get('configId'))
+                     if ok and r[0] == OBS else None
+                     for (r, ok) in zip(records, live)]
+        # Walking backwards, a VCI is needed if it is the latest one of a
+        # live configId, or if a live obs record of its configId follows
+        # it before the next VCI of that configId.
+        needed = set(c for c in configIds if c is not None)
+        keep = []
+        for (r, ok, configId) in reversed(list(zip(records, live,
+                                                   configIds))):
+            if ok:
+                keep.append(r)
+                if configId is not None:
+                    needed.add(configId)
+            elif r[0] == VCI and r[1] in needed:
+                keep.append(r)
+                needed.discard(r[1])
+        keep.reverse()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            for (kind, key, recv_time, data) in keep:
+                f.write(_pack(kind, key, data, recv_time))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self.path)
+        _fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+        logger.info('Compacted checkpoint {0}: kept {1} of {2} records'
+                    .format(self.path, len(keep), len(records)))
+        if was_open:
+            self._open()
+
+    def replay(self, controller):
+        """Feed the journaled documents to controller's add_vci, add_ant
+        and add_obs methods, in the order they were received.  Returns
+        the number of documents."""
+        n = 0
+        for (kind, key, recv_time, data) in read_journal(self.path):
+            if kind == FINISH:
+                continue
+            try:
+                doc = objectify.fromstring(data, parser=_restore_parser)
+                if kind == VCI:
+                    controller.add_vci(doc)
+                elif kind == ANT:
+                    controller.add_ant(doc, recv_time=recv_time)
+                elif kind == OBS:
+                    controller.add_obs(doc, recv_time=recv_time)
+            except Exception:
+                logger.exception('error restoring {0} document'.format(key))
+            n += 1
+        return n
@@ -0,0 +1,176 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import hashlib
+
+from lxml import etree
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Structures derived from a configuration, shared between scans.
+#
+# Consecutive scans of an SB usually have the same configId, VCI and
+# antenna table, and differ only in source and timing.  The SubBand
+# objects (which also depend on the LO settings of the obs document) and
+# the sorted Antenna list of such scans are identical, so ConfigCache
+# keeps one DerivedConfig for each
+#
+#   (configId, VCI content hash, antenna table hash, LO settings, backend)
+#
+# and hands it to every ScanConfig with that key.  Document hashes are
+# computed once per document object.
+#
+# changed_parts() compares the keys (and source/intents) of two scans,
+# so that handle_config can tell what is different from the previous
+# scan and skip re-initialising anything that is not.
+
+# Parts reported by changed_parts().
+PARTS = ('configId', 'vci', 'ant', 'lo', 'source', 'intents')
+
+
+def _record_hash(h, rec):
+    # Feed a vci_stream record tree into hash h.
+    h.update(repr(sorted(rec.attrib.items())).encode('utf-8'))
+    for cls in type(rec).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name == 'attrib':
+                continue
+            h.update(name.encode('utf-8'))
+            value = getattr(rec, name)
+            for child in (value if isinstance(value, list) else [value]):
+                _record_hash(h, child)
+
+
+def doc_hash(doc):
+    """SHA-1 hex digest of the content of a parsed document (lxml tree or
+    vci_stream record), or None for no document."""
+    if doc is None:
+        return None
+    h = hashlib.sha1()
+    if hasattr(doc, 'tag'):
+        h.update(etree.tostring(doc))
+    else:
+        _record_hash(h, doc)
+    return h.hexdigest()
+
+
+class DerivedConfig(object):
+    """Derived structures shared by all ScanConfigs of one configuration.
+
+    subbands: dict of VdifRouting entry index to SubBand.
+    antennas: sorted list of Antenna, or None until first needed.
+    """
+    __slots__ = ('key', 'subbands', 'antennas')
+
+    def __init__(self, key):
+        self.key = key
+        self.subbands = {}
+        self.antennas = None
+
+    @property
+    def configId(self):
+        return self.key[0]
+
+    @property
+    def vci_hash(self):
+        return self.key[1]
+
+    @property
+    def ant_hash(self):
+        return self.key[2]
+
+    @property
+    def lo(self):
+        return self.key[3]
+
+
+def changed_parts(prev, config):
+    """Set of the PARTS that differ between ScanConfigs prev and config.
+    Both must have been attached to a ConfigCache.  All parts are
+    reported if prev is None."""
+    if prev is None or prev.derived is None or config.derived is None:
+        return frozenset(PARTS)
+    changed = set()
+    for (i, part) in enumerate(PARTS[:4]):
+        if prev.derived.key[i] != config.derived.key[i]:
+            changed.add(part)
+    if (prev.source, prev.ra_deg, prev.dec_deg) != \
+            (config.source, config.ra_deg, config.dec_deg):
+        changed.add('source')
+    if prev.typed_intents != config.typed_intents:
+        changed.add('intents')
+    return frozenset(changed)
+
+
+class ConfigCache(object):
+    """DerivedConfig objects keyed by configuration.
+
+    size: maximum number of configurations (and of document hashes)
+        kept; the cache is emptied when it is reached.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self._derived = {}
+        self._hashes = {}  # id(doc) -> (doc, hash)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._derived)
+
+    def clear(self):
+        self._derived.clear()
+        self._hashes.clear()
+
+    def doc_hash(self, doc):
+        """doc_hash(doc), computed once for each document object."""
+        if doc is None:
+            return None
+        try:
+            (cached_doc, h) = self._hashes[id(doc)]
+            if cached_doc is doc:
+                return h
+        except KeyError:
+            pass
+        h = doc_hash(doc)
+        if len(self._hashes) >= self.size:
+            self._hashes.clear()
+        # The document is kept so that its id is not reused.
+        self._hashes[id(doc)] = (doc, h)
+        return h
+
+    def key(self, config):
+        """Cache key of a ScanConfig."""
+        lo = tuple(config._backend.sslo(config.obs)) \
+            if config.has_obs else None
+        vci_id = config.vci.attrib.get('configId') if config.has_vci else None
+        return (None if vci_id is None else str(vci_id),
+                self.doc_hash(config.vci), self.doc_hash(config.ant), lo,
+                config.backend)
+
+    def get(self, config):
+        """The DerivedConfig for a ScanConfig."""
+        key = self.key(config)
+        try:
+            derived = self._derived[key]
+            self.hits += 1
+            return derived
+        except KeyError:
+            pass
+        self.misses += 1
+        derived = DerivedConfig(key)
+        if len(self._derived) >= self.size:
+            self._derived.clear()
+        self._derived[key] = derived
+        return derived
+
+    def attach(self, config):
+        """Attach the shared DerivedConfig to a ScanConfig and all its
+        subscans."""
+        for sc in config.subscans:
+            if sc.derived is None:
+                sc.use_derived(self.get(sc))
@@ -4,9 +4,15 @@ from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
 from io import open
 
 import asyncore
+import time
 
 from . import mcast_clients
+from .checkpoint import Checkpoint
+from .config_cache import ConfigCache, changed_parts
+from .eop import EopTable
+from .latency import Histogram, log_edges, signed_log_edges, mjd_to_unix
 from .scan_config import ScanConfig
+from .scan_index import ScanIndex
 
 import logging
 logger = logging.getLogger(__name__)
@@ -23,12 +29,77 @@ class Dataset(object):
         self.ant = None    # The antenna property table
         self.stopTime = None  # Final end time of the SB, once known
 
+    @property
+    def ant(self):
+        return self._ant
+
+    @ant.setter
+    def ant(self, ant):
+        self._ant = ant
+        self._eop = None
+        self._eop_decoded = False
+
+    @property
+    def eop(self):
+        # The EopTable from the antenna property table, decoded once per
+        # table (None if there is no table or it has no EopSet).
+        if not self._eop_decoded and self._ant is not None:
+            self._eop = EopTable.from_ant(self._ant)
+            self._eop_decoded = True
+        return self._eop
+
 
 class Controller(object):
 
-    def __init__(self):
-        self.obs_client = mcast_clients.ObsClient(self)
-        self.ant_client = mcast_clients.AntClient(self)
+    def __init__(self, obs_group=mcast_clients.OBS_GROUP,
+                 obs_port=mcast_clients.OBS_PORT,
+                 ant_group=mcast_clients.ANT_GROUP,
+                 ant_port=mcast_clients.ANT_PORT,
+                 interface=None, reuse_port=False, shard=None,
+                 timestamps=False, stream_vci=False, listen=True,
+                 checkpoint=None, vci_store=None, archive=None,
+                 shm_store=None, rcvbuf=None):
+        # The multicast groups/ports default to the VLA values.  Use
+        # different values (eg on the loopback interface) to run test
+        # instances alongside production.  interface, reuse_port, shard,
+        # timestamps and rcvbuf are passed through to the clients, see
+        # McastClient.  stream_vci selects the streaming VCI loader and
+        # vci_store a persistent VCI cache (see vci_store.VCIStore), see
+        # ObsClient.
+        #
+        # If listen is False no sockets are opened (obs_client and
+        # ant_client are None), eg for restoring or replaying documents
+        # offline.  checkpoint is the file name of a journal (see the
+        # checkpoint module) all received documents are recorded in;
+        # call restore() to rebuild the state saved there.  archive is
+        # an archive.Archive (opened for appending) all received
+        # documents are also added to.  shm_store is a
+        # shm_store.ShmConfigStore each scan is published to (under its
+        # scanId) before handle_config or handle_subscan is called, so a
+        # scan is republished (same reference count, new generation, see
+        # SharedConfig.stale) whenever its stop times or subscans change;
+        # the scans of a dataset are released when it finishes.  Scans
+        # with streamed VCIs (stream_vci) are not published.
+        if listen:
+            client_args = dict(interface=interface, reuse_port=reuse_port,
+                               shard=shard, timestamps=timestamps,
+                               rcvbuf=rcvbuf)
+            self.obs_client = mcast_clients.ObsClient(self, group=obs_group,
+                                                      port=obs_port,
+                                                      stream_vci=stream_vci,
+                                                      vci_store=vci_store,
+                                                      **client_args)
+            self.ant_client = mcast_clients.AntClient(self, group=ant_group,
+                                                      port=ant_port,
+                                                      **client_args)
+        else:
+            self.obs_client = None
+            self.ant_client = None
+        self.checkpoint = None if checkpoint is None \
+            else Checkpoint(checkpoint)
+        self.archive = archive
+        self.shm_store = shm_store
+        self._restoring = False
         self._datasets = {}  # key is datasetId
         self.vci = {}       # key is configId
 
@@ -36,6 +107,36 @@ class Controller(object):
         # Redefine in derived classes as needed
         self.scans_require = ['obs', 'vci', 'ant', 'stop']
 
+        # Document access backend used by ScanConfig ('objectify' or
+        # 'etree', see the backends module).  The etree backend also reads
+        # the objectify trees produced by the clients.
+        self.scan_backend = 'objectify'
+
+        # SubBand/Antenna structures shared between scans with the same
+        # configuration.  Complete scans are attached to it before
+        # handle_config, which can check ScanConfig.changed to see what
+        # differs from the previous scan of the dataset.
+        self.config_cache = ConfigCache()
+
+        # Time index of the queued and handled scans of all live
+        # datasets, for "which scans are active at t" and "what starts
+        # next" queries (see ScanIndex.active, overlapping and
+        # next_start).  Scans are dropped when their dataset finishes.
+        self.scan_index = ScanIndex()
+
+        # Latency statistics, in seconds.  handle_latency is the time
+        # from arrival of the document that completed a scan (usually
+        # the obs document of the next scan, which gives its stop time,
+        # or an antenna table) to handle_config being called for it, ie
+        # the processing latency.  scan_latency is the time from arrival
+        # of the scan's own obs document to handle_config, which mostly
+        # reflects the scan length when 'stop' is required.  lead_time
+        # is the scan startTime minus the obs document arrival time
+        # (negative means the document arrived after the scan started).
+        self.handle_latency = Histogram(log_edges(), 'arrival-to-handle')
+        self.scan_latency = Histogram(log_edges(), 'scan-obs-to-handle')
+        self.lead_time = Histogram(signed_log_edges(), 'arrival-to-start')
+
     def run(self):
         try:
             logging.info('Starting controller...')
@@ -43,34 +144,65 @@ class Controller(object):
         except KeyboardInterrupt:
             logging.info('Exiting controller...')
 
+    def restore(self):
+        """Rebuild the datasets and VCIs saved in the checkpoint journal.
+        The handle_* methods are not called for the restored scans.
+        Returns the number of documents replayed."""
+        if self.checkpoint is None:
+            return 0
+        self._restoring = True
+        try:
+            n = self.checkpoint.replay(self)
+        finally:
+            self._restoring = False
+        logging.info('Restored {0} datasets from {1} documents'
+                     .format(len(self._datasets), n))
+        return n
+
     def dataset(self, dsid):
         if dsid not in list(self._datasets.keys()):
             self._datasets[dsid] = Dataset(dsid)
         return self._datasets[dsid]
 
-    def add_obs(self, obs):
+    def add_obs(self, obs, recv_time=None):
+        # recv_time is the arrival time (unix seconds) of the document,
+        # if known.
         dsid = obs.attrib['datasetId']
         cfgid = obs.attrib['configId']
         ds = self.dataset(dsid)
+        if not self._restoring:
+            if self.checkpoint is not None:
+                self.checkpoint.record_obs(obs, recv_time)
+            if self.archive is not None:
+                self.archive.add_obs(obs, recv_time)
 
         # Generate the scan config object for this scan
         config = ScanConfig(obs=obs, vci=self.vci[cfgid],
-                            requires=self.scans_require)
+                            requires=self.scans_require, recv_time=recv_time,
+                            backend=self.scan_backend)
+        if recv_time is not None and config.startTime > 0.0 and \
+                not self._restoring:
+            self.lead_time.add(mjd_to_unix(config.startTime) - recv_time)
 
         # Chek whether this is a subscan of an existing scan, add it if so
         is_subscan = False
         for scan in ds.queued:
             if scan.is_subscan(config):
                 is_subscan = True
-                scan.add_subscan(obs)
+                scan.add_subscan(obs, recv_time=recv_time)
+                self.scan_index.update(scan)
                 logging.debug('Added subscan {0} to queued scan {1}.'
                               .format(config.subscanNo, scan.scanId))
         for scan in ds.handled:
             if scan.is_subscan(config):
                 is_subscan = True
-                scan.add_subscan(obs)
+                scan.add_subscan(obs, recv_time=recv_time)
+                self.scan_index.update(scan)
+                self.config_cache.attach(scan)
                 # If the scan is already complete, also handle subscan
-                self.handle_subscan(scan)
+                if not self._restoring:
+                    self._publish(scan)
+                    self.handle_subscan(scan)
                 logging.debug('Added subscan {0} to handled scan {1}.'
                               .format(config.subscanNo, scan.scanId))
 
@@ -84,9 +216,13 @@ class Controller(object):
         # call handle_subscan again.
         for scan in ds.handled:
             if scan.update_stopTime(config.startTime):
-                self.handle_subscan(scan)
+                self.scan_index.update(scan)
+                if not self._restoring:
+                    self._publish(scan)
+                    self.handle_subscan(scan)
         for scan in ds.queued:
-            scan.update_stopTime(config.startTime)
+            if scan.update_stopTime(config.startTime):
+                self.scan_index.update(scan)
 
         # The end of an SB is marked by a special Observation document
         # with source name FINISH, and intent suppress_data=True.  Check
@@ -98,11 +234,12 @@ class Controller(object):
         # Add the new scan to the queue, unless it's a FINISH or subscan
         if not is_finish and not is_subscan:
             ds.queued.append(config)
+            self.scan_index.add(config)
             logging.debug('Queued scan {0}, scan {1}.'
                           .format(config.scan_intent, config.scanId))
 
         # Handle any complete scans from queue
-        self.clean_queue(ds)
+        self.clean_queue(ds, recv_time)
 
         # TODO handle any newly-completed subscans, need to figure out
         # how to deal with this.. I think in principle these could be 
@@ -116,31 +253,62 @@ class Controller(object):
         if is_finish:
             logging.debug('Finishing dataset {0}'.format(ds.datasetId))
             ds.stopTime = config.startTime
-            self.handle_finish(ds)
+            if not self._restoring:
+                logging.info('Latency summary:\n' + self.latency_report())
+                self.handle_finish(ds)
             self._datasets.pop(ds.datasetId)
+            for scan in ds.handled + ds.queued:
+                self.scan_index.remove(scan)
+            if self.shm_store is not None and not self._restoring:
+                self.shm_store.release_dataset(ds.datasetId)
+            if self.checkpoint is not None and not self._restoring:
+                self.checkpoint.record_finish(ds.datasetId)
 
     def add_vci(self, vci):
         self.vci[vci.attrib['configId']] = vci
+        if not self._restoring:
+            if self.checkpoint is not None:
+                self.checkpoint.record_vci(vci)
+            if self.archive is not None:
+                self.archive.add_vci(vci)
 
-    def add_ant(self, ant):
+    def add_ant(self, ant, recv_time=None):
+        # recv_time is the arrival time (unix seconds) of the document,
+        # if known.
         dsid = ant.attrib['datasetId']
         ds = self.dataset(dsid)
         ds.ant = ant
+        if not self._restoring:
+            if self.checkpoint is not None:
+                self.checkpoint.record_ant(ant, recv_time)
+            if self.archive is not None:
+                self.archive.add_ant(ant, recv_time)
         # Update anything in the queue that does not yet have antenna info
         for scan in ds.queued:
             if not scan.has_ant:
                 scan.set_ant(ant)
         # Handle any now-complete scans in the queue
-        self.clean_queue(ds)
+        self.clean_queue(ds, recv_time)
 
-    def clean_queue(self, ds):
+    def clean_queue(self, ds, recv_time=None):
         # Calls handle_config on any queued scans that now have complete
         # info available.  Moves these from the queue into the list of
-        # already-handled scans.
+        # already-handled scans.  recv_time is the arrival time of the
+        # document being added, which completed these scans.
         complete = [s for s in ds.queued if s.is_complete()]
         for scan in complete:
             logging.debug('Handling complete scan {0}'.format(scan.scanId))
-            self.handle_config(scan)
+            self.config_cache.attach(scan)
+            scan.changed = changed_parts(
+                ds.handled[-1] if ds.handled else None, scan)
+            if not self._restoring:
+                now = time.time()
+                if recv_time is not None:
+                    self.handle_latency.add(now - recv_time)
+                if scan.recvTime is not None:
+                    self.scan_latency.add(now - scan.recvTime)
+                self._publish(scan)
+                self.handle_config(scan)
             ds.handled.append(scan)
             ds.queued.remove(scan)
 
@@ -154,6 +322,21 @@ class Controller(object):
                 s.scanId, s.startTime,
                 s.stopTime if s.stopTime is not None else 0.0))
 
+    def _publish(self, scan):
+        if self.shm_store is not None:
+            try:
+                self.shm_store.publish(scan)
+            except ValueError as e:
+                logger.warning(str(e))
+            except Exception:
+                logger.exception('Could not publish scan {0} to shared '
+                                 'memory'.format(scan.scanId))
+
+    def latency_report(self):
+        # Return a string summarizing the latency histograms.
+        return '\n'.join([str(self.handle_latency), str(self.scan_latency),
+                          str(self.lead_time)])
+
     def handle_config(self, config):
         # Implement in derived class.  This will be called with the
         # ScanConfig object as argument every time a scan with complete
@@ -0,0 +1,233 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import re
+import datetime
+
+import numpy as np
+from lxml import etree
+
+from .mcast_clients import McastClient, _xsd_dir
+from .ringbuffer import RingBuffer
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Station board delay models (vciStbDelayModel documents).
+#
+# Each document holds polynomial delay models for up to two basebands,
+# optionally with per-subband models, valid from the document epoch
+# until the next model arrives.  The polynomial is evaluated as
+#
+#   delay(t) = sum_i cff[i] * dt**i,  dt = (t - t0) in seconds
+#
+# with t0 (MJD) defaulting to the epoch.  The coefficients are used in
+# the units they are sent in.
+#
+# The document does not say which antenna it is for, so an antenna key
+# is given when parsing (eg by the client receiving that antenna's
+# stream), falling back to the idString attribute.
+#
+# DelayModelStore keeps the models of each (antenna, bbId, sbId) in a
+# RingBuffer bounded by count and age, and evaluates them for all
+# antennas over arrays of times.
+
+_delay_xsd = os.path.join(_xsd_dir, 'vci', 'vciStbDelayModel.xsd')
+_delay_schema = etree.XMLSchema(file=_delay_xsd)
+_delay_parser = etree.XMLParser(schema=_delay_schema)
+
+_mjd_ordinal = datetime.date(1858, 11, 17).toordinal()
+_iso_re = re.compile(r'\s*(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d(?:\.\d*)?)'
+                     r'(Z|[-+]\d\d:?\d\d)?\s*$')
+
+
+def iso_to_mjd(iso):
+    """Convert an ISO 8601 (xs:dateTime) string to MJD (UTC)."""
+    m = _iso_re.match(iso)
+    if m is None:
+        raise ValueError('Invalid dateTime {0!r}'.format(iso))
+    (year, month, day, hour, minute) = [int(v) for v in m.groups()[:5]]
+    sec = float(m.group(6))
+    mjd = (datetime.date(year, month, day).toordinal() - _mjd_ordinal +
+           (hour * 3600.0 + minute * 60.0 + sec) / 86400.0)
+    tz = m.group(7)
+    if tz and tz != 'Z':
+        offset = int(tz[1:3]) * 60 + int(tz[-2:])
+        mjd -= (1 if tz[0] == '+' else -1) * offset / 1440.0
+    return mjd
+
+
+def polyval_rows(cff, x):
+    """Evaluate a polynomial for each row: sum_i cff[..., i] * x**i.
+    cff has shape (..., ncff) and x broadcasts against cff[..., 0]."""
+    cff = np.asarray(cff)
+    result = np.array(cff[..., -1], dtype=np.float64)
+    for i in range(cff.shape[-1] - 2, -1, -1):
+        result = result * x + cff[..., i]
+    return result
+
+
+class DelayModel(object):
+    """Decoded vciStbDelayModel document.
+
+    Attributes
+    ----------
+    antenna : antenna key (str) or None
+    epoch : MJD the models become valid
+    t0 : MJD of the polynomial origin
+    bbId, sbId : int arrays, one per model (sbId is -1 for baseband
+        models)
+    cff : (nmodel, ncff) array of coefficients, zero padded
+    """
+    __slots__ = ('antenna', 'epoch', 't0', 'bbId', 'sbId', 'cff',
+                 'sequenceNum')
+
+    def __init__(self, antenna, epoch, t0, bbId, sbId, cff,
+                 sequenceNum=None):
+        self.antenna = antenna
+        self.epoch = epoch
+        self.t0 = t0
+        self.bbId = np.asarray(bbId, dtype=np.int64)
+        self.sbId = np.asarray(sbId, dtype=np.int64)
+        self.cff = np.asarray(cff, dtype=np.float64)
+        self.sequenceNum = sequenceNum
+
+    def evaluate(self, mjd):
+        """Delays of all models at time(s) mjd, shape (nmodel,) +
+        mjd.shape."""
+        dt = (np.asarray(mjd, dtype=np.float64) - self.t0) * 86400.0
+        (nmodel, ncff) = self.cff.shape
+        cff = self.cff.reshape((nmodel, ) + (1, ) * np.ndim(dt) + (ncff, ))
+        return polyval_rows(cff, dt)
+
+
+def _coefficients(elem):
+    cffs = [(int(c.get('index')), float(c.get('cff')))
+            for c in elem.iterfind('modelCff')]
+    out = np.zeros(max(i for (i, v) in cffs) + 1)
+    for (i, v) in cffs:
+        out[i] = v
+    return out
+
+
+def parse_delay_model(doc, antenna=None):
+    """Parse a delay model document, given as bytes, a filename or a
+    parsed element, into a DelayModel."""
+    if isinstance(doc, (bytes, type(b''))):
+        root = etree.fromstring(doc, _delay_parser)
+    elif hasattr(doc, 'tag'):
+        root = doc
+    else:
+        root = etree.parse(doc, _delay_parser).getroot()
+    epoch = iso_to_mjd(root.get('epoch'))
+    t0 = float(root.get('t0', epoch))
+    seq = root.get('sequenceNum')
+    bbIds = []
+    sbIds = []
+    cffs = []
+    for bb in root.iterfind('bbDelayModel'):
+        bbId = int(bb.get('bbId'))
+        bbIds.append(bbId)
+        sbIds.append(-1)
+        cffs.append(_coefficients(bb))
+        for sb in bb.iterfind('sbDelayModel'):
+            bbIds.append(bbId)
+            sbIds.append(int(sb.get('sbId')))
+            cffs.append(_coefficients(sb))
+    ncff = max(len(c) for c in cffs)
+    cff = np.zeros((len(cffs), ncff))
+    for (i, c) in enumerate(cffs):
+        cff[i, :len(c)] = c
+    if antenna is None:
+        antenna = root.get('idString')
+    return DelayModel(antenna, epoch, t0, bbIds, sbIds, cff,
+                      None if seq is None else int(seq))
+
+
+class DelayModelStore(object):
+    """Recent delay models for each (antenna, bbId, sbId).
+
+    capacity: number of models kept for each.
+    max_age: models older than this (seconds) relative to the newest of
+        the same (antenna, bbId, sbId) are dropped.
+    ncff: maximum number of coefficients.
+    """
+
+    def __init__(self, capacity=64, max_age=None, ncff=8):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.ncff = ncff
+        self._buffers = {}
+
+    def add(self, model):
+        if model.cff.shape[1] > self.ncff:
+            raise ValueError('Delay model has {0} coefficients, at most {1} '
+                             'are supported'.format(model.cff.shape[1],
+                                                    self.ncff))
+        max_age = None if self.max_age is None else self.max_age / 86400.0
+        for (bbId, sbId, cff) in zip(model.bbId, model.sbId, model.cff):
+            key = (model.antenna, int(bbId), int(sbId))
+            try:
+                buf = self._buffers[key]
+            except KeyError:
+                buf = RingBuffer(self.capacity, (self.ncff + 1, ),
+                                 max_age=max_age)
+                self._buffers[key] = buf
+            row = np.zeros(self.ncff + 1)
+            row[0] = model.t0
+            row[1:1 + len(cff)] = cff
+            buf.append(model.epoch, row)
+
+    @property
+    def antennas(self):
+        return sorted(set(k[0] for k in self._buffers))
+
+    def models(self, antenna, bbId=0, sbId=-1):
+        """(epochs, t0s, cffs) arrays of the stored models."""
+        buf = self._buffers[(antenna, bbId, sbId)]
+        values = buf.values()
+        return (buf.times(), values[:, 0], values[:, 1:])
+
+    def evaluate(self, mjd, bbId=0, sbId=-1, antennas=None):
+        """Delays for each antenna at each time in mjd, using the model
+        in effect at that time.  Returns an (nant, ntime) array, NaN where
+        no model is available.  antennas defaults to self.antennas."""
+        mjd = np.atleast_1d(np.asarray(mjd, dtype=np.float64))
+        if antennas is None:
+            antennas = self.antennas
+        out = np.full((len(antennas), len(mjd)), np.nan)
+        for (i, ant) in enumerate(antennas):
+            buf = self._buffers.get((ant, bbId, sbId))
+            if buf is None or not len(buf):
+                continue
+            idx = buf.lookup(mjd)
+            ok = idx >= 0
+            rows = buf.values()[idx[ok]]
+            dt = (mjd[ok] - rows[:, 0]) * 86400.0
+            out[i, ok] = polyval_rows(rows[:, 1:], dt)
+        return out
+
+
+class DelayModelClient(McastClient):
+    """Receives delay model XML.
+
+    Each document is parsed into a DelayModel for the given antenna (or
+    the document idString if antenna is None) and added to store, if
+    given.  The group and port must be given; other keyword arguments
+    are passed to McastClient.
+    """
+
+    def __init__(self, group, port, store=None, antenna=None, **kwargs):
+        McastClient.__init__(self, group, port, 'delay', **kwargs)
+        self.store = store
+        self.antenna = antenna
+
+    def parse(self):
+        model = parse_delay_model(self.read, antenna=self.antenna)
+        logger.info('Read delay model antenna={0} epoch={1}'
+                    .format(model.antenna, model.epoch))
+        if self.store is not None:
+            self.store.add(model)
@@ -0,0 +1,106 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import numpy as np
+
+from .backends import get_backend
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Earth orientation parameters from the EopSet of the
+# AntennaPropertyTable.
+#
+# The EopSet has one eopday element per day, with the epoch (MJD, 0h
+# UTC), TAI-UTC (s), UT1-UTC (s) and the polar motion x_pole, y_pole
+# (arcsec).  EopTable holds these as arrays and interpolates them
+# linearly, vectorized over arrays of MJD.  Times outside the table are
+# clamped to the first or last day.
+#
+# TAI-UTC is a step function changing at 0h UTC, and UT1-UTC jumps by
+# one second along with it at a leap second, so UT1-UTC is interpolated
+# as UT1-TAI (which is continuous) and the TAI-UTC in effect is then
+# added back.
+
+
+def gmst(mjd_ut1):
+    """Greenwich mean sidereal time (radians) for UT1 time(s) given as
+    MJD (IAU 1982 expression)."""
+    t = (np.asarray(mjd_ut1, dtype=np.float64) - 51544.5) / 36525.0
+    s = (67310.54841 + (876600.0 * 3600.0 + 8640184.812866) * t
+         + 0.093104 * t ** 2 - 6.2e-6 * t ** 3)
+    return 2.0 * np.pi * np.mod(s / 86400.0, 1.0)
+
+
+class EopTable(object):
+    """Earth orientation parameters, by day.
+
+    Attributes
+    ----------
+    epoch : array of MJD (UTC) of each entry
+    tai_utc, ut1_utc : arrays of TAI-UTC and UT1-UTC (s)
+    x_pole, y_pole : arrays of polar motion (arcsec)
+    """
+
+    def __init__(self, epoch, tai_utc, ut1_utc, x_pole, y_pole):
+        order = np.argsort(np.asarray(epoch, dtype=np.float64),
+                           kind='mergesort')
+        (self.epoch, self.tai_utc, self.ut1_utc, self.x_pole,
+         self.y_pole) = (np.asarray(v, dtype=np.float64)[order]
+                         for v in (epoch, tai_utc, ut1_utc, x_pole, y_pole))
+        self._ut1_tai = self.ut1_utc - self.tai_utc
+
+    @classmethod
+    def from_ant(cls, ant, backend='etree'):
+        """EopTable from a parsed AntennaPropertyTable document.  The
+        default etree backend reads both objectify and etree trees.
+        Returns None if the document has no EopSet entries."""
+        rows = get_backend(backend).eop(ant)
+        if not rows:
+            return None
+        return cls(*zip(*rows))
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def _check(self, mjd):
+        mjd = np.asarray(mjd, dtype=np.float64)
+        if mjd.size and (mjd.min() < self.epoch[0] or
+                         mjd.max() > self.epoch[-1] + 1.0):
+            logger.debug('EOP values requested outside of table '
+                         '({0}-{1})'.format(self.epoch[0], self.epoch[-1]))
+        return mjd
+
+    def tai_utc_at(self, mjd):
+        """TAI-UTC (s) in effect at UTC time(s) mjd."""
+        mjd = self._check(mjd)
+        idx = np.searchsorted(self.epoch, mjd, side='right') - 1
+        return self.tai_utc[np.clip(idx, 0, len(self.epoch) - 1)]
+
+    def ut1_utc_at(self, mjd):
+        """UT1-UTC (s) at UTC time(s) mjd."""
+        mjd = self._check(mjd)
+        return np.interp(mjd, self.epoch, self._ut1_tai) + \
+            self.tai_utc_at(mjd)
+
+    def polar_motion(self, mjd):
+        """Polar motion (x, y) in arcsec at UTC time(s) mjd."""
+        mjd = self._check(mjd)
+        return (np.interp(mjd, self.epoch, self.x_pole),
+                np.interp(mjd, self.epoch, self.y_pole))
+
+    def ut1(self, mjd):
+        """UT1 as MJD for UTC time(s) mjd."""
+        mjd = np.asarray(mjd, dtype=np.float64)
+        return mjd + self.ut1_utc_at(mjd) / 86400.0
+
+    def gmst(self, mjd):
+        """Greenwich mean sidereal time (radians) at UTC time(s) mjd."""
+        return gmst(self.ut1(mjd))
+
+    def lst(self, mjd, longitude):
+        """Local mean sidereal time (radians) at UTC time(s) mjd for
+        east longitude (radians)."""
+        return np.mod(self.gmst(mjd) + longitude, 2.0 * np.pi)
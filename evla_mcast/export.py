@@ -0,0 +1,243 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import json
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Columnar export of scan metadata for offline analysis.
+#
+# ScanExporter flattens ScanConfigs into three tables of NumPy structured
+# arrays:
+#
+#   scans: one row per subscan (scan is the row of the first subscan)
+#   subbands: one row per subband of each scan (from the first subscan)
+#   antennas: one row per antenna of each scan
+#
+# with subbands and antennas linked to their scan by row number.  String
+# values (datasetId, source, receiver, ...) are stored as int32 codes
+# into a string table shared by all tables, so that selecting on them is
+# an integer comparison.  Rows are buffered and appended to raw binary
+# files (<table>.bin), so exports of any size are written in a streaming
+# fashion; the dtypes and string table are saved in meta.json when the
+# exporter is closed.  load() memory-maps the tables back.
+#
+# Only NumPy is used.  The tables convert directly to other columnar
+# formats (eg pandas.DataFrame(tables.scans)) where those are available.
+
+FORMAT_VERSION = 1
+
+_string = np.int32
+
+TABLES = dict(
+    scans=np.dtype([
+        ('scan', np.int64), ('datasetId', _string), ('configId', _string),
+        ('scanNo', np.int32), ('subscanNo', np.int32),
+        ('startTime', np.float64), ('stopTime', np.float64),
+        ('recvTime', np.float64), ('source', _string),
+        ('ra_deg', np.float64), ('dec_deg', np.float64),
+        ('startLST', np.float64), ('scan_intent', _string),
+        ('projid', _string), ('observer', _string),
+        ('numAntenna', np.int32), ('nsubband', np.int32)]),
+    subbands=np.dtype([
+        ('scan', np.int64), ('IFid', _string), ('swIndex', np.int32),
+        ('sbid', np.int32), ('bw', np.float64),
+        ('bb_center_freq', np.float64), ('sky_center_freq', np.float64),
+        ('receiver', _string), ('npp', np.int32),
+        ('spectralChannels', np.int32), ('hw_time_res', np.float64),
+        ('final_time_res', np.float64), ('vdif', np.bool_)]),
+    antennas=np.dtype([
+        ('scan', np.int64), ('name', _string), ('widarID', np.int32),
+        ('pad', _string), ('X', np.float64), ('Y', np.float64),
+        ('Z', np.float64)]),
+)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _nan(v):
+    return np.nan if v is None else v
+
+
+class ScanExporter(object):
+    """Streaming writer of scan tables in directory path.
+
+    append: add to an existing export instead of replacing it.
+    buffer_rows: rows buffered per table before writing.
+    """
+
+    def __init__(self, path, append=False, buffer_rows=10000):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._strings = []
+        self._codes = {}
+        self._rows = dict((name, []) for name in TABLES)
+        self._nrows = dict((name, 0) for name in TABLES)
+        mode = 'wb'
+        if append and os.path.exists(os.path.join(path, 'meta.json')):
+            meta = _read_meta(path)
+            for s in meta['strings']:
+                self._code(s)
+            self._nrows.update(meta['rows'])
+            mode = 'ab'
+        self._files = dict((name, open(self._fname(name), mode))
+                           for name in TABLES)
+        for (name, f) in self._files.items():
+            # Drop rows written after the last close (eg by a crash)
+            f.truncate(self._nrows[name] * TABLES[name].itemsize)
+            f.seek(0, 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _fname(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _code(self, s):
+        if s is None:
+            return -1
+        s = str(s)
+        try:
+            return self._codes[s]
+        except KeyError:
+            self._codes[s] = len(self._strings)
+            self._strings.append(s)
+            return self._codes[s]
+
+    @property
+    def nrows(self):
+        """Number of rows of the scans table (one per subscan)."""
+        return self._nrows['scans'] + len(self._rows['scans'])
+
+    def _append(self, name, row):
+        rows = self._rows[name]
+        rows.append(row)
+        if len(rows) >= self.buffer_rows:
+            self._flush(name)
+
+    def _flush(self, name):
+        rows = self._rows[name]
+        if rows:
+            np.array(rows, dtype=TABLES[name]).tofile(self._files[name])
+            self._nrows[name] += len(rows)
+            self._rows[name] = []
+
+    def add(self, config):
+        """Add a ScanConfig and its subscans.  Returns the scan row
+        number."""
+        scan = self.nrows
+        subbands = config.get_subbands() if config.has_vci else []
+        antennas = config.get_antennas() \
+            if config.has_ant and config.has_vci else []
+        c = self._code
+        for sc in config.subscans:
+            self._append('scans', (
+                scan, c(sc.datasetId), c(sc.configId), sc.scanNo,
+                sc.subscanNo, sc.startTime, _nan(sc.stopTime),
+                _nan(sc.recvTime), c(sc.source), sc.ra_deg, sc.dec_deg,
+                sc.startLST, c(sc.scan_intent), c(sc.projid),
+                c(sc.observer), sc.numAntenna if sc.has_vci else 0,
+                len(subbands)))
+        for sub in subbands:
+            self._append('subbands', (
+                scan, c(sub.IFid), sub.swIndex, sub.sbid, sub.bw,
+                sub.bb_center_freq, sub.sky_center_freq, c(sub.receiver),
+                sub.npp, sub.spectralChannels, sub.hw_time_res,
+                sub.final_time_res, sub.vdif is not None))
+        for ant in antennas:
+            self._append('antennas', (
+                scan, c(ant.name), int(ant.widarID), c(ant.pad), ant.X,
+                ant.Y, ant.Z))
+        return scan
+
+    def flush(self):
+        """Write all buffered rows and the metadata."""
+        for name in TABLES:
+            self._flush(name)
+            self._files[name].flush()
+        meta = dict(version=FORMAT_VERSION, rows=self._nrows,
+                    dtypes=dict((name, dt.descr)
+                                for (name, dt) in TABLES.items()),
+                    strings=self._strings)
+        fname = os.path.join(self.path, 'meta.json')
+        with open(fname + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(str(json.dumps(meta)))
+        os.rename(fname + '.tmp', fname)
+
+    def close(self):
+        if self._files is None:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = None
+
+
+def export_scans(configs, path, append=False):
+    """Export an iterable of ScanConfigs.  Returns the number of scans
+    added."""
+    n = 0
+    with ScanExporter(path, append=append) as exporter:
+        for config in configs:
+            exporter.add(config)
+            n += 1
+    return n
+
+
+class ScanTables(object):
+    """Memory-mapped scan tables written by ScanExporter.
+
+    Attributes
+    ----------
+    scans, subbands, antennas : read-only structured arrays
+    strings : array of the string table
+    """
+
+    def __init__(self, path):
+        meta = _read_meta(path)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError('Unsupported export version {0}'
+                             .format(meta['version']))
+        self.path = path
+        self.strings = np.array(meta['strings'], dtype=str)
+        self._codes = dict((s, i) for (i, s) in enumerate(meta['strings']))
+        for name in TABLES:
+            nrows = meta['rows'][name]
+            dtype = np.dtype([tuple(d) for d in meta['dtypes'][name]])
+            if nrows:
+                table = np.memmap(os.path.join(path, name + '.bin'),
+                                  dtype=dtype, mode='r', shape=(nrows, ))
+            else:
+                table = np.zeros(0, dtype=dtype)
+            setattr(self, name, table)
+
+    def code(self, s):
+        """String table code of s, or -1 if it does not occur."""
+        return self._codes.get(s, -1)
+
+    def decode(self, codes):
+        """Strings for an array of codes (None for -1)."""
+        codes = np.asarray(codes)
+        out = np.empty(codes.shape, dtype=object)
+        ok = codes >= 0
+        out[ok] = self.strings[codes[ok]]
+        return out
+
+
+def load(path):
+    """Memory-map the scan tables exported to path."""
+    return ScanTables(path)
@@ -0,0 +1,132 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import numpy as np
+
+from .angles import d2r
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Array geometry: antenna positions, baselines and UVW coordinates.
+#
+# Antenna positions are the X/Y/Z (m) of the AntennaPropertyTable,
+# which are offsets from the array reference position along the
+# Earth-fixed (ITRF) axes: X towards longitude 0 on the equator, Y
+# towards longitude 90E and Z towards the north pole.  UVW for a
+# baseline vector B in these axes, for a source at Greenwich hour angle
+# H and declination d, are (Thompson, Moran & Swenson eq. 4.1)
+#
+#   u =  sin(H) Bx + cos(H) By
+#   v = -sin(d) cos(H) Bx + sin(d) sin(H) By + cos(d) Bz
+#   w =  cos(d) cos(H) Bx - cos(d) sin(H) By + sin(d) Bz
+#
+# with H = LST - longitude - RA.  No precession, nutation, polar motion
+# or aberration corrections are applied; this is meant for quick
+# (~arcsec level) geometry in real-time processing, not for delay
+# models.
+#
+# Baselines are in BDF order, (ant1, ant2) for ant2 = 1..N-1 and
+# ant1 = 0..ant2-1, and the baseline vector is xyz[ant2] - xyz[ant1].
+#
+# Everything that does not depend on time is kept in an ArrayGeometry
+# object, cached by (antenna positions, ra, dec) so that all subscans
+# and repeated scans of a source share it.
+
+VLA_LONGITUDE = d2r(-107.6177275)  # radians, east positive
+
+# Ratio of sidereal to solar (UT1) time.
+SIDEREAL_RATE = 1.002737909350795
+
+
+def baseline_pairs(nant):
+    """Antenna index arrays (ant1, ant2) for all baselines in BDF
+    order."""
+    (ant1, ant2) = np.tril_indices(nant, -1)
+    # tril_indices gives (row, col) with col < row, in row order.
+    return (ant2, ant1)
+
+
+def uvw(bl, ha, dec):
+    """UVW coordinates (same units as bl) of baseline vectors.
+
+    bl is an (nbl, 3) array of baseline vectors in Earth-fixed axes, ha
+    the Greenwich hour angle(s) and dec the declination (radians).  ha
+    may be an array of nt values, in which case the result has shape
+    (nt, nbl, 3), otherwise (nbl, 3).
+    """
+    ha = np.asarray(ha, dtype=np.float64)
+    (sh, ch) = (np.sin(ha), np.cos(ha))
+    (sd, cd) = (np.sin(dec), np.cos(dec))
+    zero = np.zeros_like(ha)
+    # Rotation matrices, shape ha.shape + (3, 3)
+    rot = np.stack([np.stack([sh, ch, zero], axis=-1),
+                    np.stack([-sd * ch, sd * sh, zero + cd], axis=-1),
+                    np.stack([cd * ch, -cd * sh, zero + sd], axis=-1)],
+                   axis=-2)
+    return np.einsum('...ij,bj->...bi', rot, bl)
+
+
+class ArrayGeometry(object):
+    """Antenna positions, baselines and source position for UVW
+    calculations.
+
+    Attributes
+    ----------
+    names : list of antenna names, in BDF order
+    xyz : (nant, 3) array of antenna positions (m)
+    ant1, ant2 : (nbl, ) arrays of antenna indices of each baseline
+    bl : (nbl, 3) array of baseline vectors xyz[ant2] - xyz[ant1] (m)
+    ra, dec : source position (radians)
+    """
+
+    def __init__(self, names, xyz, ra, dec, longitude=VLA_LONGITUDE):
+        self.names = list(names)
+        self.xyz = np.array(xyz, dtype=np.float64).reshape(-1, 3)
+        (self.ant1, self.ant2) = baseline_pairs(len(self.names))
+        self.bl = np.ascontiguousarray(self.xyz[self.ant2] -
+                                       self.xyz[self.ant1])
+        self.ra = float(ra)
+        self.dec = float(dec)
+        self.longitude = float(longitude)
+
+    @property
+    def nant(self):
+        return len(self.names)
+
+    @property
+    def nbl(self):
+        return len(self.ant1)
+
+    def hour_angle(self, lst):
+        """Greenwich hour angle of the source for local sidereal
+        time(s) lst (radians)."""
+        return np.asarray(lst) - self.longitude - self.ra
+
+    def uvw(self, lst):
+        """UVW (m) of all baselines at local sidereal time(s) lst
+        (radians).  See geometry.uvw for the shape of the result."""
+        return uvw(self.bl, self.hour_angle(lst), self.dec)
+
+
+# ArrayGeometry objects keyed by (antenna positions, ra, dec).
+_geometry_cache = {}
+_geometry_cache_size = 256
+
+
+def get_geometry(antennas, ra, dec):
+    """Cached ArrayGeometry for a list of Antenna objects (in BDF order)
+    and source position (radians)."""
+    key = (tuple((a.name, a.X, a.Y, a.Z) for a in antennas), ra, dec)
+    try:
+        return _geometry_cache[key]
+    except KeyError:
+        pass
+    geom = ArrayGeometry([a.name for a in antennas],
+                         [a.xyz for a in antennas], ra, dec)
+    if len(_geometry_cache) >= _geometry_cache_size:
+        _geometry_cache.clear()
+    _geometry_cache[key] = geom
+    return geom
@@ -0,0 +1,117 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import bisect
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Simple fixed-bin histograms used to keep track of message latencies
+# (time from datagram arrival to handle_config, and how far ahead of the
+# scan start time each Observation document arrives).  Values are in
+# seconds.  Bins are fixed up front so adding a value is cheap and
+# memory use does not grow over a long run.
+
+_mjd_unix_epoch = 40587.0
+
+
+def mjd_to_unix(mjd):
+    """Convert MJD (UTC) to unix time in seconds."""
+    return (mjd - _mjd_unix_epoch) * 86400.0
+
+
+def unix_to_mjd(t):
+    """Convert unix time in seconds to MJD (UTC)."""
+    return t / 86400.0 + _mjd_unix_epoch
+
+
+def log_edges(lo=1e-4, hi=1e4, per_decade=4):
+    """Return logarithmically spaced bin edges from lo to hi."""
+    edges = []
+    e = lo
+    step = 10.0 ** (1.0 / per_decade)
+    while e < hi * (1.0 + 1e-9):
+        edges.append(e)
+        e *= step
+    return edges
+
+
+def signed_log_edges(lo=1e-2, hi=1e4, per_decade=4):
+    """Return bin edges symmetric about zero, logarithmically spaced in
+    magnitude from lo to hi on each side."""
+    pos = log_edges(lo, hi, per_decade)
+    return [-e for e in reversed(pos)] + pos
+
+
+class Histogram(object):
+    """Histogram of values with fixed bin edges.  Values below the first
+    edge or above the last are counted in the underflow and overflow
+    counters."""
+
+    def __init__(self, edges, name=''):
+        self.name = name
+        self.edges = list(edges)
+        self.reset()
+
+    def reset(self):
+        self.counts = [0, ] * (len(self.edges) - 1)
+        self.underflow = 0
+        self.overflow = 0
+        self.n = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.n += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        idx = bisect.bisect_right(self.edges, value) - 1
+        if idx < 0:
+            self.underflow += 1
+        elif idx >= len(self.counts):
+            self.overflow += 1
+        else:
+            self.counts[idx] += 1
+
+    @property
+    def mean(self):
+        if self.n == 0:
+            return None
+        return self.total / self.n
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100), taken as the upper edge of
+        the bin containing it."""
+        if self.n == 0:
+            return None
+        target = q / 100.0 * self.n
+        cum = self.underflow
+        if cum >= target:
+            return self.edges[0]
+        for (count, edge) in zip(self.counts, self.edges[1:]):
+            cum += count
+            if cum >= target:
+                return edge
+        return self.max
+
+    def __str__(self):
+        if self.n == 0:
+            return '%s: no values' % self.name
+        lines = ['%s: n=%d mean=%.6f min=%.6f max=%.6f p50<=%.6g p99<=%.6g'
+                 % (self.name, self.n, self.mean, self.min, self.max,
+                    self.percentile(50), self.percentile(99))]
+        if self.underflow:
+            lines.append('  < %10.4g : %d' % (self.edges[0], self.underflow))
+        for (lo, hi, count) in zip(self.edges[:-1], self.edges[1:],
+                                   self.counts):
+            if count:
+                lines.append('  %10.4g - %10.4g : %d' % (lo, hi, count))
+        if self.overflow:
+            lines.append('  > %10.4g : %d' % (self.edges[-1], self.overflow))
+        return '\n'.join(lines)
@@ -5,6 +5,10 @@ from io import open
 from future.moves.urllib.request import urlopen
 
 import os
+import sys
+import re
+import zlib
+import time
 import struct
 import logging
 import asyncore
@@ -12,6 +16,9 @@ import socket
 import contextlib
 from lxml import etree, objectify
 
+from . import vci_stream
+from .vci_store import VCIStore
+
 import logging
 logger = logging.getLogger('mcast_clients')
 
@@ -19,13 +26,21 @@ _install_dir = os.path.abspath(os.path.dirname(__file__))
 _xsd_dir = os.path.join(_install_dir, 'xsd')
 
 _obs_xsd = os.path.join(_xsd_dir, 'observe', 'Observation.xsd')
-_obs_parser = objectify.makeparser(schema=etree.XMLSchema(file=_obs_xsd))
+_obs_schema = etree.XMLSchema(file=_obs_xsd)
+_obs_parser = objectify.makeparser(schema=_obs_schema)
 
 _vci_xsd = os.path.join(_xsd_dir, 'vci', 'vciRequest.xsd')
-_vci_parser = objectify.makeparser(schema=etree.XMLSchema(file=_vci_xsd))
+_vci_schema = etree.XMLSchema(file=_vci_xsd)
+_vci_parser = objectify.makeparser(schema=_vci_schema)
 
 _ant_xsd = os.path.join(_xsd_dir, 'observe', 'AntennaPropertyTable.xsd')
-_ant_parser = objectify.makeparser(schema=etree.XMLSchema(file=_ant_xsd))
+_ant_schema = etree.XMLSchema(file=_ant_xsd)
+_ant_parser = objectify.makeparser(schema=_ant_schema)
+
+# Plain etree parsers, used by the 'etree' ScanConfig backend
+_obs_etree_parser = etree.XMLParser(schema=_obs_schema)
+_vci_etree_parser = etree.XMLParser(schema=_vci_schema)
+_ant_etree_parser = etree.XMLParser(schema=_ant_schema)
 
 
 # Based on code originally in async_mcast.py by PD and S. Ransom
@@ -33,24 +48,144 @@ _ant_parser = objectify.makeparser(schema=etree.XMLSchema(file=_ant_xsd))
 # These classes set up networking, and parse incoming Obs and VCI
 # documents into appropriate data structures.
 
+# Default multicast groups and ports used at the VLA.
+OBS_GROUP = '239.192.3.2'
+OBS_PORT = 53001
+ANT_GROUP = '239.192.3.1'
+ANT_PORT = 53000
+
+# Used to pick out the datasetId without a full parse, for sharding.
+_datasetId_re = re.compile(br'datasetId="([^"]*)"')
+
+# Kernel receive timestamps (Linux).  Where the socket module does not
+# provide the constant (other platforms, older Python versions) or
+# recvmsg(), timestamps are disabled.
+_SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', None)
+_timespec = struct.Struct('@ll')
+
+
 class McastClient(asyncore.dispatcher):
-    """Generic class to receive the multicast XML docs."""
+    """Generic class to receive the multicast XML docs.
+
+    group, port: The multicast group (IPv4 or IPv6) and port to listen on.
+
+    interface: The network interface used for the group membership.  May
+        be given as a local IPv4 address (eg '10.80.200.1') or an interface
+        name (eg 'eth1', 'lo').  For IPv6 groups only interface names are
+        accepted.  If None, the kernel picks the interface (equivalent to
+        INADDR_ANY).
+
+    reuse_port: If True, set SO_REUSEPORT so that several receiver
+        processes on one host may listen on the same group and port.  Note
+        the kernel delivers a copy of each multicast datagram to every such
+        socket, so to share load between processes also set shard.
+
+    shard: Optional (index, count) tuple.  If given, only documents whose
+        datasetId hashes (crc32) to index modulo count are parsed; others
+        are dropped before any XML processing.  Documents without a
+        datasetId are always parsed.
+
+    timestamps: If True, enable SO_TIMESTAMPNS and receive with recvmsg()
+        so that recv_time is the kernel arrival time of each datagram.
+        Otherwise recv_time is taken from time.time() just after the
+        datagram is read.  Kernel timestamps are only available on Linux;
+        elsewhere a warning is logged and time.time() is used.  Either way recv_time is unix time in seconds.
+
+    rcvbuf: Optional socket receive buffer size (SO_RCVBUF) in bytes.
+        Datagrams arriving while the buffer is full are dropped by the
+        kernel, so bursts of documents larger than it are lost if they
+        arrive faster than they are parsed.  Linux doubles the requested
+        value and caps it at net.core.rmem_max; the size actually set is
+        in the rcvbuf attribute.
+    """
 
-    def __init__(self, group, port, name=""):
+    def __init__(self, group, port, name="", interface=None,
+                 reuse_port=False, shard=None, timestamps=False,
+                 rcvbuf=None):
         asyncore.dispatcher.__init__(self)
         self.name = name
         self.group = group
         self.port = port
+        self.interface = interface
+        self.shard = shard
         addrinfo = socket.getaddrinfo(group, None)[0]
         self.create_socket(addrinfo[0], socket.SOCK_DGRAM)
         self.set_reuse_addr()
-        self.bind(('', port))
-        mreq = socket.inet_pton(addrinfo[0], addrinfo[4][0]) + struct.pack('=I', socket.INADDR_ANY)
+        if reuse_port:
+            if not hasattr(socket, 'SO_REUSEPORT'):
+                raise ValueError('SO_REUSEPORT is not supported on this '
+                                 'platform')
+            self.socket.setsockopt(socket.SOL_SOCKET,
+                                   socket.SO_REUSEPORT, 1)
+        if rcvbuf is not None:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                   rcvbuf)
+        self.rcvbuf = self.socket.getsockopt(socket.SOL_SOCKET,
+                                             socket.SO_RCVBUF)
+        # On Linux, binding to the group address means only datagrams
+        # sent to this group are received, so several instances using
+        # different groups on the same port do not see each other's
+        # traffic.  Other platforms require binding to the wildcard.
+        if sys.platform.startswith('linux'):
+            self.bind((group, port))
+        else:
+            self.bind(('', port))
+        self._join_group(addrinfo[0], addrinfo[4][0], interface)
+        if timestamps and (_SO_TIMESTAMPNS is None or
+                           not hasattr(self.socket, 'recvmsg')):
+            logger.warning('Kernel receive timestamps are not supported on '
+                           'this platform; using time.time()')
+            timestamps = False
+        self.timestamps = timestamps
+        if timestamps:
+            self.socket.setsockopt(socket.SOL_SOCKET, _SO_TIMESTAMPNS, 1)
+            self._ancbufsize = socket.CMSG_SPACE(_timespec.size)
+        self.read = None
+        self.recv_time = None
+        logger.debug('%s listening on group=%s port=%d interface=%s '
+                     'rcvbuf=%d' % (self.name, self.group, self.port,
+                                    self.interface, self.rcvbuf))
+
+    def _join_group(self, family, group, interface):
+        if family == socket.AF_INET6:
+            if interface is None:
+                ifindex = 0
+            elif ':' in interface or '.' in interface:
+                raise ValueError('IPv6 groups require an interface name, '
+                                 'not an address ({0})'.format(interface))
+            else:
+                ifindex = socket.if_nametoindex(interface)
+            mreq = (socket.inet_pton(family, group)
+                    + struct.pack('@I', ifindex))
+            self.socket.setsockopt(socket.IPPROTO_IPV6,
+                                   socket.IPV6_JOIN_GROUP, mreq)
+            return
+
+        if interface is None:
+            mreq = (socket.inet_pton(family, group)
+                    + struct.pack('=I', socket.INADDR_ANY))
+        else:
+            try:
+                # Interface given as a local address (struct ip_mreq)
+                mreq = (socket.inet_pton(family, group)
+                        + socket.inet_aton(interface))
+            except (socket.error, OSError):
+                # Interface given by name (struct ip_mreqn, Linux only)
+                mreq = (socket.inet_pton(family, group)
+                        + struct.pack('=I', socket.INADDR_ANY)
+                        + struct.pack('@i', socket.if_nametoindex(interface)))
         self.socket.setsockopt(socket.IPPROTO_IP,
                                socket.IP_ADD_MEMBERSHIP, mreq)
-        self.read = None
-        logger.debug('%s listening on group=%s port=%d' % (self.name,
-                     self.group, self.port))
+
+    def in_shard(self, read):
+        """Return True if the raw document belongs to this client's shard."""
+        if self.shard is None:
+            return True
+        m = _datasetId_re.search(read)
+        if m is None:
+            return True
+        (index, count) = self.shard
+        return (zlib.crc32(m.group(1)) & 0xffffffff) % count == index
 
     def handle_connect(self):
         logger.debug('connect %s group=%s port=%d' % (self.name,
@@ -63,8 +198,26 @@ class McastClient(asyncore.dispatcher):
     def writeable(self):
         return False
 
+    def _recv_timestamped(self, bufsize):
+        (data, ancdata, flags, addr) = self.socket.recvmsg(bufsize,
+                                                           self._ancbufsize)
+        recv_time = None
+        for (level, ctype, cdata) in ancdata:
+            if level == socket.SOL_SOCKET and ctype == _SO_TIMESTAMPNS:
+                (sec, nsec) = _timespec.unpack(cdata[:_timespec.size])
+                recv_time = sec + 1e-9 * nsec
+        if recv_time is None:
+            recv_time = time.time()
+        return (data, recv_time)
+
     def handle_read(self):
-        self.read = self.recv(100000)
+        if self.timestamps:
+            (self.read, self.recv_time) = self._recv_timestamped(100000)
+        else:
+            self.read = self.recv(100000)
+            self.recv_time = time.time()
+        if not self.in_shard(self.read):
+            return
         logger.debug('read ' + self.name + ' ' + self.read.decode('utf-8'))
         try:
             self.parse()
@@ -78,18 +231,35 @@ class McastClient(asyncore.dispatcher):
 class ObsClient(McastClient):
     """Receives Observation XML.
 
-    If the controller input is given, the controller.add_obs(obs) method will
-    be called for every document received.
+    If the controller input is given, the controller.add_obs(obs, recv_time)
+    method will be called for every document received, with the datagram
+    arrival time (see McastClient).
 
     If use_configUrl is true, the VCI will be retrieved from the url given
     in the Observation document, parsed, and controller.add_vci(vci) will
-    be called if a controller exists.
+    be called if a controller exists.  If stream_vci is true the VCI is
+    loaded with vci_stream.parse_vci(), which keeps only the parts used by
+    ScanConfig and does not validate against the schema.
+
+    vci_store is a VCIStore (or its directory name).  If given, VCIs are
+    looked up there by configId before fetching them from configUrl, and
+    fetched VCIs are saved in it.
+
+    The multicast group and port default to the VLA values; other keyword
+    arguments (interface, reuse_port, shard, timestamps, rcvbuf) are
+    passed to McastClient.
     """
 
-    def __init__(self, controller=None, use_configUrl=True):
-        McastClient.__init__(self, '239.192.3.2', 53001, 'obs')
+    def __init__(self, controller=None, use_configUrl=True,
+                 group=OBS_GROUP, port=OBS_PORT, stream_vci=False,
+                 vci_store=None, **kwargs):
+        McastClient.__init__(self, group, port, 'obs', **kwargs)
         self.controller = controller
         self.use_configUrl = use_configUrl
+        self.stream_vci = stream_vci
+        if vci_store is not None and not isinstance(vci_store, VCIStore):
+            vci_store = VCIStore(vci_store)
+        self.vci_store = vci_store
 
     def parse(self):
         obs = objectify.fromstring(self.read, parser=_obs_parser)
@@ -99,13 +269,28 @@ class ObsClient(McastClient):
 
         if self.use_configUrl:
             url = obs.attrib['configUrl']
-            logger.info("Retrieving vci from {0}".format(url))
+            configId = str(obs.attrib['configId'])
             try:
-                with contextlib.closing(urlopen(url)) as uo:
-                    vciread = uo.read()
-                logger.debug('Retrieved vci {0}'.format(vciread))
-                vci = objectify.fromstring(vciread, parser=_vci_parser)
-                logger.debug('VCI data structure:\n' + objectify.dump(vci))
+                vciread = None
+                if self.vci_store is not None:
+                    vciread = self.vci_store.get(configId)
+                    if vciread is not None:
+                        logger.info("Read vci {0} from store"
+                                    .format(configId))
+                fetched = vciread is None
+                if fetched:
+                    logger.info("Retrieving vci from {0}".format(url))
+                    with contextlib.closing(urlopen(url)) as uo:
+                        vciread = uo.read()
+                    logger.debug('Retrieved vci {0}'.format(vciread))
+                if self.stream_vci:
+                    vci = vci_stream.parse_vci(vciread)
+                else:
+                    vci = objectify.fromstring(vciread, parser=_vci_parser)
+                    logger.debug('VCI data structure:\n'
+                                 + objectify.dump(vci))
+                if fetched and self.vci_store is not None:
+                    self.vci_store.put(configId, vciread)
                 if self.controller is not None:
                     self.controller.add_vci(vci)
             except Exception as e:
@@ -113,18 +298,24 @@ class ObsClient(McastClient):
                             .format(url, e))
 
         if self.controller is not None:
-            self.controller.add_obs(obs)
+            self.controller.add_obs(obs, recv_time=self.recv_time)
 
 
 class AntClient(McastClient):
     """Receives AntennaProperties XML.
 
-    If the controller input is given, the controller.add_ant(ant) method will
-    be called for every document received.
+    If the controller input is given, the controller.add_ant(ant, recv_time)
+    method will be called for every document received, with the datagram
+    arrival time (see McastClient).
+
+    The multicast group and port default to the VLA values; other keyword
+    arguments (interface, reuse_port, shard, timestamps, rcvbuf) are
+    passed to McastClient.
     """
 
-    def __init__(self, controller=None):
-        McastClient.__init__(self, '239.192.3.1', 53000, 'ant')
+    def __init__(self, controller=None, group=ANT_GROUP, port=ANT_PORT,
+                 **kwargs):
+        McastClient.__init__(self, group, port, 'ant', **kwargs)
         self.controller = controller
 
     def parse(self):
@@ -133,7 +324,7 @@ class AntClient(McastClient):
                     .format(result.attrib['datasetId']))
 
         if self.controller is not None:
-            self.controller.add_ant(result)
+            self.controller.add_ant(result, recv_time=self.recv_time)
         logger.debug('Ant data structure:\n{0}'.format(objectify.dump(result)))
 
 
@@ -0,0 +1,175 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import time
+
+import numpy as np
+from lxml import etree
+
+from .mcast_clients import McastClient, _xsd_dir
+from .ringbuffer import RingBuffer
+from .delay_model import iso_to_mjd
+from .latency import unix_to_mjd
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Station board monitor tables: switched power (switchedPowerTable) and
+# baseband slope (bbSlopeTable) documents.
+#
+# Each document holds measurements for one or more stations.  These are
+# appended to fixed size ring buffers, one per station / baseband (and
+# polarization for switched power), so a long running monitor uses a
+# bounded amount of memory.  Times are MJD (UTC).
+#
+# SwitchedPowerStore values have shape (18, 3): (pSum, pDiff, gain) for
+# each swIndex, NaN for subbands not in the table.
+#
+# BbSlopeStore values have shape (2, ): (slope, lag0).  bbSlope entries
+# without a time attribute are given the document arrival time.
+
+_swpow_xsd = os.path.join(_xsd_dir, 'vci', 'vciStbSwitchedPowerTable.xsd')
+_swpow_parser = etree.XMLParser(schema=etree.XMLSchema(file=_swpow_xsd))
+_bbslope_xsd = os.path.join(_xsd_dir, 'vci', 'vciStbBbSlopeTable.xsd')
+_bbslope_parser = etree.XMLParser(schema=etree.XMLSchema(file=_bbslope_xsd))
+
+NUM_SWINDEX = 18
+
+
+def _read_table(doc, parser):
+    # Parse doc given as bytes, a filename or an element.
+    if isinstance(doc, (bytes, type(b''))):
+        return etree.fromstring(doc, parser)
+    elif hasattr(doc, 'tag'):
+        return doc
+    return etree.parse(doc, parser).getroot()
+
+
+class MonitorStore(object):
+    """Ring buffers of values keyed by station/baseband.
+
+    capacity: number of entries kept for each key.
+    shape: shape of each value.
+    max_age: entries older than this (seconds) relative to the newest
+        of the same key are dropped.
+    """
+
+    def __init__(self, capacity, shape, max_age=None):
+        self.capacity = capacity
+        self.shape = shape
+        self.max_age = max_age
+        self._buffers = {}
+
+    def append(self, key, mjd, value):
+        try:
+            buf = self._buffers[key]
+        except KeyError:
+            buf = RingBuffer(self.capacity, self.shape,
+                             max_age=None if self.max_age is None
+                             else self.max_age / 86400.0)
+            self._buffers[key] = buf
+        buf.append(mjd, value)
+
+    def keys(self):
+        return sorted(self._buffers.keys())
+
+    def __len__(self):
+        return sum(len(b) for b in self._buffers.values())
+
+    def query(self, key, t0=None, t1=None):
+        """(times, values) for key with t0 <= time < t1 (MJD), oldest
+        first."""
+        buf = self._buffers.get(key)
+        if buf is None:
+            return (np.zeros(0), np.zeros((0, ) + tuple(self.shape)))
+        return buf.time_range(t0, t1)
+
+    def latest(self, key):
+        """(time, value) of the newest entry for key, or None."""
+        buf = self._buffers.get(key)
+        if not buf:
+            return None
+        (times, values) = buf.time_range(buf.last_time)
+        return (times[-1], values[-1])
+
+
+class SwitchedPowerStore(MonitorStore):
+    """Switched power measurements keyed by (stationId, swbbName,
+    polarization)."""
+
+    def __init__(self, capacity=1024, max_age=None):
+        MonitorStore.__init__(self, capacity, (NUM_SWINDEX, 3), max_age)
+
+    def add_table(self, doc):
+        """Add the measurements of a switchedPowerTable document (bytes,
+        filename or element).  Returns the number of entries added."""
+        root = _read_table(doc, _swpow_parser)
+        n = 0
+        for bb in root.iterfind('swBaseband'):
+            value = np.full((NUM_SWINDEX, 3), np.nan)
+            for p in bb.iterfind('swPower'):
+                value[int(p.get('swIndex'))] = (float(p.get('pSum')),
+                                                float(p.get('pDiff')),
+                                                float(p.get('gain')))
+            key = (int(bb.get('stationId')), bb.get('swbbName'),
+                   bb.get('polarization'))
+            self.append(key, iso_to_mjd(bb.get('startTime')), value)
+            n += 1
+        return n
+
+
+class BbSlopeStore(MonitorStore):
+    """Baseband slope measurements keyed by (stationId, basebandId,
+    swbbName)."""
+
+    def __init__(self, capacity=1024, max_age=None):
+        MonitorStore.__init__(self, capacity, (2, ), max_age)
+
+    def add_table(self, doc, recv_time=None):
+        """Add the measurements of a bbSlopeTable document (bytes,
+        filename or element).  recv_time (unix seconds, default now) is
+        used for entries without a time.  Returns the number of entries
+        added."""
+        root = _read_table(doc, _bbslope_parser)
+        default_mjd = unix_to_mjd(time.time() if recv_time is None
+                                  else recv_time)
+        n = 0
+        for s in root.iterfind('bbSlope'):
+            t = s.get('time')
+            key = (int(s.get('stationId')), int(s.get('basebandId')),
+                   s.get('swbbName'))
+            self.append(key, default_mjd if t is None else iso_to_mjd(t),
+                        (float(s.get('slope')), float(s.get('lag0'))))
+            n += 1
+        return n
+
+
+class SwitchedPowerClient(McastClient):
+    """Receives switchedPowerTable XML into a SwitchedPowerStore.  The
+    group and port must be given; other keyword arguments are passed to
+    McastClient."""
+
+    def __init__(self, group, port, store=None, **kwargs):
+        McastClient.__init__(self, group, port, 'swpow', **kwargs)
+        self.store = SwitchedPowerStore() if store is None else store
+
+    def parse(self):
+        n = self.store.add_table(self.read)
+        logger.debug('Read {0} switched power entries'.format(n))
+
+
+class BbSlopeClient(McastClient):
+    """Receives bbSlopeTable XML into a BbSlopeStore.  The group and
+    port must be given; other keyword arguments are passed to
+    McastClient."""
+
+    def __init__(self, group, port, store=None, **kwargs):
+        McastClient.__init__(self, group, port, 'bbslope', **kwargs)
+        self.store = BbSlopeStore() if store is None else store
+
+    def parse(self):
+        n = self.store.add_table(self.read, recv_time=self.recv_time)
+        logger.debug('Read {0} bbSlope entries'.format(n))
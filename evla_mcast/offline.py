@@ -0,0 +1,246 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import re
+import heapq
+import multiprocessing
+
+import numpy as np
+from lxml import objectify
+
+from .mcast_clients import _obs_parser, _vci_parser, _ant_parser
+from .checkpoint import OBS, ANT, VCI
+from .archive import Archive, ScanCollector
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Offline reconstruction of ScanConfigs from saved documents.
+#
+# Sources are directories of saved XML documents (searched recursively,
+# one document per *.xml file), single XML files, or archive directories
+# (see the archive module).  Documents are first located without parsing
+# them: files are classified by their root element and their datasetId,
+# configId and time are found by a regular expression, and archives are
+# read from their index.  They are then grouped by datasetId, each
+# dataset with the VCIs of its configIds.
+#
+# Each dataset is rebuilt in a worker process by feeding its documents to
+# a Controller without sockets (its VCIs first, then the antenna tables
+# and obs documents ordered by creation and startTime), so subscans and
+# stop times are resolved exactly as Controller.add_obs does.  Schema
+# validation, which dominates the cost, thus runs in parallel across
+# datasets.  Results are merged into a single stream of scans in
+# startTime order: datasets are dispatched in order of their first scan,
+# and a scan is yielded once every dataset that could hold an earlier one
+# has been rebuilt.
+
+_root_re = re.compile(br'<(?:[A-Za-z_][\w.-]*:)?([A-Za-z_][\w.-]*)')
+_kinds = {b'Observation': OBS, b'AntennaPropertyTable': ANT,
+          b'subArray': VCI}
+
+
+def _attr(name, data):
+    m = re.search(br'\s' + name.encode('ascii') + br'="([^"]*)"', data)
+    return None if m is None else m.group(1).decode('utf-8')
+
+
+def _float(s):
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _file_document(fname):
+    # (kind, key, time) of a saved document, None if it is not one.
+    with open(fname, 'rb') as f:
+        data = f.read()
+    m = _root_re.search(data)
+    kind = None if m is None else _kinds.get(m.group(1))
+    if kind is None:
+        return None
+    if kind == VCI:
+        return (kind, _attr('configId', data), None)
+    if kind == ANT:
+        return (kind, _attr('datasetId', data),
+                _float(_attr('creation', data)))
+    return (kind, _attr('datasetId', data), _float(_attr('startTime', data)),
+            _attr('configId', data))
+
+
+class _Dataset(object):
+    # Documents of one dataset: a list of (sort key, kind, source) where
+    # source is a file name or an (archive path, index row) tuple.
+    def __init__(self, datasetId):
+        self.datasetId = datasetId
+        self.docs = []
+        self.configIds = set()
+        self.start = np.inf
+
+    def add(self, kind, time, source, order):
+        if np.isnan(time):
+            time = -np.inf
+        # Antenna tables go before obs documents of the same time
+        self.docs.append(((time, kind != ANT, order), kind, source))
+        if kind == OBS and time < self.start:
+            self.start = time
+
+
+def find_documents(sources):
+    """Locate the documents in sources (directories of XML files, XML
+    files or archive directories).  Returns (datasets, vcis): a dict of
+    datasetId to _Dataset and a dict of configId to VCI source."""
+    datasets = {}
+    vcis = {}
+    order = [0]
+
+    def dataset(dsid):
+        if dsid not in datasets:
+            datasets[dsid] = _Dataset(dsid)
+        return datasets[dsid]
+
+    def add_file(fname):
+        doc = _file_document(fname)
+        order[0] += 1
+        if doc is None:
+            return
+        if doc[0] == VCI:
+            vcis[doc[1]] = fname
+            return
+        ds = dataset(doc[1])
+        ds.add(doc[0], doc[2], fname, order[0])
+        if doc[0] == OBS:
+            ds.configIds.add(doc[3])
+
+    for source in sources:
+        if os.path.isdir(source) and any(n.startswith('seg-') and
+                                         n.endswith('.dat')
+                                         for n in os.listdir(source)):
+            archive = Archive(source)
+            try:
+                _archive_documents(archive, dataset, vcis, order)
+            finally:
+                archive.close()
+        elif os.path.isdir(source):
+            for (dirpath, dirnames, filenames) in os.walk(source):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith('.xml'):
+                        add_file(os.path.join(dirpath, name))
+        else:
+            add_file(source)
+    return (datasets, vcis)
+
+
+def _archive_documents(archive, dataset, vcis, order):
+    idx = archive.index
+    path = os.path.abspath(archive.path)
+    for i in range(len(idx)):
+        row = idx[i]
+        order[0] += 1
+        kind = int(row['kind'])
+        if kind == VCI:
+            vcis[archive._string(row['config'])] = (path, i)
+            continue
+        ds = dataset(archive._string(row['dataset']))
+        if kind == OBS:
+            ds.add(kind, row['startTime'], (path, i), order[0])
+            ds.configIds.add(archive._string(row['config']))
+        else:
+            ds.add(kind, _float(_attr('creation', archive.document(i))),
+                   (path, i), order[0])
+
+
+# Archives opened by a worker process, by path
+_archives = {}
+
+
+def _read(source):
+    if isinstance(source, tuple):
+        (path, i) = source
+        if path not in _archives:
+            _archives[path] = Archive(path)
+        return _archives[path].document(i)
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def _rebuild(task):
+    # Worker: rebuild one dataset.  Returns its ScanConfigs, including
+    # scans still queued (stopTime None) when its documents ran out.
+    (datasetId, vcis, docs, backend) = task
+    collector = ScanCollector(backend)
+    for source in vcis:
+        try:
+            collector.add_vci(objectify.fromstring(_read(source),
+                                                   parser=_vci_parser))
+        except Exception:
+            logger.exception('error reading VCI {0}'.format(source))
+    for (key, kind, source) in docs:
+        try:
+            if kind == ANT:
+                collector.add_ant(objectify.fromstring(_read(source),
+                                                       parser=_ant_parser))
+            else:
+                collector.add_obs(objectify.fromstring(_read(source),
+                                                       parser=_obs_parser))
+        except Exception:
+            logger.exception('error rebuilding {0} from {1}'
+                             .format(datasetId, source))
+    return collector.all_scans()
+
+
+def rebuild_scans(sources, datasetIds=None, processes=None,
+                  backend='objectify'):
+    """Yield the ScanConfigs (with subscans and stop times) of the
+    datasets in sources, in startTime order.
+
+    sources: list of directories of saved XML documents, XML files or
+        archive directories (see find_documents).
+    datasetIds: only rebuild these datasets (default all).
+    processes: number of worker processes (default the number of CPUs);
+        1 rebuilds in this process.
+    backend: ScanConfig backend of the results.
+    """
+    (datasets, vcis) = find_documents(sources)
+    if datasetIds is not None:
+        datasets = dict((k, v) for (k, v) in datasets.items()
+                        if k in set(datasetIds))
+    order = sorted((ds for ds in datasets.values()
+                    if np.isfinite(ds.start)),
+                   key=lambda ds: (ds.start, ds.datasetId))
+    missing = set(c for ds in order for c in ds.configIds) - set(vcis)
+    if missing:
+        logger.warning('No VCI found for configIds {0}'
+                       .format(', '.join(sorted(missing))))
+    tasks = [(ds.datasetId,
+              [vcis[c] for c in sorted(ds.configIds) if c in vcis],
+              sorted(ds.docs, key=lambda d: d[0]), backend)
+             for ds in order]
+    starts = [ds.start for ds in order[1:]] + [np.inf]
+
+    pool = None
+    if processes == 1 or len(tasks) <= 1:
+        results = map(_rebuild, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_rebuild, tasks)
+    heap = []
+    n = 0
+    try:
+        for (limit, scans) in zip(starts, results):
+            for sc in scans:
+                n += 1
+                heapq.heappush(heap, (sc.startTime, n, sc))
+            while heap and heap[0][0] < limit:
+                yield heapq.heappop(heap)[2]
+        while heap:
+            yield heapq.heappop(heap)[2]
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,106 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Fixed size, time-ordered ring buffers backed by NumPy arrays.
+#
+# Used to hold streams of monitor data (delay models, switched power,
+# baseband slopes) for a bounded time.  The storage is allocated once;
+# appending overwrites the oldest entry when full, and entries older than
+# max_age (relative to the newest) are dropped on append, so memory use
+# does not grow over a long run.  Entries are expected to be appended in
+# time order; an entry older than the newest one is dropped with a
+# warning.
+
+
+class RingBuffer(object):
+    """Ring buffer of (time, value) entries.
+
+    capacity: maximum number of entries.
+    shape, dtype: shape and type of each value.
+    max_age: if given, entries older than this (same units as time)
+        relative to the newest entry are dropped when appending.
+    """
+
+    def __init__(self, capacity, shape=(), dtype=np.float64, max_age=None):
+        self.capacity = int(capacity)
+        self.max_age = max_age
+        self._time = np.zeros(self.capacity, dtype=np.float64)
+        self._data = np.zeros((self.capacity,) + tuple(shape), dtype=dtype)
+        self._start = 0  # index of the oldest entry
+        self._n = 0      # number of entries
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def shape(self):
+        return self._data.shape[1:]
+
+    def clear(self):
+        self._start = 0
+        self._n = 0
+
+    def append(self, time, value):
+        """Add an entry.  Returns False if it was dropped for being older
+        than the newest entry."""
+        if self._n and time < self.last_time:
+            logger.warning('Dropping out of order entry at {0} (newest is '
+                           '{1})'.format(time, self.last_time))
+            return False
+        if self._n == self.capacity:
+            idx = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            idx = (self._start + self._n) % self.capacity
+            self._n += 1
+        self._time[idx] = time
+        self._data[idx] = value
+        if self.max_age is not None:
+            self._expire(time - self.max_age)
+        return True
+
+    def _expire(self, tmin):
+        # Drop entries before tmin (the newest is always kept)
+        while self._n > 1 and self._time[self._start] < tmin:
+            self._start = (self._start + 1) % self.capacity
+            self._n -= 1
+
+    @property
+    def last_time(self):
+        if not self._n:
+            return None
+        return self._time[(self._start + self._n - 1) % self.capacity]
+
+    def _order(self):
+        # Storage indices of the entries, oldest first.
+        return (self._start + np.arange(self._n)) % self.capacity
+
+    def times(self):
+        """Array of entry times, oldest first."""
+        return self._time[self._order()]
+
+    def values(self):
+        """Array of entry values, oldest first."""
+        return self._data[self._order()]
+
+    def time_range(self, t0=None, t1=None):
+        """(times, values) of entries with t0 <= time < t1, oldest
+        first."""
+        times = self.times()
+        i0 = 0 if t0 is None else np.searchsorted(times, t0, side='left')
+        i1 = len(times) if t1 is None else \
+            np.searchsorted(times, t1, side='left')
+        idx = self._order()[i0:i1]
+        return (self._time[idx], self._data[idx])
+
+    def lookup(self, t):
+        """Index (into times()/values()) of the latest entry at or before
+        each time in t, or -1 where there is none."""
+        return np.searchsorted(self.times(), t, side='right') - 1
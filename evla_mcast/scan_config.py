@@ -4,11 +4,18 @@ from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
 from io import open
 
 import ast
-from lxml import objectify
+import json
+import hashlib
+from collections import namedtuple
+from lxml import etree
 import os.path
 
+import numpy as np
+
 from . import angles
-from .mcast_clients import _ant_parser, _vci_parser, _obs_parser
+from . import geometry
+from .backends import get_backend
+from .vci_stream import VCIElement
 
 import logging
 logger = logging.getLogger(__name__)
@@ -25,6 +32,130 @@ logger = logging.getLogger(__name__)
 # parameters as well.
 
 
+def _unquote(v):
+    # Strip matching quotes from an intent value.
+    if len(v) >= 2 and v[0] in '\'"' and v[-1] == v[0]:
+        if '\\' in v:
+            # Escape sequences, rare enough to let python handle them
+            return ast.literal_eval(v)
+        return v[1:-1]
+    return v
+
+
+def _quoted_float(v):
+    return float(v.strip('"'))
+
+
+# Typed intents used by ScanConfig properties: (property name, intent
+# key, conversion, default).  The default is used as-is when the intent
+# is not present or can not be converted.
+_intent_schema = (
+    ('observer', 'ObserverName', str, 'Unknown'),
+    ('projid', 'ProjectID', str, 'Unknown'),
+    ('scan_intent', 'ScanIntent', str, 'None'),
+    ('otf', 'OTF', lambda v: v == '1', False),
+    ('otf_rate_ra', 'AntennaRaRate', _quoted_float, 0.0),
+    ('otf_rate_dec', 'AntennaDecRate', _quoted_float, 0.0),
+    ('otf_duration', 'DurationOfStripe', _quoted_float, 0.0),
+    ('otf_source_field', 'SourceFieldSet', lambda v: v.strip('"'), 'None'),
+    ('nchan', 'PsrNumChan', int, 32),
+    ('npol', 'PsrNumPol', int, 4),
+    ('foldtime', 'PsrFoldIntTime', float, 10.0),
+    ('foldbins', 'PsrFoldNumBins', int, 2048),
+    ('timeres', 'PsrSearchTimeRes', float, 1e-3),
+    ('nbitsout', 'PsrSearchNumBits', int, 8),
+    ('searchdm', 'PsrSearchDM', float, 0.0),
+    ('freqfac', 'PsrSearchFreqFac', float, 1.0),
+    ('parfile', 'TempoFileName', str, None),
+    ('calfreq', 'PsrCalFreq', float, 10.0),
+    ('raw_format', 'PsrRawFormat', str, 'GUPPI'),
+)
+
+ScanIntents = namedtuple('ScanIntents', [f[0] for f in _intent_schema])
+
+
+def convert_intents(intents):
+    """Convert a dict of intent strings to a ScanIntents record."""
+    values = []
+    for (name, key, conv, default) in _intent_schema:
+        if key in intents:
+            try:
+                values.append(conv(intents[key]))
+                continue
+            except ValueError:
+                logger.warning('Could not convert intent {0}={1!r}'
+                               .format(key, intents[key]))
+        values.append(default)
+    return ScanIntents(*values)
+
+
+_default_intents = convert_intents({})
+
+# Parsed intents keyed by the tuple of raw intent strings.  Consecutive
+# scans (and all subscans of a scan) usually have identical intents, so
+# these are only parsed and converted once.
+_intent_cache = {}
+_intent_cache_size = 1024
+
+
+def _cached_intents(items):
+    key = tuple(items)
+    try:
+        return _intent_cache[key]
+    except KeyError:
+        pass
+    intents = ScanConfig.parse_intents(key)
+    result = (intents, convert_intents(intents))
+    if len(_intent_cache) >= _intent_cache_size:
+        _intent_cache.clear()
+    _intent_cache[key] = result
+    return result
+
+
+# Serialization.
+#
+# ScanConfig pickles as the raw XML of its documents plus the few values
+# that are not in them (requirements, stop and arrival times, subscans),
+# instead of the parsed trees and cached derived structures: etree trees
+# can not be pickled at all, and objectify trees are slow and large.
+# Documents are parsed back without schema validation (they were
+# validated when received), and VCI and antenna documents are parsed only
+# once per process for each distinct content, so all scans of a
+# configuration sent to a worker share the same trees.  VCIs from
+# vci_stream are pickled as they are, and can not be written as JSON.
+
+STATE_VERSION = 1
+
+
+def _doc_bytes(doc):
+    # Raw XML of a parsed document; vci_stream records are returned as is.
+    if doc is None or not hasattr(doc, 'tag'):
+        return doc
+    return etree.tostring(doc)
+
+
+# Parsed documents keyed by (backend, SHA-1 of the XML)
+_state_docs = {}
+_state_docs_size = 64
+
+
+def _parse_state_doc(data, backend, shared=False):
+    if data is None or not isinstance(data, (bytes, type(b''))):
+        return data
+    if not shared:
+        return etree.fromstring(data, parser=backend.trusted_parser)
+    key = (backend.name, hashlib.sha1(data).digest())
+    try:
+        return _state_docs[key]
+    except KeyError:
+        pass
+    doc = etree.fromstring(data, parser=backend.trusted_parser)
+    if len(_state_docs) >= _state_docs_size:
+        _state_docs.clear()
+    _state_docs[key] = doc
+    return doc
+
+
 class ScanConfig(object):
     """ This class defines a complete EVLA observing config,
     which in practice means both a VCI document and OBS document have been
@@ -32,9 +163,19 @@ class ScanConfig(object):
     from the VCI and OBS and returned."""
 
     def __init__(self, vci=None, obs=None, ant=None,
-                 requires=['obs', 'vci', 'ant', 'stop']):
+                 requires=['obs', 'vci', 'ant', 'stop'], recv_time=None,
+                 backend='objectify'):
         """ Sets the documents for a given scan.
         vci, obs, and ant arguments accept filenames or parsed xml string.
+        vci may also be a VCIRecord from vci_stream.parse_vci().
+
+        recv_time is the arrival time (unix seconds) of the obs document,
+        if known.  It is stored as ScanConfig.recvTime.
+
+        backend selects how the documents are parsed and read, either
+        'objectify' (the default; lxml.objectify trees read by attribute
+        traversal) or 'etree' (plain lxml.etree trees read with compiled
+        XPath expressions).  See the backends module.
 
         The requires arguments is a list specifying which information is
         required for the ScanConfig to be complete.  It can contain any
@@ -43,35 +184,40 @@ class ScanConfig(object):
         ScanConfig.is_complete() will return True.
         """
 
-        try:        
-            if len(obs):
-                logger.debug('Received obs doc')
-                with open(obs, 'rb') as fobs:
-                    obs = objectify.fromstring(fobs.read(), parser=_obs_parser)
-                logger.info('Added obs doc from file {0}'.format(obs))
-            if len(vci):
-                logger.debug('Received vci doc')
-                with open(vci, 'rb') as fvci:
-                    vci = objectify.fromstring(fvci.read(), parser=_vci_parser)
-                logger.info('Added vci doc from file {0}'.format(obs))
-            if len(ant):
-                logger.debug('Received ant doc')
-                with open(ant, 'rb') as fant:
-                    ant = objectify.fromstring(fant.read(), parser=_ant_parser)
-                logger.info('Added ant doc from file {0}'.format(ant))
-        except (IOError, TypeError):
-            logger.debug('Assuming one or more doc was already parsed')
+        self._backend = get_backend(backend)
+
+        obs = self._read_doc(obs, 'obs')
+        vci = self._read_doc(vci, 'vci')
+        ant = self._read_doc(ant, 'ant')
 
         self.stopTime = None
+        self.recvTime = recv_time
 
         self.requires = requires
 
         self._subscans = []
 
+        # Which parts of the configuration changed since the previous
+        # scan, see config_cache.changed_parts.  Set by Controller
+        # before handle_config is called.
+        self.changed = None
+
         self.set_vci(vci)
         self.set_obs(obs)
         self.set_ant(ant)
 
+    def _read_doc(self, doc, name):
+        # If doc is a filename, read and parse it.  Otherwise assume it
+        # was already parsed (or is None) and return it unchanged.
+        try:
+            with open(doc, 'rb') as fdoc:
+                parsed = etree.fromstring(fdoc.read(),
+                                          parser=self._backend.parsers[name])
+        except (IOError, TypeError):
+            return doc
+        logger.info('Added {0} doc from file {1}'.format(name, doc))
+        return parsed
+
     def __repr__(self):
         defined = []
         if self.has_obs:
@@ -84,6 +230,10 @@ class ScanConfig(object):
             defined.append('stop')
         return 'ScanConfig with {0} defined'.format(defined)
 
+    @property
+    def backend(self):
+        return self._backend.name
+
     @property
     def has_vci(self):
         return self.vci is not None
@@ -109,18 +259,41 @@ class ScanConfig(object):
 
     def set_vci(self, vci):
         self.vci = vci
+        self._geometry = None
+        self._routing = None
+        self._subband_objs = {}
+        self._antennas = None
+        self.derived = None
+        # VCIRecords from vci_stream are always read by attribute access.
+        if isinstance(vci, VCIElement):
+            self._vci_backend = get_backend('objectify')
+        else:
+            self._vci_backend = self._backend
         for ss in self._subscans:
             ss.set_vci(vci)
 
     def set_obs(self, obs):
         self.obs = obs
+        self._geometry = None
+        self._subband_objs = {}
+        self.derived = None
+        # Formatted ra_str/dec_str, filled in on first access.
+        self._radec_str = {}
+        # intents is the dict of raw intent values, typed_intents the
+        # ScanIntents record the intent properties are read from.
         if self.obs is None:
             self.intents = {}
+            self.typed_intents = _default_intents
         else:
-            self.intents = self.parse_intents(obs.intent)
+            (intents, self.typed_intents) = \
+                    _cached_intents(self._backend.intents(obs))
+            self.intents = dict(intents)
 
     def set_ant(self, ant):
         self.ant = ant
+        self._geometry = None
+        self._antennas = None
+        self.derived = None
         for ss in self._subscans:
             ss.set_ant(ant)
 
@@ -134,8 +307,9 @@ class ScanConfig(object):
                 (self.subscanNo != config.subscanNo)
                 )
 
-    def add_subscan(self, obs):
-        subconf = ScanConfig(obs=obs,vci=self.vci,ant=self.ant)
+    def add_subscan(self, obs, recv_time=None):
+        subconf = ScanConfig(obs=obs,vci=self.vci,ant=self.ant,
+                             recv_time=recv_time, backend=self._backend)
 
         # TODO other stuff that could go here:
         #  - check that subscan properties are consistent with main scan?
@@ -175,16 +349,76 @@ class ScanConfig(object):
                 return sc
         return None
 
+    def to_state(self):
+        """Dict of the raw documents (XML bytes) and other values needed
+        to rebuild this scan and its subscans with from_state()."""
+        return dict(version=STATE_VERSION, backend=self.backend,
+                    vci=_doc_bytes(self.vci), ant=_doc_bytes(self.ant),
+                    changed=None if self.changed is None
+                    else sorted(self.changed),
+                    scans=[(_doc_bytes(sc.obs), list(sc.requires),
+                            sc.recvTime, sc.stopTime)
+                           for sc in self.subscans])
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a ScanConfig from to_state() output."""
+        if state['version'] != STATE_VERSION:
+            raise ValueError('Unsupported ScanConfig state version {0}'
+                             .format(state['version']))
+        backend = get_backend(state['backend'])
+        vci = _parse_state_doc(state['vci'], backend, shared=True)
+        ant = _parse_state_doc(state['ant'], backend, shared=True)
+        configs = []
+        for (obs, requires, recv_time, stopTime) in state['scans']:
+            sc = cls(vci=vci, obs=_parse_state_doc(obs, backend), ant=ant,
+                     requires=requires, recv_time=recv_time,
+                     backend=backend)
+            sc.stopTime = stopTime
+            configs.append(sc)
+        config = configs[0]
+        config._subscans = configs[1:]
+        if state['changed'] is not None:
+            config.changed = frozenset(state['changed'])
+        return config
+
+    def __reduce__(self):
+        return (type(self).from_state, (self.to_state(), ))
+
+    def to_json(self):
+        """JSON string of to_state(), with the documents as text."""
+        state = self.to_state()
+        for key in ('vci', 'ant'):
+            if state[key] is not None and \
+                    not isinstance(state[key], (bytes, type(b''))):
+                raise ValueError('Streamed VCIs can not be written as JSON')
+        state = dict(state)
+        for key in ('vci', 'ant'):
+            if state[key] is not None:
+                state[key] = state[key].decode('utf-8')
+        state['scans'] = [(None if obs is None else obs.decode('utf-8'),
+                           req, recv, stop)
+                          for (obs, req, recv, stop) in state['scans']]
+        return json.dumps(state)
+
+    @classmethod
+    def from_json(cls, text):
+        """Rebuild a ScanConfig from to_json() output."""
+        state = json.loads(text)
+        for key in ('vci', 'ant'):
+            if state[key] is not None:
+                state[key] = state[key].encode('utf-8')
+        state['scans'] = [(None if obs is None else obs.encode('utf-8'),
+                           req, recv, stop)
+                          for (obs, req, recv, stop) in state['scans']]
+        return cls.from_state(state)
+
     @staticmethod
     def parse_intents(intents):
         d = {}
         for item in intents:
-            k, v = str(item).split("=")
-            if v[0] is "'" or v[0] is '"':
-                d[k] = ast.literal_eval(v)
-                # Or maybe we should just strip quotes?
-            else:
-                d[k] = v
+            k, v = str(item).split("=", 1)
+            d[k] = _unquote(v)
         return d
 
     def get_intent(self, key, default=None):
@@ -207,116 +441,126 @@ class ScanConfig(object):
 
     @property
     def scanNo(self):
-        return int(self.obs.scanNo)
+        return self._backend.scanNo(self.obs)
 
     @property
     def subscanNo(self):
-        return int(self.obs.subscanNo)
+        return self._backend.subscanNo(self.obs)
 
     @property
     def observer(self):
-        return self.get_intent("ObserverName", "Unknown")
+        return self.typed_intents.observer
 
     @property
     def projid(self):
-        return self.get_intent("ProjectID", "Unknown")
+        return self.typed_intents.projid
 
     @property
     def scan_intent(self):
-        return self.get_intent("ScanIntent", "None")
+        return self.typed_intents.scan_intent
 
     @property
     def otf(self):
-        return self.get_intent("OTF","0") == "1"
+        return self.typed_intents.otf
 
     @property
     def otf_rate_ra(self):
-        return float(self.get_intent("AntennaRaRate","0").strip('"'))
+        return self.typed_intents.otf_rate_ra
 
     @property
     def otf_rate_dec(self):
-        return float(self.get_intent("AntennaDecRate","0").strip('"'))
+        return self.typed_intents.otf_rate_dec
 
     @property
     def otf_duration(self):
-        return float(self.get_intent("DurationOfStripe","0").strip('"'))
+        return self.typed_intents.otf_duration
 
     @property
     def otf_source_field(self):
-        return self.get_intent("SourceFieldSet","None").strip('"')
+        return self.typed_intents.otf_source_field
 
     @property
     def nchan(self):
-        return int(self.get_intent("PsrNumChan", 32))
+        return self.typed_intents.nchan
 
     @property
     def npol(self):
-        return int(self.get_intent("PsrNumPol", 4))
+        return self.typed_intents.npol
 
     @property
     def foldtime(self):
-        return float(self.get_intent("PsrFoldIntTime", 10.0))
+        return self.typed_intents.foldtime
 
     @property
     def foldbins(self):
-        return int(self.get_intent("PsrFoldNumBins", 2048))
+        return self.typed_intents.foldbins
 
     @property
     def timeres(self):
-        return float(self.get_intent("PsrSearchTimeRes", 1e-3))
+        return self.typed_intents.timeres
 
     @property
     def nbitsout(self):
-        return int(self.get_intent("PsrSearchNumBits", 8))
+        return self.typed_intents.nbitsout
 
     @property
     def searchdm(self):
-        return float(self.get_intent("PsrSearchDM", 0.0))
+        return self.typed_intents.searchdm
 
     @property
     def freqfac(self):
-        return float(self.get_intent("PsrSearchFreqFac", 1))
+        return self.typed_intents.freqfac
 
     @property
     def parfile(self):
-        return self.get_intent("TempoFileName", None)
+        return self.typed_intents.parfile
 
     @property
     def calfreq(self):
-        return float(self.get_intent("PsrCalFreq", 10.0))
+        return self.typed_intents.calfreq
 
     @property
     def raw_format(self):
-        return self.get_intent("PsrRawFormat", "GUPPI")
+        return self.typed_intents.raw_format
 
     @property
     def source(self):
-        return str(self.obs.name)
+        return self._backend.source(self.obs)
 #        return self.obs.name.translate(string.maketrans(' *','__'))  # "AttributeError: no such child: translate"
 
     @property
     def ra_deg(self):
-        return angles.r2d(self.obs.ra)
+        return angles.r2d(self._backend.ra(self.obs))
 
     @property
     def ra_hrs(self):
-        return angles.r2h(self.obs.ra)
+        return angles.r2h(self._backend.ra(self.obs))
 
     @property
     def ra_str(self):
-        return angles.fmt_angle(self.ra_hrs, ":", ":").lstrip('+-')
+        try:
+            return self._radec_str['ra']
+        except KeyError:
+            s = angles.fmt_angle(self.ra_hrs, ":", ":").lstrip('+-')
+            self._radec_str['ra'] = s
+            return s
 
     @property
     def dec_deg(self):
-        return angles.r2d(self.obs.dec)
+        return angles.r2d(self._backend.dec(self.obs))
 
     @property
     def dec_str(self):
-        return angles.fmt_angle(self.dec_deg, ":", ":")
+        try:
+            return self._radec_str['dec']
+        except KeyError:
+            s = angles.fmt_angle(self.dec_deg, ":", ":")
+            self._radec_str['dec'] = s
+            return s
 
     @property
     def startLST(self):
-        return self.obs.startLST * 86400.0
+        return self._backend.startLST(self.obs) * 86400.0
 
     @property
     def startTime(self):
@@ -342,36 +586,34 @@ class ScanConfig(object):
 
     @property
     def baseBandNames(self):
-        return [str(baseBand.attrib['swbbName']) for baseBand 
-                in self.vci.stationInputOutput[0].baseBand]
+        return [str(baseBand.attrib['swbbName']) for baseBand
+                in self._vci_backend.baseBands(self.vci)]
 
     @property
     def binningPeriod(self):
         bp = {}
-        for baseBand in self.vci.stationInputOutput[0].baseBand:
-            try:
-                if baseBand.binningPeriod is not None:
-                    IFid = swbbName_to_IFid(baseBand.swbbName)
-                    bp[IFid] = baseBand.binningPeriod
-            except AttributeError:
-                pass
+        for baseBand in self._vci_backend.baseBands(self.vci):
+            if 'binningPeriod' in baseBand.attrib:
+                IFid = self.swbbName_to_IFid(baseBand.attrib['swbbName'])
+                bp[IFid] = float(baseBand.attrib['binningPeriod'])
         return bp
 
     @property
     def numBins(self):
         nb = {}
-        for baseBand in self.vci.stationInputOutput[0].baseBand:
+        for baseBand in self._vci_backend.baseBands(self.vci):
             try:
-                if baseBand.phaseBinning[0].numBins is not None:
-                    IFid = self.swbbName_to_IFid(baseBand.swbbName)
-                    nb[IFid] = baseBand.phaseBinning[0].numBins
-            except (AttributeError, IndexError):
-                pass
+                numBins = (self._vci_backend.phaseBinning(baseBand)[0]
+                           .attrib['numBins'])
+            except (IndexError, KeyError):
+                continue
+            IFid = self.swbbName_to_IFid(baseBand.attrib['swbbName'])
+            nb[IFid] = int(numBins)
         return nb
 
     @property
     def listOfStations(self):
-        return [str(s.attrib["name"]) for s in self.vci.listOfStations.station]
+        return self._vci_backend.stations(self.vci)
 
     @property
     def numAntenna(self):
@@ -382,26 +624,26 @@ class ScanConfig(object):
         correspond to the edge of the baseband.  Uses IFid naming convention
         as in OBS XML."""
 
-        for sslo in self.obs.sslo:
-            if sslo.attrib["IFid"] == IFid:
-                return sslo.freq  # These are in MHz
+        for (sslo_IFid, sideband, receiver, freq) in self._backend.sslo(self.obs):
+            if sslo_IFid == IFid:
+                return freq  # These are in MHz
         return None
 
     def get_sideband(self, IFid):
         """Return the sideband sense (int; +1 or -1) for the given IFid.
         Uses IFid naming convention as in OBS XML."""
 
-        for sslo in self.obs.sslo:
-            if sslo.attrib["IFid"] == IFid:
-                return int(sslo.attrib["Sideband"])  # 1 or -1
+        for (sslo_IFid, sideband, receiver, freq) in self._backend.sslo(self.obs):
+            if sslo_IFid == IFid:
+                return sideband  # 1 or -1
         return None
 
     def get_receiver(self, IFid):
         """Return the receiver name for the given IFid.
         Uses IFid naming convention as in OBS XML."""
-        for sslo in self.obs.sslo:
-            if sslo.attrib["IFid"] == IFid:
-                return sslo.attrib["Receiver"]
+        for (sslo_IFid, sideband, receiver, freq) in self._backend.sslo(self.obs):
+            if sslo_IFid == IFid:
+                return receiver
         return None
 
     @staticmethod
@@ -438,6 +680,9 @@ class ScanConfig(object):
                      are returned.  non-empty match_ips implies only_vdif
                      always.
                      (default: [])
+
+        The subbands are looked up in the VdifRouting index of the VCI,
+        and the SubBand objects are reused by later calls.
         """
 
         # TODO: raise an exception, or just return empty list?
@@ -448,31 +693,33 @@ class ScanConfig(object):
                                .format(self.has_vci, self.has_obs,
                                        self.has_ant, self.stopTime))
 
-        subs = []
-
-        for baseBand in self.vci.stationInputOutput[0].baseBand:
-            swbbName = str(baseBand.attrib["swbbName"])
-            IFid = self.swbbName_to_IFid(swbbName)
-            for subBand in baseBand.subBand:
-                if len(match_ips) or only_vdif:
-                    # Need to get at vdif elements
-                    # Not really sure what more than 1 summedArray means..
-                    for summedArray in subBand.summedArray:
-                        vdif = summedArray.vdif
-                        if vdif:
-                            if len(match_ips):
-                                if (vdif.aDestIP in match_ips) or \
-                                   (vdif.bDestIP in match_ips):
-                                    # IPs match, add to list
-                                    subs += [SubBand(subBand, self, IFid, vdif), ]
-                            else:
-                                # No IP list specified, keep all subbands
-                                subs += [SubBand(subBand, self, IFid, vdif), ]
-                else:
-                    # No VDIF or IP list given, just keep everything
-                    subs += [SubBand(subBand, self, IFid, vdif=None), ]
-
-        return subs
+        routing = self.get_routing()
+        if len(match_ips):
+            entries = routing.match(match_ips)
+        elif only_vdif:
+            entries = routing.vdif_entries
+        else:
+            entries = routing.subband_entries
+        return [self._subband(i) for i in entries]
+
+    def get_routing(self):
+        """Return the VdifRouting index of this scan's VCI.  This is
+        shared by all scans using the same VCI document."""
+        if self._routing is None:
+            self._routing = get_routing(self.vci, self._vci_backend)
+        return self._routing
+
+    def _subband(self, i):
+        # SubBand object for routing entry i, created on first use.  These
+        # depend on the OBS (sky frequencies) so are kept per ScanConfig.
+        try:
+            return self._subband_objs[i]
+        except KeyError:
+            pass
+        (subBand, IFid, vdif) = self._routing.entries[i]
+        sub = SubBand(subBand, self, IFid, vdif)
+        self._subband_objs[i] = sub
+        return sub
 
     def get_antennas(self):
         """Return a list of antenna objects for this scan.  These will
@@ -480,11 +727,129 @@ class ScanConfig(object):
         in the BDF."""
         # TODO check ordering.  Is sorting done by 'widarID' or 'name'
         # or 'sid' (in listOfStations) in practice these seem to be similar.
-        ants = []
-        for a in self.ant.AntennaProperties:
-            if a.attrib["name"] in self.listOfStations:
-                ants += [Antenna(a), ]
-        return sorted(ants, key=lambda a: int(a.widarID))
+        if self._antennas is None and self.derived is not None:
+            self._antennas = self.derived.antennas
+        if self._antennas is None:
+            ants = []
+            stations = self.listOfStations
+            for a in self._backend.antennas(self.ant):
+                if a.attrib["name"] in stations:
+                    ants += [Antenna(a, self._backend), ]
+            self._antennas = sorted(ants, key=lambda a: int(a.widarID))
+            if self.derived is not None:
+                self.derived.antennas = self._antennas
+        return list(self._antennas)
+
+    def use_derived(self, derived):
+        """Share the SubBand and Antenna objects of a
+        config_cache.DerivedConfig, which must be for the same
+        configuration (see ConfigCache.attach)."""
+        self.derived = derived
+        self._subband_objs = derived.subbands
+        if derived.antennas is not None:
+            self._antennas = derived.antennas
+        elif self._antennas is not None:
+            derived.antennas = self._antennas
+
+    def get_geometry(self):
+        """Return the ArrayGeometry (antenna position and baseline
+        arrays in BDF order) for this scan's antennas and phase centre.
+        These are shared between all scans with the same antenna
+        positions and source position."""
+        if self._geometry is None:
+            self._geometry = geometry.get_geometry(
+                self.get_antennas(), self._backend.ra(self.obs),
+                self._backend.dec(self.obs))
+        return self._geometry
+
+    def lst(self, mjd, eop=None):
+        """Local sidereal time (radians) at mjd, which may be an array.
+        This is extrapolated from the scan startLST and startTime, or if
+        an EopTable is given (eg Dataset.eop), computed from UT1."""
+        if eop is not None:
+            return eop.lst(mjd, geometry.VLA_LONGITUDE)
+        turns = (self._backend.startLST(self.obs) +
+                 (np.asarray(mjd) - self.startTime) * geometry.SIDEREAL_RATE)
+        return 2.0 * np.pi * np.mod(turns, 1.0)
+
+    def uvw(self, mjd=None, eop=None):
+        """UVW (m) of all baselines at mjd (default the scan start time).
+        For an array of nt times the result has shape (nt, nbl, 3),
+        otherwise (nbl, 3).  eop is passed to lst()."""
+        if mjd is None:
+            mjd = self.startTime
+        return self.get_geometry().uvw(self.lst(mjd, eop))
+
+
+class VdifRouting(object):
+    """Index of the subbands of a VCI document and where their VDIF
+    output is sent.
+
+    Attributes
+    ----------
+    entries : list of (subBand, IFid, vdif) for each subband (with vdif
+        None) followed by one for each of its vdif elements
+    subband_entries : indices of the entries without vdif, in document
+        order
+    vdif_entries : indices of the entries with vdif, in document order
+    by_ip : dict of destination IP (aDestIP or bDestIP) to the sorted
+        indices of the vdif entries sent there
+    """
+
+    def __init__(self, vci, backend):
+        self.entries = []
+        self.subband_entries = []
+        self.vdif_entries = []
+        self.by_ip = {}
+        for baseBand in backend.baseBands(vci):
+            IFid = ScanConfig.swbbName_to_IFid(str(baseBand.attrib["swbbName"]))
+            for subBand in backend.subBands(baseBand):
+                self.subband_entries.append(len(self.entries))
+                self.entries.append((subBand, IFid, None))
+                # Not really sure what more than 1 summedArray means..
+                for vdif in backend.vdifs(subBand):
+                    i = len(self.entries)
+                    self.vdif_entries.append(i)
+                    self.entries.append((subBand, IFid, vdif))
+                    for ip in set((vdif.attrib.get('aDestIP'),
+                                   vdif.attrib.get('bDestIP'))):
+                        if ip is not None:
+                            self.by_ip.setdefault(str(ip), []).append(i)
+
+    @property
+    def ips(self):
+        return sorted(self.by_ip.keys())
+
+    def match(self, ips):
+        """Indices of the vdif entries sent to any of ips, in document
+        order."""
+        found = [self.by_ip.get(ip, ()) for ip in set(ips)]
+        if len(found) == 1:
+            return list(found[0])
+        return sorted(set(i for f in found for i in f))
+
+
+# VdifRouting objects keyed by VCI configId, stored with the VCI element
+# they were built from.  All scans of a configuration share the same VCI
+# element (see Controller.add_vci), so the index is built once for each.
+_routing_cache = {}
+_routing_cache_size = 64
+
+
+def get_routing(vci, backend):
+    """Cached VdifRouting for a VCI document."""
+    key = (str(vci.attrib.get('configId')), backend.name)
+    try:
+        (cached_vci, routing) = _routing_cache[key]
+        if cached_vci is vci:
+            return routing
+    except KeyError:
+        pass
+    routing = VdifRouting(vci, backend)
+    if len(_routing_cache) >= _routing_cache_size:
+        _routing_cache.clear()
+    _routing_cache[key] = (vci, routing)
+    return routing
 
 
 class SubBand(object):
@@ -523,9 +888,11 @@ class SubBand(object):
         # Note, this will fail if the subBand.pp elements are not
         # labelled with correct id attributes.  I belive this is
         # tested by CM.
-        npp = len(subBand.polProducts.pp)
+        vb = config._vci_backend
+        pps = vb.pp(subBand)
+        npp = len(pps)
         self.pp = [None, ] * npp
-        for pp in subBand.polProducts.pp:
+        for pp in pps:
             idx = int(pp.attrib['id'])-1
             self.pp[idx] = str(pp.attrib['correlation'])
 
@@ -533,47 +900,77 @@ class SubBand(object):
         # do not think it is allowed for this to vary, so we will make
         # this a single value.
         # TODO: Also look for CBE frequency integration?
-        self.spectralChannels = int(subBand.polProducts.pp[0].attrib['spectralChannels'])
+        self.spectralChannels = int(pps[0].attrib['spectralChannels'])
 
         # Time resolution in seconds, two are specified.  The first is
         # the time step coming out of the correlator HW.  The second is
         # the final value recorded by the cbe.
-        if IFid in list(config.binningPeriod.keys()):
+        blb = vb.blbProdIntegration(subBand).attrib
+        binningPeriod = config.binningPeriod
+        if IFid in list(binningPeriod.keys()):
             self.hw_time_res = \
-                    1e-6 * config.binningPeriod[IFid] \
-                    * int(subBand.polProducts.blbProdIntegration.attrib['ltaIntegFactor'])
+                    1e-6 * binningPeriod[IFid] \
+                    * int(blb['ltaIntegFactor'])
         else:
             self.hw_time_res = \
-                    1e-6 * float(subBand.polProducts.blbProdIntegration.attrib['minIntegTime'])\
-                    * int(subBand.polProducts.blbProdIntegration.attrib['ccIntegFactor']) \
-                    * int(subBand.polProducts.blbProdIntegration.attrib['ltaIntegFactor'])
+                    1e-6 * float(blb['minIntegTime'])\
+                    * int(blb['ccIntegFactor']) \
+                    * int(blb['ltaIntegFactor'])
 
         self.final_time_res = self.hw_time_res \
-                    * int(subBand.polProducts.blbProdIntegration.attrib['cbeIntegFactor'])
+                    * int(blb['cbeIntegFactor'])
 
     @property
     def npp(self):
         return len(self.pp)
 
+    def __reduce__(self):
+        # The vdif element is sent as XML, everything else is plain values.
+        state = dict(self.__dict__)
+        return (SubBand.from_state, (state, _doc_bytes(state.pop('vdif'))))
+
+    @classmethod
+    def from_state(cls, state, vdif=None):
+        sub = cls.__new__(cls)
+        sub.__dict__.update(state)
+        if isinstance(vdif, (bytes, type(b''))):
+            vdif = etree.fromstring(vdif)
+        sub.vdif = vdif
+        return sub
+
 
 class Antenna(object):
     """Holds info about an antenna, as described in the Antenna Properties
-    Table.  Initialize with the AntennaProperties xml element."""
+    Table.  Initialize with the AntennaProperties xml element, and
+    optionally the document backend (name or instance) used to read it."""
     # TODO should this be immutable (named tuple or similar?)
 
-    def __init__(self, antprop):
-        self.name = str(antprop.attrib['name'])
-        self.widarID = int(antprop.widarID)
-        self.pad = str(antprop.pad)
-        self.X = float(antprop.X)
-        self.Y = float(antprop.Y)
-        self.Z = float(antprop.Z)
-        self.offset = float(antprop.offset)
+    def __init__(self, antprop, backend='objectify'):
+        fields = get_backend(backend).antenna(antprop)
+        self.name = fields['name']
+        self.widarID = fields['widarID']
+        self.pad = fields['pad']
+        self.X = fields['X']
+        self.Y = fields['Y']
+        self.Z = fields['Z']
+        self.offset = fields['offset']
 
     @property
     def xyz(self):
         return [self.X, self.Y, self.Z]
 
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, fields):
+        ant = cls.__new__(cls)
+        ant.__dict__.update(fields)
+        return ant
+
+    def __reduce__(self):
+        return (type(self).from_dict, (self.to_dict(), ))
+
 
 # Test program
 if __name__ == "__main__":
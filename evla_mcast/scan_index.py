@@ -0,0 +1,146 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import bisect
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Time index of the scans known to a Controller.
+#
+# Scans are kept in a list sorted by (startTime, insertion number), with
+# their stop times (the stop time of their last subscan) in a dict.  The
+# longest duration of any scan with a known stop time bounds how far
+# before t a scan active at t can start, so a point or range query only
+# bisects the sorted list and checks the stop times of the scans starting
+# in [t0 - max_duration, t1].  Scans whose stop time is not yet known
+# (the last scan of each live dataset, usually) are kept in a separate
+# set and are active from their start on.
+#
+# Inserting or removing a scan is a bisect plus a list insert/delete,
+# which for the few thousand scans of the live datasets is a short
+# memmove.  Times are MJD.
+
+_inf = float('inf')
+
+
+class ScanIndex(object):
+    """Interval index of ScanConfigs by startTime and stopTime.
+
+    Attributes
+    ----------
+    max_duration : longest duration (days) of the indexed scans with a
+        known stop time
+    """
+
+    def __init__(self):
+        self._starts = []  # sorted (startTime, n)
+        self._keys = {}    # id(scan) -> (startTime, n)
+        self._scans = {}   # n -> scan
+        self._start = {}   # n -> startTime
+        self._stops = {}   # n -> stopTime (inf if unknown)
+        self._open = set()  # n of scans with unknown stopTime
+        self._count = 0
+        self.max_duration = 0.0
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __contains__(self, scan):
+        return id(scan) in self._keys
+
+    @staticmethod
+    def _stop(scan):
+        stop = scan.subscans[-1].stopTime
+        return _inf if stop is None else stop
+
+    def add(self, scan):
+        """Index scan, or update its stop time if it is indexed."""
+        if id(scan) in self._keys:
+            self.update(scan)
+            return
+        self._count += 1
+        key = (scan.startTime, self._count)
+        bisect.insort(self._starts, key)
+        self._keys[id(scan)] = key
+        self._scans[key[1]] = scan
+        self._start[key[1]] = key[0]
+        self._set_stop(key[1], self._stop(scan))
+
+    def update(self, scan):
+        """Update the stop time of an indexed scan (eg after its
+        update_stopTime or add_subscan)."""
+        key = self._keys.get(id(scan))
+        if key is None:
+            return
+        stop = self._stop(scan)
+        if stop != self._stops[key[1]]:
+            self._set_stop(key[1], stop)
+
+    def _set_stop(self, n, stop):
+        start = self._start[n]
+        old = self._stops.get(n, _inf)
+        self._stops[n] = stop
+        if stop == _inf:
+            self._open.add(n)
+        else:
+            self._open.discard(n)
+        if stop != _inf and stop - start > self.max_duration:
+            self.max_duration = stop - start
+        elif old != _inf and old - start >= self.max_duration:
+            # The longest scan got shorter (or open-ended)
+            self._update_max_duration()
+
+    def _update_max_duration(self):
+        durations = [self._stops[n] - s for (s, n) in self._starts
+                     if n not in self._open]
+        self.max_duration = max(durations) if durations else 0.0
+
+    def remove(self, scan):
+        """Remove scan from the index."""
+        key = self._keys.pop(id(scan), None)
+        if key is None:
+            return
+        (start, n) = key
+        del self._starts[bisect.bisect_left(self._starts, key)]
+        del self._scans[n]
+        del self._start[n]
+        stop = self._stops.pop(n)
+        self._open.discard(n)
+        if stop != _inf and stop - start >= self.max_duration:
+            self._update_max_duration()
+
+    def _select(self, t0, t1):
+        # n of scans with start <= t1 and stop > t0, by startTime
+        i0 = bisect.bisect_left(self._starts, (t0 - self.max_duration, ))
+        i1 = bisect.bisect_right(self._starts, (t1, _inf))
+        found = [n for (s, n) in self._starts[i0:i1] if self._stops[n] > t0]
+        # Scans of unknown length starting before the window
+        early = [(self._start[n], n) for n in self._open
+                 if self._start[n] < t0 - self.max_duration]
+        if early:
+            found = [n for (s, n) in sorted(early)] + found
+        return found
+
+    def active(self, t):
+        """Scans with startTime <= t < stopTime, by startTime."""
+        return [self._scans[n] for n in self._select(t, t)]
+
+    def overlapping(self, t0, t1):
+        """Scans overlapping the range t0 <= t < t1 (startTime < t1 and
+        stopTime > t0), by startTime."""
+        return [self._scans[n] for n in self._select(t0, t1)
+                if self._start[n] < t1]
+
+    def next_start(self, t):
+        """The first scan with startTime > t, or None."""
+        i = bisect.bisect_right(self._starts, (t, _inf))
+        if i == len(self._starts):
+            return None
+        return self._scans[self._starts[i][1]]
+
+    def scans(self):
+        """All indexed scans, by startTime."""
+        return [self._scans[n] for (s, n) in self._starts]
@@ -0,0 +1,313 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import json
+import struct
+import hashlib
+
+import numpy as np
+
+from .scan_config import ScanConfig
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Shared-memory store of decoded scan configurations.
+#
+# The controller publishes each scan once, under its scanId, as a single
+# shared memory block holding a JSON header (the ScanConfig state, see
+# ScanConfig.to_json, plus subband and antenna names) followed by NumPy
+# arrays derived from it: subband frequencies, antenna positions and
+# baselines.  Worker processes on the same node attach to the block by
+# scanId and get read-only array views of it, without copying or
+# recomputing anything.
+#
+# Block layout: magic 'EVSH', version (I), header length (Q), generation
+# (Q), stale flag (I), JSON header, then the arrays, each at a 64 byte
+# aligned offset given in the header.
+#
+# The controller republishes a scan whenever it changes (stop times
+# filled in, subscans added).  The new state goes in a new block under
+# the same name, with the generation incremented; the old block is
+# flagged stale before it is unlinked.  Workers that are attached to it
+# keep their mapping, and should check SharedConfig.stale and attach
+# again to see the current state.
+#
+# The controller side counts references to each scan (the first publish
+# and acquire add one, release removes one; republishing keeps the
+# count) and unlinks the block when none are left, or when the whole
+# dataset is released at its end.  Workers that are still attached keep
+# their mapping until they close it.
+#
+# Requires Python 3.8 (multiprocessing.shared_memory).
+
+_magic = b'EVSH'
+_version = 2
+_header = struct.Struct('<4sIQQI')
+_stale_offset = _header.size - 4
+_align = 64
+
+
+def shm_name(scanId, prefix='evla'):
+    """Shared memory block name for a scanId."""
+    digest = hashlib.sha1(str(scanId).encode('utf-8')).hexdigest()[:20]
+    return '%s_%s' % (prefix, digest)
+
+
+def _require_shm():
+    if shared_memory is None:
+        raise RuntimeError('multiprocessing.shared_memory is not available '
+                           '(requires Python 3.8 or later)')
+
+
+def config_arrays(config):
+    """Dict of the NumPy arrays derived from a ScanConfig that are
+    published, and the names (IFids, antenna names) they refer to."""
+    subs = config.get_subbands()
+    ants = config.get_antennas()
+    geom = config.get_geometry()
+    arrays = dict(
+        sky_center_freq=np.array([s.sky_center_freq for s in subs],
+                                 dtype=np.float64),
+        bb_center_freq=np.array([s.bb_center_freq for s in subs],
+                                dtype=np.float64),
+        bw=np.array([s.bw for s in subs], dtype=np.float64),
+        swIndex=np.array([s.swIndex for s in subs], dtype=np.int32),
+        sbid=np.array([s.sbid for s in subs], dtype=np.int32),
+        antenna_xyz=np.array([a.xyz for a in ants],
+                             dtype=np.float64).reshape(-1, 3),
+        ant1=np.asarray(geom.ant1, dtype=np.int64),
+        ant2=np.asarray(geom.ant2, dtype=np.int64),
+        baselines=np.asarray(geom.bl, dtype=np.float64))
+    names = dict(IFid=[s.IFid for s in subs],
+                 antennas=[a.name for a in ants])
+    return (arrays, names)
+
+
+class ShmConfigStore(object):
+    """Publishes ScanConfigs to shared memory (controller side).
+
+    prefix: block name prefix, see shm_name().
+    """
+
+    def __init__(self, prefix='evla'):
+        _require_shm()
+        self.prefix = prefix
+        self._blocks = {}  # scanId -> [SharedMemory, refcount, datasetId]
+        self._generations = {}  # scanId -> generation of the last publish
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __contains__(self, scanId):
+        return scanId in self._blocks
+
+    def refcount(self, scanId):
+        return self._blocks[scanId][1] if scanId in self._blocks else 0
+
+    def publish(self, config):
+        """Publish config (and its subscans) under its scanId.  If the
+        scan was already published the block is replaced with the current
+        state (a new generation, the old block is flagged stale) and its
+        reference count is unchanged, otherwise the count is one.
+        Returns the block name.  Scans with a streamed VCI (vci_stream)
+        can not be serialized and raise ValueError."""
+        if config.vci is not None and not hasattr(config.vci, 'tag'):
+            raise ValueError('Scan {0} has a streamed VCI, which can not be '
+                             'published'.format(config.scanId))
+        (arrays, names) = config_arrays(config)
+        layout = []
+        offset = 0
+        for (key, arr) in sorted(arrays.items()):
+            layout.append((key, arr.dtype.str, arr.shape, offset))
+            offset += (arr.nbytes + _align - 1) // _align * _align
+        header = json.dumps(dict(scanId=config.scanId,
+                                 datasetId=config.datasetId,
+                                 names=names, arrays=layout,
+                                 tracker=_tracker_pid(),
+                                 config=config.to_json())).encode('utf-8')
+        start = (_header.size + len(header) + _align - 1) // _align * _align
+        scanId = config.scanId
+        refs = 1
+        if scanId in self._blocks:
+            refs = self._blocks[scanId][1]
+            self._unlink(scanId)
+        generation = self._generations.get(scanId, 0) + 1
+        self._generations[scanId] = generation
+        name = shm_name(scanId, self.prefix)
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=max(start + offset, 1))
+        shm.buf[:_header.size] = _header.pack(_magic, _version, len(header),
+                                              generation, 0)
+        shm.buf[_header.size:_header.size + len(header)] = header
+        for (key, dtype, shape, off) in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf,
+                              offset=start + off)
+            view[...] = arrays[key]
+            del view
+        self._blocks[scanId] = [shm, refs, config.datasetId]
+        logger.debug('Published scan {0} generation {1} to shared memory '
+                     '{2} ({3} bytes)'.format(scanId, generation, name,
+                                              shm.size))
+        return name
+
+    def acquire(self, scanId):
+        """Add a reference to a published scan."""
+        self._blocks[scanId][1] += 1
+
+    def _unlink(self, scanId):
+        (shm, refs, dsid) = self._blocks.pop(scanId)
+        # Tell workers still attached that this block is no longer current
+        shm.buf[_stale_offset:_header.size] = struct.pack('<I', 1)
+        shm.close()
+        try:
+            shm.unlink()
+        except (OSError, IOError):
+            pass
+
+    def release(self, scanId):
+        """Drop one reference to a scan, unlinking it when none are
+        left."""
+        block = self._blocks.get(scanId)
+        if block is None:
+            return
+        block[1] -= 1
+        if block[1] <= 0:
+            self._unlink(scanId)
+
+    def release_dataset(self, datasetId):
+        """Unlink all scans of a dataset."""
+        for scanId in [k for (k, b) in self._blocks.items()
+                       if b[2] == datasetId]:
+            self._unlink(scanId)
+            self._generations.pop(scanId, None)
+
+    def close(self):
+        """Unlink everything."""
+        for scanId in list(self._blocks):
+            self._unlink(scanId)
+        self._generations = {}
+
+
+def _tracker_pid():
+    # Process id of this process's resource tracker (started if needed),
+    # None where there is none
+    if os.name != 'posix':
+        return None
+    resource_tracker.ensure_running()
+    return getattr(getattr(resource_tracker, '_resource_tracker', None),
+                   '_pid', None)
+
+
+def _attach(name):
+    # Attach to an existing block.  Returns (shm, tracked), tracked being
+    # True if attaching registered the block with the resource tracker
+    # (see _untrack).  track=False avoids that from Python 3.13; before,
+    # blocks are registered on POSIX.
+    try:
+        return (shared_memory.SharedMemory(name=name, track=False), False)
+    except TypeError:
+        pass
+    return (shared_memory.SharedMemory(name=name), os.name == 'posix')
+
+
+def _untrack(shm, tracker):
+    # Undo the registration made by _attach, so the resource tracker does
+    # not unlink the block when this process exits.  Processes started
+    # by the publishing one (fork or spawn) share its tracker, which
+    # holds one entry per name: there the entry is the publisher's own
+    # and is kept.  tracker is the publisher's tracker pid.
+    if tracker is None or tracker != _tracker_pid():
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+
+class SharedConfig(object):
+    """A scan published by ShmConfigStore, attached read-only (worker
+    side).
+
+    Attributes
+    ----------
+    scanId, datasetId : str
+    generation : publish count of the scan when this block was written
+    names : dict of the IFid and antenna name lists
+    arrays : dict of read-only arrays in shared memory (see
+        config_arrays)
+
+    The array views must be released (del) before close() is called.
+    The block is not updated in place: when the controller republishes
+    the scan (eg once its stop time is known) stale becomes True, and the
+    scan must be attached again to see the new state.
+    """
+
+    def __init__(self, scanId, prefix='evla'):
+        _require_shm()
+        name = shm_name(scanId, prefix)
+        (self._shm, tracked) = _attach(name)
+        buf = self._shm.buf
+        (magic, version, nheader, generation, stale) = _header.unpack(
+            bytes(buf[:_header.size]))
+        if magic != _magic or version != _version:
+            if tracked:
+                _untrack(self._shm, None)
+            self._shm.close()
+            raise ValueError('Shared memory {0} is not a published scan'
+                             .format(name))
+        header = json.loads(bytes(buf[_header.size:_header.size + nheader])
+                            .decode('utf-8'))
+        if tracked:
+            _untrack(self._shm, header.get('tracker'))
+        start = (_header.size + nheader + _align - 1) // _align * _align
+        self.generation = generation
+        self.scanId = header['scanId']
+        self.datasetId = header['datasetId']
+        self.names = header['names']
+        self._config_json = header['config']
+        self.arrays = {}
+        for (key, dtype, shape, off) in header['arrays']:
+            arr = np.ndarray(tuple(shape), dtype=dtype, buffer=buf,
+                             offset=start + off)
+            arr.flags.writeable = False
+            self.arrays[key] = arr
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def stale(self):
+        """True if the scan was republished or released since this block
+        was attached."""
+        if self._shm is None:
+            return True
+        (flag, ) = struct.unpack(
+            '<I', bytes(self._shm.buf[_stale_offset:_header.size]))
+        return flag != 0
+
+    def config(self):
+        """The published ScanConfig (rebuilt from its state)."""
+        return ScanConfig.from_json(self._config_json)
+
+    def close(self):
+        if self._shm is None:
+            return
+        self.arrays = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            logger.warning('Shared memory {0} still has array views; not '
+                           'closed'.format(self._shm.name))
+            return
+        self._shm = None
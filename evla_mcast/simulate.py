@@ -0,0 +1,306 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+from future.moves.http.server import HTTPServer, BaseHTTPRequestHandler
+from future.moves.socketserver import ThreadingMixIn
+from future.moves.urllib.parse import urlparse, parse_qs
+
+import os
+import copy
+import time
+import socket
+import threading
+
+from lxml import etree
+
+from . import mcast_clients
+from .eop import gmst
+from .geometry import VLA_LONGITUDE
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Synthetic scheduling blocks and a loopback load simulator.
+#
+# SBGenerator makes Observation, AntennaPropertyTable and VCI documents
+# from templates (copies of the test/data documents installed with the
+# package, in evla_mcast/templates), for any number of subarrays, scans,
+# subscans, subbands per baseband and antennas:
+#
+#   - antennas beyond those in the template are copies of template
+#     antennas with new names, widarIDs and positions
+#   - subbands beyond those in the template are copies of its first
+#     subband with new sbid/swIndex/centralFreq
+#   - each subarray is a dataset with one configuration; its scans are
+#     scan_length apart, subscans split the scan evenly, and the SB ends
+#     with a FINISH scan
+#
+# Simulator sends the documents of one or more SBs in time order over
+# multicast (by default on the loopback interface) at a given rate, and
+# serves the VCIs from a local HTTP server standing in for the MCCC, with
+# the configUrl of every obs document pointing at it.
+
+_default_template_dir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+_widar_ns = 'http://www.nrc.ca/namespaces/widar'
+_vci_bw_max = 16  # 64 MHz subbands in a 1024 MHz baseband
+
+
+def _w(tag):
+    return '{%s}%s' % (_widar_ns, tag)
+
+
+class SBGenerator(object):
+    """Generates the documents of synthetic SBs.
+
+    template_dir: directory with test_obs.xml, test_vci.xml and
+        test_antprop.xml (default the templates installed with the
+        package).
+    nant: number of antennas.
+    nsubband: subbands per baseband (at most 16).
+    url: base of the configUrl put in obs documents; the configId is
+        appended as ?id=<configId>.
+    """
+
+    def __init__(self, template_dir=None, nant=27, nsubband=8,
+                 url='http://127.0.0.1:8081/configDoc'):
+        if template_dir is None:
+            template_dir = _default_template_dir
+        if not os.path.exists(os.path.join(template_dir, 'test_obs.xml')):
+            raise IOError('Templates not found in {0}'.format(template_dir))
+        if not 1 <= nsubband <= _vci_bw_max:
+            raise ValueError('nsubband must be 1-{0}'.format(_vci_bw_max))
+        self.nant = nant
+        self.nsubband = nsubband
+        self.url = url
+        self._obs = etree.parse(os.path.join(template_dir,
+                                             'test_obs.xml')).getroot()
+        self._vci = etree.parse(os.path.join(template_dir,
+                                             'test_vci.xml')).getroot()
+        self._ant = etree.parse(os.path.join(template_dir,
+                                             'test_antprop.xml')).getroot()
+        self.antennas = self._make_antennas()
+
+    def _make_antennas(self):
+        # List of AntennaProperties elements, nant long.
+        template = self._ant.findall('AntennaProperties')
+        ants = [copy.deepcopy(a) for a in template[:self.nant]]
+        for i in range(len(ants), self.nant):
+            a = copy.deepcopy(template[i % len(template)])
+            n = 100 + i
+            a.set('name', 'ea%d' % n)
+            a.find('widarID').text = str(n)
+            a.find('pad').text = 'S%d' % n
+            for (k, axis) in enumerate('XYZ'):
+                el = a.find(axis)
+                el.text = repr(float(el.text) * (1.0 + 0.01 * (i + k)))
+            ants.append(a)
+        return ants
+
+    def ant_doc(self, datasetId, creation):
+        """AntennaPropertyTable document (bytes)."""
+        root = copy.deepcopy(self._ant)
+        root.set('datasetId', datasetId)
+        root.set('creation', repr(creation))
+        for a in root.findall('AntennaProperties'):
+            root.remove(a)
+        for a in self.antennas:
+            root.append(copy.deepcopy(a))
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8',
+                              standalone=True)
+
+    def vci_doc(self, configId):
+        """VCI document (bytes)."""
+        root = copy.deepcopy(self._vci)
+        root.set('configId', configId)
+        root.set('activationId', configId)
+        stations = root.find(_w('listOfStations'))
+        template = stations.find(_w('station'))
+        for s in stations.findall(_w('station')):
+            stations.remove(s)
+        for a in self.antennas:
+            s = copy.deepcopy(template)
+            s.set('name', a.get('name'))
+            s.set('sid', a.find('widarID').text)
+            stations.append(s)
+        for bb in root.iter(_w('baseBand')):
+            subs = bb.findall(_w('subBand'))
+            # New subbands go where the old ones were, ahead of any
+            # elements following them in the baseBand.
+            pos = bb.index(subs[0])
+            for s in subs:
+                bb.remove(s)
+            sub_bw = float(subs[0].get('bw'))
+            for i in range(self.nsubband):
+                s = copy.deepcopy(subs[i] if i < len(subs) else subs[0])
+                s.set('sbid', str(i))
+                s.set('swIndex', str(i + 1))
+                s.set('centralFreq', repr((i + 0.5) * sub_bw))
+                bb.insert(pos + i, s)
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8',
+                              standalone=True)
+
+    def obs_doc(self, datasetId, configId, seq, startTime, scanNo,
+                subscanNo=1, source=None):
+        """Observation document (bytes)."""
+        root = copy.deepcopy(self._obs)
+        root.set('datasetId', datasetId)
+        root.set('configId', configId)
+        root.set('configUrl', '{0}?id={1}'.format(self.url, configId))
+        root.set('seq', str(seq))
+        root.set('startTime', repr(startTime))
+        root.find('scanNo').text = str(scanNo)
+        root.find('subscanNo').text = str(subscanNo)
+        if source is not None:
+            root.find('name').text = source
+        lst = (gmst(startTime) + VLA_LONGITUDE) / (2.0 * 3.141592653589793)
+        root.find('startLST').text = repr(float(lst % 1.0))
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8',
+                              standalone=True)
+
+    def sb(self, datasetId, start, nscan=10, nsubscan=1, scan_length=30.0,
+           lead_time=10.0):
+        """List of (send time, kind, configId or None, document) for one
+        SB, with times in MJD.  kind is 'ant', 'vci' or 'obs'.  Obs
+        documents are sent lead_time seconds before their scan starts."""
+        configId = datasetId + '.1'
+        events = [(start - (lead_time + 1.0) / 86400.0, 'ant', None,
+                   self.ant_doc(datasetId, start)),
+                  (start - (lead_time + 1.0) / 86400.0, 'vci', configId,
+                   self.vci_doc(configId))]
+        seq = 0
+        dt = scan_length / 86400.0
+        for scan in range(nscan):
+            for sub in range(nsubscan):
+                t = start + dt * (scan + sub / float(nsubscan))
+                seq += 1
+                events.append((t - lead_time / 86400.0, 'obs', configId,
+                               self.obs_doc(datasetId, configId, seq, t,
+                                            scan + 1, sub + 1,
+                                            source='SRC%d' % (scan % 5))))
+        t = start + dt * nscan
+        events.append((t - lead_time / 86400.0, 'obs', configId,
+                       self.obs_doc(datasetId, configId, seq + 1, t,
+                                    nscan + 1, source='FINISH')))
+        return events
+
+    def sbs(self, nsubarray=1, start=57897.9, prefix='SIM', **kwargs):
+        """Events (see sb()) of nsubarray simultaneous SBs, in time
+        order.  Other keyword arguments are passed to sb()."""
+        events = []
+        for i in range(nsubarray):
+            datasetId = '{0}.{1:.8f}.{2}'.format(prefix, start, i + 1)
+            events.extend(self.sb(datasetId, start + i * 1e-6, **kwargs))
+        return sorted(events, key=lambda e: e[0])
+
+
+class _VCIHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        doc = self.server.docs.get(query.get('id', [''])[0])
+        if doc is None:
+            self.send_error(404)
+            return
+        self.server.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(doc)))
+        self.end_headers()
+        self.wfile.write(doc)
+
+    def log_message(self, format, *args):
+        logger.debug('vci server: ' + format % args)
+
+
+class VCIServer(ThreadingMixIn, HTTPServer):
+    """HTTP server for VCI documents (configUrl stand-in), run in a
+    background thread.  docs is a dict of configId to document; GET
+    <url>?id=<configId> returns it.  port 0 picks a free port."""
+    daemon_threads = True
+
+    def __init__(self, docs=None, host='127.0.0.1', port=0):
+        HTTPServer.__init__(self, (host, port), _VCIHandler)
+        self.docs = {} if docs is None else docs
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}/configDoc'.format(*self.server_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class Simulator(object):
+    """Sends generated SB documents over multicast.
+
+    generator: SBGenerator; its url is pointed at the VCI server.
+    rate: documents per second (None sends as fast as possible).
+    burst: documents sent back to back at each tick.
+    The groups/ports default to the VLA ones on the loopback interface.
+    """
+
+    def __init__(self, generator, obs_group=mcast_clients.OBS_GROUP,
+                 obs_port=mcast_clients.OBS_PORT,
+                 ant_group=mcast_clients.ANT_GROUP,
+                 ant_port=mcast_clients.ANT_PORT, interface='127.0.0.1',
+                 rate=100.0, burst=1, http_port=0):
+        self.generator = generator
+        self.obs_addr = (obs_group, obs_port)
+        self.ant_addr = (ant_group, ant_port)
+        self.rate = rate
+        self.burst = burst
+        self.server = VCIServer(port=http_port)
+        generator.url = self.server.url
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                             socket.inet_aton(interface))
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 0)
+        self.sent = dict(obs=0, ant=0)
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def close(self):
+        self.server.stop()
+        self.sock.close()
+
+    def send(self, events):
+        """Send events (from SBGenerator.sb/sbs).  VCIs are added to the
+        server instead of being sent.  Returns the elapsed time (s)."""
+        t0 = time.time()
+        n = 0
+        for (t, kind, configId, doc) in events:
+            if kind == 'vci':
+                self.server.docs[configId] = doc
+                continue
+            addr = self.obs_addr if kind == 'obs' else self.ant_addr
+            self.sock.sendto(doc, addr)
+            self.sent[kind] += 1
+            n += 1
+            if self.rate and n % self.burst == 0:
+                delay = t0 + n / float(self.rate) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+        return time.time() - t0
+
+    def send_in_thread(self, events):
+        """Start send(events) in a background thread, which is
+        returned."""
+        thread = threading.Thread(target=self.send, args=(events, ))
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -0,0 +1,204 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import heapq
+
+import numpy as np
+
+from .angles import _from_s_array, d2r
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Spatial index of positions on the sky, for matching scan positions
+# against a catalog of sources.
+#
+# Positions are stored as unit Cartesian vectors (as from
+# CartesianVector.from_s) in a KD-tree.  The tree is kept in flat NumPy
+# arrays: the points are permuted so that each node covers a contiguous
+# range of them, and each node has the bounding box of its points.
+# Angular distance is monotonic in the chord length between unit
+# vectors, |v1 - v2| = 2 sin(sep / 2), so a cone search of radius r is
+# a search for points within chord 2 sin(r / 2) of the centre, and the
+# nearest neighbours in chord length are the nearest on the sky.
+#
+# All angles are in radians.
+
+
+def _chord2(sep):
+    # Squared chord length for an angular separation.
+    return (2.0 * np.sin(np.minimum(sep, np.pi) / 2.0)) ** 2
+
+
+def _sep(chord2):
+    # Angular separation for a squared chord length.
+    return 2.0 * np.arcsin(np.minimum(np.sqrt(chord2) / 2.0, 1.0))
+
+
+class SkyIndex(object):
+    """KD-tree of positions on the sky.
+
+    Parameters
+    ----------
+    ra, dec : array_like
+        Longitudes and latitudes of the positions, in radians.
+    leafsize : int
+        Maximum number of points in a leaf node.
+
+    Query results are indices into the ra/dec arrays the index was
+    built from.
+    """
+
+    def __init__(self, ra=(), dec=(), leafsize=32):
+        ra = np.asarray(ra, dtype=np.float64).ravel()
+        dec = np.asarray(dec, dtype=np.float64).ravel()
+        if ra.shape != dec.shape:
+            raise ValueError('ra and dec must have the same length')
+        self.leafsize = int(leafsize)
+        xyz = np.column_stack(_from_s_array(ra, dec)) if len(ra) else \
+            np.zeros((0, 3))
+        self._build(xyz)
+
+    @classmethod
+    def from_positions(cls, positions, leafsize=32):
+        """SkyIndex of an angles.PositionArray."""
+        return cls(positions.alpha.r, positions.delta.r, leafsize=leafsize)
+
+    def _build(self, xyz):
+        n = len(xyz)
+        perm = np.arange(n)
+        start, end, lo, hi, left, right = [], [], [], [], [], []
+
+        def node(s, e):
+            i = len(start)
+            pts = xyz[perm[s:e]]
+            start.append(s)
+            end.append(e)
+            lo.append(pts.min(axis=0) if e > s else np.zeros(3))
+            hi.append(pts.max(axis=0) if e > s else np.zeros(3))
+            left.append(-1)
+            right.append(-1)
+            if e - s > self.leafsize:
+                # Split at the median along the widest dimension.
+                dim = np.argmax(hi[i] - lo[i])
+                m = (e - s) // 2
+                order = np.argpartition(pts[:, dim], m)
+                perm[s:e] = perm[s:e][order]
+                left[i] = node(s, s + m)
+                right[i] = node(s + m, e)
+            return i
+
+        node(0, n)
+        self.perm = perm
+        self.xyz = np.ascontiguousarray(xyz[perm])
+        self.node_start = np.array(start, dtype=np.int64)
+        self.node_end = np.array(end, dtype=np.int64)
+        self.node_lo = np.array(lo, dtype=np.float64).reshape(-1, 3)
+        self.node_hi = np.array(hi, dtype=np.float64).reshape(-1, 3)
+        self.node_left = np.array(left, dtype=np.int64)
+        self.node_right = np.array(right, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def _box_dist2(self, i, c):
+        # Squared distance from c to the bounding box of node i.
+        d = np.maximum(0.0, np.maximum(self.node_lo[i] - c,
+                                       c - self.node_hi[i]))
+        return float(np.dot(d, d))
+
+    def _box_far2(self, i, c):
+        # Squared distance from c to the furthest corner of node i.
+        d = np.maximum(np.abs(self.node_lo[i] - c),
+                       np.abs(self.node_hi[i] - c))
+        return float(np.dot(d, d))
+
+    def cone_search(self, ra, dec, radius, sort=False):
+        """Positions within radius of (ra, dec).
+
+        Returns (indices, separations) arrays, in index order or
+        ordered by separation if sort is True.
+        """
+        c = np.array(_from_s_array(float(ra), float(dec)))
+        t2 = float(_chord2(radius))
+        idx = []
+        d2 = []
+        stack = [0] if len(self) else []
+        while stack:
+            i = stack.pop()
+            if self._box_dist2(i, c) > t2:
+                continue
+            s, e = self.node_start[i], self.node_end[i]
+            if self.node_left[i] < 0 or self._box_far2(i, c) <= t2:
+                dd = ((self.xyz[s:e] - c) ** 2).sum(axis=1)
+                sel = np.nonzero(dd <= t2)[0]
+                idx.append(sel + s)
+                d2.append(dd[sel])
+            else:
+                stack.append(self.node_left[i])
+                stack.append(self.node_right[i])
+        if not idx:
+            return (np.zeros(0, dtype=np.int64), np.zeros(0))
+        pos = np.concatenate(idx)
+        d2 = np.concatenate(d2)
+        order = np.argsort(d2, kind='mergesort') if sort \
+            else np.argsort(self.perm[pos], kind='mergesort')
+        return (self.perm[pos[order]], _sep(d2[order]))
+
+    def nearest(self, ra, dec, k=1):
+        """The k nearest positions to (ra, dec).
+
+        Returns (indices, separations) arrays ordered by separation.
+        """
+        c = np.array(_from_s_array(float(ra), float(dec)))
+        k = min(int(k), len(self))
+        best = []  # heap of (-d2, index into self.xyz)
+        queue = [(0.0, 0)] if k > 0 else []
+        while queue:
+            (bd2, i) = heapq.heappop(queue)
+            if len(best) == k and bd2 > -best[0][0]:
+                break
+            if self.node_left[i] < 0:
+                s, e = self.node_start[i], self.node_end[i]
+                dd = ((self.xyz[s:e] - c) ** 2).sum(axis=1)
+                for j in np.argsort(dd)[:k]:
+                    item = (-float(dd[j]), int(s + j))
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+                    else:
+                        break
+            else:
+                for ch in (self.node_left[i], self.node_right[i]):
+                    heapq.heappush(queue, (self._box_dist2(ch, c), int(ch)))
+        best.sort(reverse=True)
+        pos = np.array([b[1] for b in best], dtype=np.int64)
+        d2 = np.array([-b[0] for b in best], dtype=np.float64)
+        return (self.perm[pos], _sep(d2))
+
+    def match_config(self, config, radius):
+        """cone_search around the phase centre of a ScanConfig, nearest
+        first."""
+        return self.cone_search(d2r(config.ra_deg), d2r(config.dec_deg),
+                                radius, sort=True)
+
+    _arrays = ('perm', 'xyz', 'node_start', 'node_end', 'node_lo',
+               'node_hi', 'node_left', 'node_right')
+
+    def save(self, filename):
+        """Write the index to a .npz file."""
+        np.savez(filename, leafsize=self.leafsize,
+                 **dict((a, getattr(self, a)) for a in self._arrays))
+
+    @classmethod
+    def load(cls, filename):
+        """Read an index written by save()."""
+        index = cls.__new__(cls)
+        with np.load(filename) as data:
+            index.leafsize = int(data['leafsize'])
+            for a in cls._arrays:
+                setattr(index, a, data[a])
+        return index
@@ -0,0 +1,179 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+import os
+import struct
+import hashlib
+import zlib
+
+from lxml import objectify
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Persistent on-disk store of raw VCI documents, by configId.
+#
+# ObsClient normally fetches the VCI of every scan over HTTP from the
+# configUrl of the obs document.  With a VCIStore it first looks for the
+# configId here, and saves what it fetches, so a restarted receiver or
+# an offline job can get VCIs without talking to the MCCC.
+#
+# Each document is one file, named by the SHA-256 of its configId:
+#
+#   magic 'EVCI', flags (B), SHA-256 of the document (32s),
+#   configId length (H), configId, document (zlib compressed if
+#   flags & 1)
+#
+# The digest is checked when a document is read; a file that does not
+# match (or can not be read) is removed and treated as missing.  Files
+# are written to a temporary name and renamed, so readers never see a
+# partial file.
+#
+# The total size of the files is kept below max_bytes by removing the
+# least recently used documents (by file modification time, which is
+# updated when a document is read).
+
+_magic = b'EVCI'
+_header = struct.Struct('<4sB32sH')
+_COMPRESSED = 1
+_suffix = '.vci'
+
+
+class VCIStore(object):
+    """Directory of raw VCI documents keyed by configId.
+
+    path: directory, created if needed.
+    max_bytes: maximum total size of the stored files.
+    compress: zlib compress documents when saving.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30, compress=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._sizes = {}  # file name -> size
+        for name in os.listdir(path):
+            if name.endswith(_suffix):
+                self._sizes[name] = os.path.getsize(os.path.join(path, name))
+        self.nbytes = sum(self._sizes.values())
+
+    @staticmethod
+    def _name(configId):
+        return hashlib.sha256(configId.encode('utf-8')).hexdigest() + _suffix
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __contains__(self, configId):
+        return self._name(configId) in self._sizes
+
+    def _read(self, name):
+        # (configId, document) from a stored file.
+        with open(os.path.join(self.path, name), 'rb') as f:
+            data = f.read()
+        (magic, flags, digest, nid) = _header.unpack_from(data)
+        if magic != _magic:
+            raise ValueError('bad magic')
+        start = _header.size + nid
+        configId = data[_header.size:start].decode('utf-8')
+        doc = data[start:]
+        if flags & _COMPRESSED:
+            doc = zlib.decompress(doc)
+        if hashlib.sha256(doc).digest() != digest:
+            raise ValueError('checksum mismatch')
+        return (configId, doc)
+
+    def get(self, configId):
+        """The raw VCI document for configId, or None."""
+        name = self._name(configId)
+        if name not in self._sizes:
+            return None
+        try:
+            (stored_id, doc) = self._read(name)
+            if stored_id != configId:
+                raise ValueError('configId mismatch')
+        except Exception as e:
+            logger.warning('Removing unreadable VCI store entry {0} for {1}: '
+                           '{2}'.format(name, configId, e))
+            self._remove(name)
+            return None
+        # Mark as recently used
+        try:
+            os.utime(os.path.join(self.path, name), None)
+        except OSError:
+            pass
+        return doc
+
+    def load(self, configId, stream=False):
+        """The parsed VCI for configId (an objectify tree, or a
+        vci_stream record if stream is True), or None."""
+        doc = self.get(configId)
+        if doc is None:
+            return None
+        if stream:
+            from .vci_stream import parse_vci
+            return parse_vci(doc)
+        from .mcast_clients import _vci_parser
+        return objectify.fromstring(doc, parser=_vci_parser)
+
+    def put(self, configId, doc):
+        """Save a raw VCI document."""
+        flags = 0
+        data = doc
+        if self.compress:
+            flags |= _COMPRESSED
+            data = zlib.compress(doc)
+        cid = configId.encode('utf-8')
+        data = _header.pack(_magic, flags, hashlib.sha256(doc).digest(),
+                            len(cid)) + cid + data
+        name = self._name(configId)
+        fname = os.path.join(self.path, name)
+        tmp = fname + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.rename(tmp, fname)
+        self.nbytes += len(data) - self._sizes.get(name, 0)
+        self._sizes[name] = len(data)
+        self._evict(keep=name)
+
+    def remove(self, configId):
+        self._remove(self._name(configId))
+
+    def _remove(self, name):
+        try:
+            os.unlink(os.path.join(self.path, name))
+        except OSError:
+            pass
+        self.nbytes -= self._sizes.pop(name, 0)
+
+    def _evict(self, keep=None):
+        # Remove least recently used files until under max_bytes.
+        if self.nbytes <= self.max_bytes:
+            return
+        mtimes = []
+        for name in self._sizes:
+            try:
+                mtime = os.path.getmtime(os.path.join(self.path, name))
+            except OSError:
+                mtime = 0.0
+            mtimes.append((mtime, name))
+        for (mtime, name) in sorted(mtimes):
+            if self.nbytes <= self.max_bytes:
+                break
+            if name != keep:
+                logger.debug('Evicting VCI store entry {0}'.format(name))
+                self._remove(name)
+
+    def configIds(self):
+        """List of the stored configIds."""
+        ids = []
+        for name in list(self._sizes):
+            try:
+                ids.append(self._read(name)[0])
+            except Exception:
+                self._remove(name)
+        return sorted(ids)
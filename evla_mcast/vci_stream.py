@@ -0,0 +1,187 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+from builtins import bytes, dict, object, range, map, input, str
+from future.utils import itervalues, viewitems, iteritems, listvalues, listitems
+from io import open
+
+from lxml import etree
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Streaming VCI loader.
+#
+# ScanConfig only looks at a small part of the VCI document: the station
+# list and, for the first stationInputOutput element, the baseBand /
+# subBand / polProducts / summedArray.vdif structure.  Real VCIs can be
+# much larger than this (per-station stationInputOutput overrides,
+# baseline lists, phase bin tables, etc), and building a full objectify
+# tree for them is slow and uses a lot of memory.
+#
+# parse_vci() instead runs the document through an lxml parser target,
+# which receives start/end events without building any tree, keeps only
+# the elements listed above and discards everything else.  The result is
+# a tree of small record objects that mirror the element and attribute
+# names of the objectify tree, for the subset of the document they
+# contain, so they can be used as the vci argument of ScanConfig (or
+# Controller.add_vci) in place of the objectify tree.
+#
+# Note, no schema validation is done since lxml can not validate while
+# sending events to a parser target.
+
+_widar_ns = '{http://www.nrc.ca/namespaces/widar}'
+
+
+class VCIElement(object):
+    """Record holding the attributes of a single VCI element."""
+    __slots__ = ('attrib', )
+
+    def __init__(self, attrib):
+        self.attrib = attrib
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.attrib)
+
+
+class VCIRecord(VCIElement):
+    """Root (subArray) element.  Has listOfStations and a
+    stationInputOutput list containing only the first stationInputOutput
+    element of the document."""
+    __slots__ = ('listOfStations', 'stationInputOutput')
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.listOfStations = ListOfStations({})
+        self.stationInputOutput = []
+
+
+class ListOfStations(VCIElement):
+    __slots__ = ('station', )
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.station = []
+
+
+class StationInputOutput(VCIElement):
+    __slots__ = ('baseBand', )
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.baseBand = []
+
+
+class BaseBand(VCIElement):
+    """baseBand element.  phaseBinning contains only the first
+    phaseBinning element (if any)."""
+    __slots__ = ('phaseBinning', 'subBand')
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.phaseBinning = []
+        self.subBand = []
+
+
+class SubBand(VCIElement):
+    __slots__ = ('polProducts', 'summedArray')
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.polProducts = None
+        self.summedArray = []
+
+
+class PolProducts(VCIElement):
+    __slots__ = ('pp', 'blbProdIntegration')
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.pp = []
+        self.blbProdIntegration = None
+
+
+class SummedArray(VCIElement):
+    __slots__ = ('vdif', )
+
+    def __init__(self, attrib):
+        VCIElement.__init__(self, attrib)
+        self.vdif = None
+
+
+class _VCITarget(object):
+    """lxml parser target that builds VCIRecord from start/end events."""
+
+    def __init__(self):
+        self.root = None
+        self._path = []  # local names of currently open elements
+        self._skip = 0   # depth inside an element being discarded
+        self._sio = None
+        self._bb = None
+        self._sb = None
+        self._sa = None
+
+    def start(self, tag, attrib):
+        if self._skip:
+            self._skip += 1
+            return
+        name = tag[len(_widar_ns):] if tag.startswith(_widar_ns) else tag
+        parent = self._path[-1] if self._path else None
+        keep = True
+        if parent is None:
+            self.root = VCIRecord(dict(attrib))
+        elif name == 'station' and parent == 'listOfStations':
+            self.root.listOfStations.station.append(VCIElement(dict(attrib)))
+        elif name == 'listOfStations':
+            self.root.listOfStations.attrib = dict(attrib)
+        elif name == 'stationInputOutput':
+            if self.root.stationInputOutput:
+                keep = False
+            else:
+                self._sio = StationInputOutput(dict(attrib))
+                self.root.stationInputOutput.append(self._sio)
+        elif name == 'baseBand' and parent == 'stationInputOutput':
+            self._bb = BaseBand(dict(attrib))
+            self._sio.baseBand.append(self._bb)
+        elif name == 'phaseBinning' and parent == 'baseBand':
+            if not self._bb.phaseBinning:
+                self._bb.phaseBinning.append(VCIElement(dict(attrib)))
+        elif name == 'subBand' and parent == 'baseBand':
+            self._sb = SubBand(dict(attrib))
+            self._bb.subBand.append(self._sb)
+        elif name == 'polProducts' and parent == 'subBand':
+            self._sb.polProducts = PolProducts(dict(attrib))
+        elif name == 'pp' and parent == 'polProducts':
+            self._sb.polProducts.pp.append(VCIElement(dict(attrib)))
+        elif name == 'blbProdIntegration' and parent == 'polProducts':
+            self._sb.polProducts.blbProdIntegration = VCIElement(dict(attrib))
+        elif name == 'summedArray' and parent == 'subBand':
+            self._sa = SummedArray(dict(attrib))
+            self._sb.summedArray.append(self._sa)
+        elif name == 'vdif' and parent == 'summedArray':
+            self._sa.vdif = VCIElement(dict(attrib))
+        else:
+            keep = False
+        if keep:
+            self._path.append(name)
+        else:
+            self._skip = 1
+
+    def end(self, tag):
+        if self._skip:
+            self._skip -= 1
+        else:
+            self._path.pop()
+
+    def data(self, data):
+        pass
+
+    def close(self):
+        return self.root
+
+
+def parse_vci(source):
+    """Parse a VCI document into a VCIRecord.  source may be a filename,
+    a file-like object, or the document as a bytes string."""
+    parser = etree.XMLParser(target=_VCITarget(), remove_comments=True)
+    if isinstance(source, (bytes, type(b''))):
+        return etree.fromstring(source, parser)
+    return etree.parse(source, parser)
@@ -12,7 +12,8 @@ setup(name='evla_mcast',
       author='Paul Demorest',
       author_email='pdemores@nrao.edu',
       url='https://github.com/demorest/evla_mcast/',
-      install_requires=['lxml', 'future'],
+      install_requires=['lxml', 'future', 'numpy'],
       packages=find_packages(exclude=('tests',)),
-      package_data={'evla_mcast': ['xsd/*.xsd','xsd/vci/*.xsd','xsd/observe/*.xsd']},
+      package_data={'evla_mcast': ['xsd/*.xsd','xsd/vci/*.xsd','xsd/observe/*.xsd',
+                                   'templates/*.xml']},
      )
@@ -0,0 +1,123 @@
+import pytest
+import math
+import warnings
+import numpy as np
+from evla_mcast import angles
+
+_rng = np.random.RandomState(42)
+_n = 2000
+_a1 = _rng.uniform(0, 2 * math.pi, _n)
+_b1 = _rng.uniform(-math.pi / 2, math.pi / 2, _n)
+_a2 = _rng.uniform(0, 2 * math.pi, _n)
+_b2 = _rng.uniform(-math.pi / 2, math.pi / 2, _n)
+
+
+def test_units_array():
+    x = _rng.uniform(-10, 10, 100)
+    for f in (angles.r2d, angles.d2r, angles.h2r, angles.r2h,
+              angles.arcs2r, angles.r2arcs):
+        assert np.array_equal(f(x), [f(float(v)) for v in x])
+    assert angles.r2d(1.0) == math.degrees(1.0)
+    assert angles.d2r(1.0) == math.radians(1.0)
+
+
+def test_normalize_array():
+    x = np.concatenate([_rng.uniform(-1000, 1000, _n),
+                        np.arange(-720.0, 721.0, 45.0)])
+    for (lower, upper) in ((0, 360), (-180, 180), (0, 24), (-90, 90)):
+        for b in (False, True):
+            expected = [angles.normalize(v, lower, upper, b) for v in x]
+            assert np.array_equal(
+                angles.normalize_array(x, lower, upper, b), expected)
+    with pytest.raises(ValueError):
+        angles.normalize_array(x, 10, 0)
+
+
+def test_sep_array():
+    expected = [angles.sep(*v) for v in zip(_a1, _b1, _a2, _b2)]
+    np.testing.assert_allclose(angles.sep_array(_a1, _b1, _a2, _b2),
+                               expected, rtol=1e-14, atol=1e-15)
+    d2r = angles.d2r
+    assert angles.r2d(angles.sep_array(0, 0, 0, d2r(90.0))) == 90.0
+    assert angles.r2d(angles.sep_array(0, d2r(-90.0), 0, d2r(90.0))) == 180.0
+    # Broadcasting: one position against many
+    assert angles.sep_array(_a1[0], _b1[0], _a2, _b2).shape == (_n, )
+
+
+def test_bear_array():
+    expected = [angles.bear(*v) for v in zip(_a1, _b1, _a2, _b2)]
+    np.testing.assert_allclose(angles.bear_array(_a1, _b1, _a2, _b2),
+                               expected, rtol=1e-13, atol=1e-15)
+    d2r = angles.d2r
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        res = angles.bear_array(0, np.array([0, -d2r(90.0)]), 0,
+                                np.array([-d2r(90.0), 0]))
+    np.testing.assert_allclose(res, [math.pi, 0.0])
+
+
+def test_deci2sexa_array():
+    x = np.concatenate([_rng.uniform(-400, 400, _n),
+                        [23 + 59 / 60.0 + 59.99999 / 3600.0, 0.0, -0.0]])
+    for kw in ({}, dict(pre=5, trunc=True), dict(pre=-1),
+               dict(lower=0, upper=24, upper_trim=True),
+               dict(lower=-90, upper=90, b=True)):
+        parts = angles.deci2sexa_array(x, **kw)
+        res = list(zip(*(p.tolist() for p in parts)))
+        assert res == [angles.deci2sexa(v, **kw) for v in x]
+
+
+def test_angle_arrays():
+    h = _rng.uniform(-30, 30, 100)
+    d = _rng.uniform(-100, 100, 100)
+    alpha = angles.AlphaAngleArray(h=h)
+    delta = angles.DeltaAngleArray(d=d)
+    assert alpha.r.flags.c_contiguous and alpha.r.dtype == np.float64
+    np.testing.assert_allclose(alpha.h, [angles.AlphaAngle(h=v).h for v in h],
+                               rtol=1e-12)
+    assert np.all((delta.d >= -90) & (delta.d <= 90))
+    assert alpha.to_strings() == [str(angles.AlphaAngle(h=v)) for v in h]
+    assert delta.to_strings() == [
+        str(angles.DeltaAngle(d=v)) for v in delta.d]
+    assert str(alpha[3]) == alpha.to_strings()[3]
+    assert len(delta[10:20]) == 10
+    with pytest.raises(TypeError):
+        angles.AngleArray(r=[1.0], d=[1.0])
+
+
+def test_position_array():
+    p = angles.PositionArray.from_r(_a1[:50], _b1[:50])
+    q = angles.PositionArray.from_r(_a2[:50], _b2[:50])
+    np.testing.assert_allclose(p.sep(q), [
+        angles.sep(*v) for v in zip(_a1, _b1, _a2, _b2)][:50], rtol=1e-14)
+    np.testing.assert_allclose(p.bear(q), [
+        angles.bear(*v) for v in zip(_a1, _b1, _a2, _b2)][:50], rtol=1e-13)
+    m = p.sep_matrix(q[:20])
+    assert m.shape == (50, 20)
+    assert m[7, 3] == p[7:8].sep(q[3])[0]
+    np.testing.assert_allclose(np.linalg.norm(p.xyz, axis=1), 1.0)
+    assert p[0].sep(q[0]) == angles.sep(_a1[0], _b1[0], _a2[0], _b2[0])
+
+
+def test_fmt_parse_array():
+    x = np.concatenate([_rng.uniform(-400, 400, 500),
+                        [-0.25, 90.0, 23 + 59 / 60.0 + 59.99999 / 3600.0]])
+    for kw in ({}, dict(s1=":", s2=":", s3="", pre=5, trunc=True),
+               dict(lower=0, upper=24, upper_trim=True),
+               dict(lower=-90, upper=90, b=True, s1="%")):
+        assert angles.fmt_angle_array(x, **kw) == [
+            angles.fmt_angle(v, **kw) for v in x]
+    strings = (angles.fmt_angle_array(x, s1=":", s2=":", s3="") +
+               angles.fmt_angle_array(x, s1="h", s2="m", s3="s") +
+               angles.fmt_angle_array(x, s1="DD ", s2="MM ", s3="SS") +
+               angles.fmt_angle_array(x) +
+               ["12d14.56ss", "14.56ss", "12", "-0d30'", "1 2 3"])
+    d = angles.phmsdms_array(strings)
+    expected = [angles.phmsdms(s) for s in strings]
+    assert d['sign'].tolist() == [e['sign'] for e in expected]
+    assert d['vals'].tolist() == [e['vals'] for e in expected]
+    assert d['units'] == [e['units'] for e in expected]
+    assert d['sign'][-2] == -1
+    a = angles.AngleArray.from_strings(strings[:len(x)])
+    np.testing.assert_allclose(a.d, [angles.Angle(sg=s).d
+                                     for s in strings[:len(x)]], rtol=1e-15)
@@ -0,0 +1,111 @@
+import pytest
+import os
+import glob
+from lxml import objectify
+from evla_mcast import mcast_clients
+from evla_mcast.archive import Archive
+from test_controller import RecordingController, read_data, obs_doc
+
+
+def ant_doc(datasetId):
+    data = read_data('test_antprop.xml').replace(
+        b'datasetId="L_realfast.57897.87981900463"',
+        b'datasetId="%s"' % datasetId.encode('ascii'))
+    return objectify.fromstring(data, parser=mcast_clients._ant_parser)
+
+
+def test_archive(tmpdir):
+    path = str(tmpdir.join('archive'))
+    archive = Archive(path, 'a', segment_bytes=20000)
+    ctrl = RecordingController(archive=archive)
+    ctrl.add_vci(objectify.fromstring(read_data('test_vci.xml'),
+                                      parser=mcast_clients._vci_parser))
+    t0 = 57897.9
+    for ds in ('A', 'B'):
+        ctrl.add_ant(ant_doc(ds), recv_time=1e9 - 1)
+    for i in range(4):
+        for (j, ds) in enumerate(('A', 'B')):
+            ctrl.add_obs(obs_doc(i + 1, t0 + 0.01 * i + 0.001 * j,
+                                 datasetId=ds), recv_time=1e9 + i)
+        if i == 1:
+            ctrl.add_obs(obs_doc(2, t0 + 0.015, subscanNo=2, datasetId='A'))
+    ctrl.add_obs(obs_doc(5, t0 + 0.04, source='FINISH', datasetId='A'))
+    archive.close()
+
+    archive = Archive(path)
+    assert len(archive) == 13
+    assert len(archive._maps) == 0
+    assert archive.datasetIds == ['A', 'B']
+    assert len(archive.obs_rows(t0 + 0.01, t0 + 0.02)) == 3
+    assert len(archive.obs_rows(datasetId='B')) == 4
+
+    # Dataset A rebuilt as the controller saw it
+    scans = list(archive.scans(datasetId='A'))
+    handled = [s for s in ctrl.handled if s.datasetId == 'A']
+    assert [s.scanNo for s in scans] == [s.scanNo for s in handled] == \
+        [1, 2, 3, 4]
+    assert scans[1].nsubscan == 2
+    assert [s.stopTime for s in scans] == [s.stopTime for s in handled]
+    assert scans[0].recvTime == 1e9
+    assert len(scans[0].get_antennas()) == 25
+    assert len(archive._maps) >= 1
+
+    # Antenna tables are replayed with their receive times
+    times = []
+
+    class AntRecorder(RecordingController):
+        def add_ant(self, ant, recv_time=None):
+            times.append(recv_time)
+    archive.replay(AntRecorder(), range(len(archive)))
+    assert times == [1e9 - 1, 1e9 - 1]
+
+    # Time range: B did not finish, so its last scan has no stop time
+    scans = list(archive.scans(t0 + 0.025, t0 + 0.05))
+    assert [(s.datasetId, s.scanNo) for s in scans] == \
+        [('A', 3), ('A', 4), ('B', 3), ('B', 4)]
+    assert scans[-1].stopTime is None
+
+    # Appending starts a new segment
+    archive = Archive(path, 'a')
+    nseg = archive._nsegment
+    archive.add_obs(obs_doc(5, t0 + 0.05, source='FINISH', datasetId='B'))
+    archive.close()
+    assert Archive(path)._nsegment == nseg + 1
+    scans = list(Archive(path).scans(datasetId='B'))
+    assert scans[-1].stopTime == pytest.approx(t0 + 0.05)
+
+    # A missing segment index is rebuilt from the segment
+    for fname in glob.glob(path + '/*.idx.npz'):
+        os.unlink(fname)
+    archive = Archive(path)
+    assert len(archive) == 14
+    assert [s.scanNo for s in archive.scans(datasetId='B')] == [1, 2, 3, 4]
+
+
+def test_archive_vci(tmpdir):
+    path = str(tmpdir.join('archive'))
+    vci = read_data('test_vci.xml')
+    changed = vci.replace(b'sbid="0"', b'sbid="7"', 1)
+
+    def nvci(archive):
+        return int((archive.index['kind'] == 3).sum())
+
+    archive = Archive(path, 'a')
+    for i in range(5):
+        archive.add_vci(vci)
+    assert nvci(archive) == 1
+    archive.close()
+    # Unchanged VCIs are also not archived again after reopening
+    archive = Archive(path, 'a')
+    archive.add_vci(vci)
+    assert nvci(archive) == 1
+    archive.add_vci(changed)
+    archive.add_vci(changed)
+    assert nvci(archive) == 2
+    # The index buffer grows as documents are added
+    for i in range(2000):
+        archive.add_obs(obs_doc(1, 57897.9 - 0.001 * i))
+    assert len(archive) == 2002
+    assert len(archive.obs_rows(57897.9 - 0.0105, 57897.9)) == 10
+    archive.close()
+    assert len(Archive(path)) == 2002
@@ -0,0 +1,85 @@
+import pytest
+import evla_mcast
+from evla_mcast.scan_config import ScanConfig, Antenna
+from evla_mcast import backends
+from lxml import etree
+import os.path
+
+from test_vci_stream import vci_with_vdif, subband_info
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+_properties = ['configId', 'datasetId', 'scanId', 'scanNo', 'subscanNo',
+               'observer', 'projid', 'scan_intent', 'source', 'ra_deg',
+               'ra_hrs', 'ra_str', 'dec_deg', 'dec_str', 'startLST',
+               'startTime', 'seq', 'baseBandNames', 'binningPeriod',
+               'numBins', 'listOfStations', 'numAntenna', 'intents']
+
+
+def scan_info(sc):
+    info = dict((p, getattr(sc, p)) for p in _properties)
+    for IFid in ('AC', 'BD'):
+        info[IFid] = (sc.get_sslo(IFid), sc.get_sideband(IFid),
+                      sc.get_receiver(IFid))
+    info['subbands'] = [subband_info(s) for s in sc.get_subbands()]
+    info['vdif'] = [subband_info(s)
+                    for s in sc.get_subbands(match_ips=['10.80.200.201'])]
+    info['antennas'] = [(a.name, a.widarID, a.pad, a.xyz, a.offset)
+                        for a in sc.get_antennas()]
+    return info
+
+
+def make_config(backend):
+    parser = backends.get_backend(backend).parsers['vci']
+    vci = etree.fromstring(vci_with_vdif(), parser=parser)
+    return ScanConfig(vci=vci, obs=_data_dir+'test_obs.xml',
+                      ant=_data_dir+'test_antprop.xml',
+                      requires=['ant', 'vci', 'obs'], backend=backend)
+
+
+def test_backends_identical():
+    obj = make_config('objectify')
+    et = make_config('etree')
+    assert obj.backend == 'objectify'
+    assert et.backend == 'etree'
+    assert type(et.obs) is etree._Element
+    assert scan_info(obj) == scan_info(et)
+    assert len(scan_info(et)['vdif']) == 1
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ScanConfig(obs=_data_dir+'test_obs.xml', backend='sax')
+
+
+@pytest.mark.parametrize('backend', ['objectify', 'etree'])
+def test_serialization(backend):
+    import pickle
+    sc = make_config(backend)
+    sc.add_subscan(etree.fromstring(
+        open(_data_dir + 'test_obs.xml', 'rb').read().replace(
+            b'<subscanNo>1</subscanNo>', b'<subscanNo>2</subscanNo>')
+        .replace(b'startTime="57897.87983680556"', b'startTime="57897.88"'),
+        parser=backends.get_backend(backend).parsers['obs']),
+        recv_time=1e9)
+    sc.changed = frozenset(['source'])
+    for copy in (pickle.loads(pickle.dumps(sc, -1)),
+                 ScanConfig.from_json(sc.to_json())):
+        assert copy.backend == backend
+        assert scan_info(copy) == scan_info(sc)
+        assert copy.nsubscan == 2
+        assert copy.stopTime == sc.stopTime == 57897.88
+        assert copy.subscan(2).recvTime == 1e9
+        assert copy.changed == sc.changed
+    # Identical VCI and antenna documents are only parsed once
+    (a, b) = [pickle.loads(pickle.dumps(sc)) for i in range(2)]
+    assert a.vci is b.vci and a.ant is b.ant
+    assert a.obs is not b.obs
+
+    subs = sc.get_subbands(match_ips=['10.80.200.201'])
+    copy = pickle.loads(pickle.dumps(subs))
+    assert [subband_info(s) for s in copy] == [subband_info(s) for s in subs]
+    assert copy[0].vdif.attrib['aDestIP'] == '10.80.200.201'
+    ants = sc.get_antennas()
+    copy = pickle.loads(pickle.dumps(ants))
+    assert [a.__dict__ for a in copy] == [a.__dict__ for a in ants]
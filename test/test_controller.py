@@ -0,0 +1,203 @@
+import pytest
+import os
+import os.path
+from lxml import etree, objectify
+from evla_mcast import controller, mcast_clients, config_cache, checkpoint
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+def read_data(name):
+    with open(_data_dir + name, 'rb') as f:
+        return f.read()
+
+
+def obs_doc(scanNo, startTime, source='0137+331=3C48', subscanNo=1,
+            datasetId=None):
+    data = read_data('test_obs.xml')
+    if datasetId is not None:
+        data = data.replace(b'datasetId="L_realfast.57897.87981900463"',
+                            b'datasetId="%s"' % datasetId.encode('ascii'))
+    data = data.replace(b'<scanNo>1</scanNo>',
+                        b'<scanNo>%d</scanNo>' % scanNo)
+    data = data.replace(b'<subscanNo>1</subscanNo>',
+                        b'<subscanNo>%d</subscanNo>' % subscanNo)
+    data = data.replace(b'startTime="57897.87983680556"',
+                        b'startTime="%.10f"' % startTime)
+    data = data.replace(b'0137+331=3C48', source.encode('ascii'))
+    return objectify.fromstring(data, parser=mcast_clients._obs_parser)
+
+
+class RecordingController(controller.Controller):
+    def __init__(self, **kwargs):
+        controller.Controller.__init__(self, listen=False, **kwargs)
+        self.handled = []
+        self.finished = []
+
+    def handle_config(self, config):
+        self.handled.append(config)
+
+    def handle_finish(self, dataset):
+        self.finished.append(dataset)
+
+
+def make_controller(**kwargs):
+    ctrl = RecordingController(**kwargs)
+    ctrl.add_vci(objectify.fromstring(read_data('test_vci.xml'),
+                                      parser=mcast_clients._vci_parser))
+    ctrl.add_ant(objectify.fromstring(read_data('test_antprop.xml'),
+                                      parser=mcast_clients._ant_parser))
+    return ctrl
+
+
+def test_config_cache():
+    ctrl = make_controller()
+    t0 = 57897.9
+    ctrl.add_obs(obs_doc(1, t0))
+    ctrl.add_obs(obs_doc(2, t0 + 0.01))
+    ctrl.add_obs(obs_doc(3, t0 + 0.02, source='J0000+0000'))
+    ctrl.add_obs(obs_doc(4, t0 + 0.03))
+    (s1, s2, s3) = ctrl.handled
+    assert s1.changed == frozenset(config_cache.PARTS)
+    assert s2.changed == frozenset()
+    assert s3.changed == frozenset(['source'])
+    assert s1.derived is s2.derived is s3.derived
+    assert ctrl.config_cache.misses == 1
+    subs = s1.get_subbands()
+    assert [id(s) for s in s3.get_subbands()] == [id(s) for s in subs]
+    assert s2.get_antennas() == s1.get_antennas()
+    assert len(s1.get_antennas()) == 25
+
+    # A new antenna table (even with identical content) gives the same
+    # configuration, a different VCI a new one.  Scans are handled once
+    # the next one starts.
+    ctrl.add_ant(objectify.fromstring(read_data('test_antprop.xml'),
+                                      parser=mcast_clients._ant_parser))
+    ctrl.add_obs(obs_doc(5, t0 + 0.04))
+    ctrl.add_vci(objectify.fromstring(
+        read_data('test_vci.xml').replace(b'sbid="0"', b'sbid="7"', 1),
+        parser=mcast_clients._vci_parser))
+    ctrl.add_obs(obs_doc(6, t0 + 0.05))
+    ctrl.add_obs(obs_doc(7, t0 + 0.06))
+    (s4, s5, s6) = ctrl.handled[-3:]
+    assert s4.changed == frozenset(['source'])
+    assert s5.changed == frozenset()
+    assert s5.derived is s1.derived
+    assert s6.changed == frozenset(['vci'])
+    assert s6.derived is not s1.derived
+
+
+def test_checkpoint(tmpdir):
+    path = str(tmpdir.join('ctrl.ckpt'))
+    ctrl = make_controller(checkpoint=path)
+    t0 = 57897.9
+    for i in range(3):
+        ctrl.add_obs(obs_doc(i + 1, t0 + 0.01 * i), recv_time=1e9 + i)
+    assert [s.scanNo for s in ctrl.handled] == [1, 2]
+
+    # Restart: the datasets are rebuilt without handling scans again
+    new = RecordingController(checkpoint=path)
+    assert new.restore() == 5
+    assert new.handled == []
+    assert list(new.vci.keys()) == list(ctrl.vci.keys())
+    (ds, ) = new._datasets.values()
+    assert [s.scanNo for s in ds.handled] == [1, 2]
+    assert [s.scanNo for s in ds.queued] == [3]
+    assert ds.queued[0].recvTime == 1e9 + 2
+    assert ds.ant is not None
+    # and processing continues from there
+    new.add_obs(obs_doc(4, t0 + 0.03))
+    assert [s.scanNo for s in new.handled] == [3]
+
+    # A torn record at the end is ignored and truncated away
+    new.checkpoint.close()
+    with open(path, 'ab') as f:
+        f.write(b'EVCK\x01garbage')
+    assert len(checkpoint.Checkpoint(path).records()) == 6
+    new.add_obs(obs_doc(5, t0 + 0.04, source='FINISH'))
+    assert len(new.finished) == 1
+    # Compacted after the dataset finished
+    assert checkpoint.Checkpoint(path).records() == []
+    assert os.path.getsize(path) == 0
+
+
+def test_checkpoint_vci(tmpdir):
+    path = str(tmpdir.join('ctrl.ckpt'))
+    ctrl = make_controller(checkpoint=path)
+    vci = read_data('test_vci.xml')
+    t0 = 57897.9
+    # The clients pass the VCI again with every obs document
+    for i in range(4):
+        for ds in ('A', 'B'):
+            ctrl.add_vci(objectify.fromstring(
+                vci, parser=mcast_clients._vci_parser))
+            ctrl.add_obs(obs_doc(i + 1, t0 + 0.01 * i, datasetId=ds))
+
+    def vcis():
+        return [r for r in ctrl.checkpoint.records()
+                if r[0] == checkpoint.VCI]
+    assert len(vcis()) == 1
+    changed = objectify.fromstring(vci.replace(b'sbid="0"', b'sbid="7"', 1),
+                                   parser=mcast_clients._vci_parser)
+    ctrl.add_vci(changed)
+    assert len(vcis()) == 2
+
+    # After compaction both are kept: the first one for the obs records
+    # of B that were received with it, and the latest one
+    ctrl.add_obs(obs_doc(5, t0 + 0.04, source='FINISH', datasetId='A'))
+    records = ctrl.checkpoint.records()
+    assert [r[0] for r in records if r[0] != checkpoint.ANT] == \
+        [checkpoint.VCI] + [checkpoint.OBS] * 4 + [checkpoint.VCI]
+    assert [r[3] for r in vcis()] == [etree.tostring(objectify.fromstring(
+        vci, parser=mcast_clients._vci_parser)), etree.tostring(changed)]
+    new = RecordingController(checkpoint=path)
+    new.restore()
+    assert 'A' not in new._datasets
+    ds = new.dataset('B')
+    assert [s.scanNo for s in ds.handled + ds.queued] == [1, 2, 3, 4]
+
+
+def test_checkpoint_vci_change(tmpdir):
+    path = str(tmpdir.join('ctrl.ckpt'))
+    ctrl = make_controller(checkpoint=path)
+    vci = read_data('test_vci.xml')
+    changed = vci.replace(b'sbid="0"', b'sbid="7"', 1)
+    unused = vci.replace(b'sbid="0"', b'sbid="9"', 1)
+    t0 = 57897.9
+    # B's VCI changes after scan 2; an intermediate version is used by
+    # finished dataset A only
+    for (i, ds, doc) in [(1, 'A', vci), (1, 'B', vci), (2, 'B', vci),
+                         (2, 'A', unused), (3, 'A', unused), (3, 'B', changed),
+                         (4, 'B', changed), (5, 'B', changed)]:
+        ctrl.add_vci(objectify.fromstring(doc,
+                                          parser=mcast_clients._vci_parser))
+        ctrl.add_obs(obs_doc(i, t0 + 0.01 * i, datasetId=ds))
+    ctrl.add_obs(obs_doc(4, t0 + 0.04, source='FINISH', datasetId='A'))
+    assert len(ctrl.finished) == 1
+    vcis = [r[3] for r in ctrl.checkpoint.records()
+            if r[0] == checkpoint.VCI]
+    assert len(vcis) == 2
+    assert not any(b'sbid="9"' in v for v in vcis)
+
+    def scan_vcis(ds):
+        return [etree.tostring(sc.vci) for sc in ds.handled + ds.queued]
+    new = RecordingController(checkpoint=path)
+    new.restore()
+    assert 'A' not in new._datasets
+    restored = scan_vcis(new.dataset('B'))
+    assert restored == scan_vcis(ctrl.dataset('B'))
+    assert restored[1] != restored[2]
+
+
+def test_handle_latency():
+    import time
+    ctrl = make_controller()
+    t0 = 57897.9
+    now = time.time()
+    # Scan 1 is handled when scan 2's obs arrives, 100 s later
+    ctrl.add_obs(obs_doc(1, t0), recv_time=now - 100.0)
+    ctrl.add_obs(obs_doc(2, t0 + 0.01), recv_time=now)
+    assert len(ctrl.handled) == 1
+    assert ctrl.handle_latency.n == 1
+    assert ctrl.handle_latency.mean < 10.0
+    assert ctrl.scan_latency.n == 1
+    assert ctrl.scan_latency.mean >= 100.0
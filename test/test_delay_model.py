@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from evla_mcast.ringbuffer import RingBuffer
+from evla_mcast import delay_model
+
+
+def make_doc(epoch, cffs, sb_cffs=(), t0=None):
+    def model(tag, cff, attr):
+        return ('<%s %s>' % (tag, attr) +
+                ''.join('<modelCff index="%d" cff="%r"/>' % (i, c)
+                        for (i, c) in enumerate(cff)) + '</%s>' % tag)
+    sbs = ''.join(model('sbDelayModel', c, 'sbId="%d"' % i)
+                  for (i, c) in sb_cffs)
+    bb = model('bbDelayModel', cffs, 'bbId="0"').replace(
+        '</bbDelayModel>', sbs + '</bbDelayModel>')
+    t0 = '' if t0 is None else ' t0="%r"' % t0
+    return ('<vciStbDelayModel epoch="%s"%s sequenceNum="3">%s'
+            '</vciStbDelayModel>' % (epoch, t0, bb)).encode()
+
+
+def test_ringbuffer():
+    rb = RingBuffer(4, shape=(2, ), max_age=10.0)
+    for t in range(6):
+        rb.append(float(t), [t, -t])
+    assert rb.times().tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert rb.values()[:, 1].tolist() == [-2, -3, -4, -5]
+    (times, values) = rb.time_range(3.0, 5.0)
+    assert times.tolist() == [3.0, 4.0]
+    assert rb.lookup([1.0, 3.5, 9.0]).tolist() == [-1, 1, 3]
+    assert not rb.append(1.0, [0, 0])
+    rb.append(14.5, [0, 0])
+    assert rb.times().tolist() == [5.0, 14.5]
+
+
+def test_iso_to_mjd():
+    assert delay_model.iso_to_mjd('1858-11-17T00:00:00Z') == 0.0
+    assert delay_model.iso_to_mjd('2017-05-29T12:00:00.0') == 57902.5
+    assert delay_model.iso_to_mjd('2017-05-29T12:00:00-06:00') == 57902.75
+
+
+def test_delay_model():
+    doc = make_doc('2017-05-29T00:00:00Z', [1e-6, 2e-9, 3e-13],
+                   sb_cffs=[(4, [5e-7])])
+    model = delay_model.parse_delay_model(doc, antenna='ea01')
+    assert model.antenna == 'ea01' and model.t0 == 57902.0
+    assert model.bbId.tolist() == [0, 0] and model.sbId.tolist() == [-1, 4]
+    assert model.cff.shape == (2, 3)
+    assert model.sequenceNum == 3
+
+    store = delay_model.DelayModelStore(capacity=8, max_age=3600.0)
+    store.add(model)
+    for (ant, scale) in (('ea01', 1.0), ('ea02', 2.0)):
+        store.add(delay_model.parse_delay_model(
+            make_doc('2017-05-29T00:00:10Z', [scale * 2e-6, 1e-9]),
+            antenna=ant))
+    mjd = 57902.0 + np.array([-1.0, 5.0, 12.0, 20.0]) / 86400.0
+    delays = store.evaluate(mjd)
+    assert store.antennas == ['ea01', 'ea02']
+    assert np.isnan(delays[0, 0]) and np.isnan(delays[1, 1])
+    np.testing.assert_allclose(delays[0, 1], 1e-6 + 2e-9 * 5 + 3e-13 * 25)
+    np.testing.assert_allclose(delays[:, 2:], [[2e-6 + 2e-9, 2e-6 + 1e-8],
+                                               [4e-6 + 2e-9, 4e-6 + 1e-8]])
+    np.testing.assert_allclose(store.evaluate(mjd[1], sbId=4), [[5e-7],
+                                                                [np.nan]])
+    dt = (mjd[1:3] - 57902.0) * 86400.0
+    np.testing.assert_allclose(model.evaluate(mjd[1:3]),
+                               [1e-6 + 2e-9 * dt + 3e-13 * dt ** 2,
+                                [5e-7, 5e-7]])
+    with pytest.raises(ValueError):
+        delay_model.DelayModelStore(ncff=2).add(model)
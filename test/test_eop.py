@@ -0,0 +1,39 @@
+import os.path
+import numpy as np
+import evla_mcast
+from evla_mcast.eop import EopTable
+from evla_mcast.controller import Dataset
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+
+def test_eop_table():
+    for backend in ('objectify', 'etree'):
+        sc = evla_mcast.scan_config.ScanConfig(
+            obs=_data_dir + 'test_obs.xml', ant=_data_dir + 'test_antprop.xml',
+            backend=backend)
+        eop = EopTable.from_ant(sc.ant)
+        assert len(eop) == 5
+        np.testing.assert_allclose(eop.ut1_utc_at(57896.0), 0.392562)
+        np.testing.assert_allclose(eop.ut1_utc_at([57896.5, 57910.0]),
+                                   [(0.392562 + 0.390847) / 2, 0.38784])
+        np.testing.assert_allclose(eop.polar_motion(57898.25)[1],
+                                   0.45643 + 0.25 * (0.45698 - 0.45643))
+        # Mean sidereal time vs the (apparent) startLST of the scan
+        lst = sc.lst(sc.startTime, eop)
+        assert abs(lst - sc.lst(sc.startTime)) * 86400 / (2 * np.pi) < 2.0
+
+    ds = Dataset('test')
+    assert ds.eop is None
+    ds.ant = sc.ant
+    assert ds.eop is ds.eop and len(ds.eop) == 5
+
+
+def test_eop_leap_second():
+    # Leap second at the start of 57754 (2017 Jan 1)
+    eop = EopTable([57753.0, 57754.0], [36.0, 37.0], [-0.59, 0.41],
+                   [0, 0], [0, 0])
+    assert eop.tai_utc_at(57753.99) == 36.0
+    assert eop.tai_utc_at(57754.0) == 37.0
+    np.testing.assert_allclose(eop.ut1_utc_at([57753.5, 57754.0]),
+                               [-0.59, 0.41])
@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+from evla_mcast import export
+from test_controller import make_controller, obs_doc
+
+
+def test_export(tmpdir):
+    ctrl = make_controller()
+    t0 = 57897.9
+    ctrl.add_obs(obs_doc(1, t0))
+    ctrl.add_obs(obs_doc(1, t0 + 0.005, subscanNo=2))
+    ctrl.add_obs(obs_doc(2, t0 + 0.01, source='J0000+0000'))
+    ctrl.add_obs(obs_doc(3, t0 + 0.02))
+    path = str(tmpdir.join('export'))
+    assert export.export_scans(ctrl.handled, path) == 2
+
+    tables = export.load(path)
+    assert len(tables.scans) == 3
+    assert list(tables.scans['scan']) == [0, 0, 2]
+    assert list(tables.scans['subscanNo']) == [1, 2, 1]
+    assert tables.scans['stopTime'][0] == pytest.approx(t0 + 0.005)
+    assert list(tables.decode(tables.scans['source'])) == \
+        ['0137+331=3C48', '0137+331=3C48', 'J0000+0000']
+    sel = tables.scans['source'] == tables.code('J0000+0000')
+    assert list(tables.scans['scanNo'][sel]) == [2]
+    assert tables.code('not there') == -1
+
+    subs = ctrl.handled[0].get_subbands()
+    assert len(tables.subbands) == 2 * len(subs)
+    np.testing.assert_allclose(tables.subbands['sky_center_freq'][:len(subs)],
+                               [s.sky_center_freq for s in subs])
+    assert list(tables.scans['nsubband']) == [len(subs)] * 3
+    assert len(tables.antennas) == 2 * 25
+    assert isinstance(tables.antennas, np.memmap)
+
+    # Appending keeps the string codes and scan numbering
+    with export.ScanExporter(path, append=True) as exporter:
+        assert exporter.nrows == 3
+        assert exporter.add(ctrl.handled[1]) == 3
+        assert exporter.nrows == 4
+    tables = export.load(path)
+    assert list(tables.scans['scan']) == [0, 0, 2, 3]
+    assert tables.decode(tables.scans['source'][-1]) == 'J0000+0000'
@@ -0,0 +1,46 @@
+import math
+import os.path
+import numpy as np
+import evla_mcast
+from evla_mcast import geometry
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+
+def test_baseline_pairs():
+    (ant1, ant2) = geometry.baseline_pairs(4)
+    assert list(zip(ant1, ant2)) == [(0, 1), (0, 2), (1, 2), (0, 3), (1, 3),
+                                     (2, 3)]
+
+
+def test_uvw():
+    sc = evla_mcast.scan_config.ScanConfig(
+        vci=_data_dir + 'test_vci.xml', obs=_data_dir + 'test_obs.xml',
+        ant=_data_dir + 'test_antprop.xml')
+    geom = sc.get_geometry()
+    ants = sc.get_antennas()
+    assert geom.names == [a.name for a in ants]
+    assert geom.nbl == len(ants) * (len(ants) - 1) // 2
+    np.testing.assert_array_equal(
+        geom.bl[5], np.array(ants[3].xyz) - np.array(ants[2].xyz))
+
+    mjd = sc.startTime + np.arange(10) * 10.0 / 86400.0
+    uvw = sc.uvw(mjd)
+    assert uvw.shape == (10, geom.nbl, 3)
+    # Rotation preserves baseline length, w is the projection on the
+    # source direction.
+    np.testing.assert_allclose(
+        np.linalg.norm(uvw, axis=-1),
+        np.broadcast_to(np.linalg.norm(geom.bl, axis=-1), (10, geom.nbl)))
+    ha = geom.hour_angle(sc.lst(mjd[3]))
+    s = np.array([math.cos(geom.dec) * math.cos(-ha),
+                  math.cos(geom.dec) * math.sin(-ha), math.sin(geom.dec)])
+    np.testing.assert_allclose(uvw[3, :, 2], geom.bl.dot(s), atol=1e-9)
+    np.testing.assert_allclose(sc.uvw(), uvw[0])
+    np.testing.assert_allclose(sc.lst(sc.startTime),
+                               2 * math.pi * sc.startLST / 86400.0)
+
+    # Subscans of the same source share the geometry
+    sc2 = evla_mcast.scan_config.ScanConfig(
+        vci=sc.vci, obs=sc.obs, ant=sc.ant)
+    assert sc2.get_geometry() is geom
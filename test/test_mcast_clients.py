@@ -0,0 +1,110 @@
+import pytest
+import asyncore
+import socket
+import time
+import evla_mcast
+from evla_mcast import mcast_clients, latency
+import os.path
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+_group = '239.192.3.250'
+
+
+class AntCollector(object):
+    def __init__(self):
+        self.ants = []
+
+    def add_ant(self, ant, recv_time=None):
+        self.ants.append(ant)
+
+
+def send_loopback(data, group, port):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                 socket.inet_aton('127.0.0.1'))
+    s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    s.sendto(data, (group, port))
+    s.close()
+
+
+def receive(clients, count=10):
+    asyncore.loop(timeout=0.1, count=count)
+    for c in clients:
+        c.close()
+
+
+def test_ant_client_loopback():
+    with open(_data_dir + 'test_antprop.xml', 'rb') as f:
+        data = f.read()
+    ctrl = [AntCollector(), AntCollector()]
+    clients = [mcast_clients.AntClient(c, group=_group, port=53200,
+                                       interface='127.0.0.1',
+                                       reuse_port=True)
+               for c in ctrl]
+    send_loopback(data, _group, 53200)
+    receive(clients)
+    for c in ctrl:
+        assert len(c.ants) == 1
+        assert c.ants[0].attrib['datasetId'] == 'L_realfast.57897.87981900463'
+
+
+def test_ant_client_shard():
+    with open(_data_dir + 'test_antprop.xml', 'rb') as f:
+        data = f.read()
+    ctrl = [AntCollector(), AntCollector()]
+    clients = [mcast_clients.AntClient(c, group=_group, port=53201,
+                                       interface='lo', reuse_port=True,
+                                       shard=(i, 2))
+               for (i, c) in enumerate(ctrl)]
+    send_loopback(data, _group, 53201)
+    receive(clients)
+    assert sorted(len(c.ants) for c in ctrl) == [0, 1]
+
+
+class ObsCollector(object):
+    def __init__(self):
+        self.obs = []
+
+    def add_obs(self, obs, recv_time=None):
+        self.obs.append((obs, recv_time))
+
+
+def test_obs_client_timestamps():
+    with open(_data_dir + 'test_obs.xml', 'rb') as f:
+        data = f.read()
+    ctrl = ObsCollector()
+    client = mcast_clients.ObsClient(ctrl, use_configUrl=False,
+                                     group=_group, port=53202,
+                                     interface='127.0.0.1', timestamps=True)
+    t0 = time.time()
+    send_loopback(data, _group, 53202)
+    receive([client, ])
+    assert len(ctrl.obs) == 1
+    (obs, recv_time) = ctrl.obs[0]
+    assert obs.attrib['seq'] == '423'
+    assert t0 - 1.0 < recv_time < time.time()
+
+
+def test_histogram():
+    h = latency.Histogram(latency.log_edges(1e-3, 1e3), 'test')
+    for v in (1e-4, 0.5, 0.5, 2.0, 1e5):
+        h.add(v)
+    assert h.n == 5
+    assert h.underflow == 1
+    assert h.overflow == 1
+    assert sum(h.counts) == 3
+    assert 0.5 <= h.percentile(50) <= 1.0
+
+
+def test_rcvbuf():
+    default = mcast_clients.AntClient(group=_group, port=53205,
+                                      interface='127.0.0.1')
+    small = mcast_clients.AntClient(group=_group, port=53206,
+                                    interface='127.0.0.1', rcvbuf=4096)
+    try:
+        assert small.rcvbuf >= 4096
+        assert small.rcvbuf < default.rcvbuf
+    finally:
+        default.close()
+        small.close()
@@ -0,0 +1,48 @@
+import numpy as np
+from evla_mcast import monitor_tables
+from test_mcast_clients import send_loopback, receive, _group
+
+
+def swpow_doc(t, station=1, pol='R'):
+    return ('<switchedPowerTable><swBaseband stationId="%d" swbbName="AC_8BIT"'
+            ' startTime="2017-05-29T00:00:%02d.0" duration="1.0" '
+            'polarization="%s"><swPower swIndex="0" pSum="%d.5" pDiff="0.25"'
+            ' gain="3"/><swPower swIndex="2" pSum="1.0" pDiff="0.5" gain="3"/>'
+            '</swBaseband></switchedPowerTable>' % (station, t, pol, t)
+            ).encode()
+
+
+def test_switched_power():
+    store = monitor_tables.SwitchedPowerStore(capacity=4, max_age=20.0)
+    for t in range(0, 50, 5):
+        assert store.add_table(swpow_doc(t)) == 1
+    store.add_table(swpow_doc(0, station=2))
+    key = (1, 'AC_8BIT', 'R')
+    assert store.keys() == [key, (2, 'AC_8BIT', 'R')]
+    (times, values) = store.query(key)
+    np.testing.assert_allclose((times - 57902.0) * 86400, [30, 35, 40, 45])
+    assert values.shape == (4, 18, 3)
+    assert values[:, 0, 0].tolist() == [30.5, 35.5, 40.5, 45.5]
+    assert np.isnan(values[0, 1]).all()
+    (times, values) = store.query(key, 57902.0 + 32 / 86400.0,
+                                  57902.0 + 42 / 86400.0)
+    assert values[:, 0, 0].tolist() == [35.5, 40.5]
+    assert store.latest(key)[1][0, 0] == 45.5
+    assert len(store.query((3, 'AC_8BIT', 'R'))[0]) == 0
+
+
+def test_bbslope_client():
+    doc = (b'<bbSlopeTable><bbSlope time="2017-05-29T00:00:00Z" stationId="1" '
+           b'basebandId="0" swbbName="AC_8BIT" slope="-0.5" lag0="1e6"/>'
+           b'<bbSlope stationId="2" basebandId="1" swbbName="BD_8BIT" '
+           b'slope="0.5" lag0="2e6"/></bbSlopeTable>')
+    client = monitor_tables.BbSlopeClient(_group, 53203,
+                                          interface='127.0.0.1')
+    send_loopback(doc, _group, 53203)
+    receive([client])
+    store = client.store
+    assert store.keys() == [(1, 0, 'AC_8BIT'), (2, 1, 'BD_8BIT')]
+    (t, v) = store.latest((1, 0, 'AC_8BIT'))
+    assert t == 57902.0 and v.tolist() == [-0.5, 1e6]
+    (t, v) = store.latest((2, 1, 'BD_8BIT'))
+    assert abs(t - client.recv_time / 86400.0 - 40587.0) < 1e-9
@@ -0,0 +1,43 @@
+import os
+from lxml import objectify
+from evla_mcast import mcast_clients
+from evla_mcast.archive import Archive
+from evla_mcast.offline import rebuild_scans
+from evla_mcast.simulate import SBGenerator
+
+_parsers = dict(obs=mcast_clients._obs_parser,
+                vci=mcast_clients._vci_parser,
+                ant=mcast_clients._ant_parser)
+
+
+def test_rebuild_scans(tmpdir):
+    gen = SBGenerator(nant=4, nsubband=2)
+    events = gen.sbs(nsubarray=3, nscan=4, nsubscan=2)
+    # The first SB is saved as files, the others in an archive, with
+    # the last FINISH missing
+    docdir = tmpdir.mkdir('docs')
+    archive = Archive(str(tmpdir.join('archive')), 'a')
+    for (i, (t, kind, configId, doc)) in enumerate(events[:-1]):
+        if b'SIM.57897.90000000.1' in doc:
+            docdir.join('%03d.xml' % i).write_binary(doc)
+        else:
+            getattr(archive, 'add_' + kind)(
+                objectify.fromstring(doc, parser=_parsers[kind]))
+    archive.close()
+    docdir.join('other.txt').write('not a document')
+    sources = [str(docdir), str(tmpdir.join('archive'))]
+
+    scans = list(rebuild_scans(sources, processes=2))
+    serial = list(rebuild_scans(sources, processes=1))
+    assert len(scans) == 12
+    assert [s.scanId for s in scans] == [s.scanId for s in serial]
+    start = [s.startTime for s in scans]
+    assert start == sorted(start)
+    assert all(len(s.subscans) == 2 for s in scans)
+    assert all(s.has_ant and s.has_vci for s in scans)
+    assert [s.subscans[-1].stopTime is None for s in scans].count(True) == 1
+    for s in scans[:-1]:
+        assert s.subscans[0].stopTime == s.subscans[1].startTime
+
+    scans = list(rebuild_scans(sources, datasetIds=[scans[0].datasetId]))
+    assert len(scans) == 4
@@ -0,0 +1,73 @@
+import numpy as np
+from evla_mcast.scan_index import ScanIndex
+from test_controller import make_controller, obs_doc
+
+
+class FakeScan(object):
+    def __init__(self, startTime, stopTime=None):
+        self.startTime = startTime
+        self.stopTime = stopTime
+
+    @property
+    def subscans(self):
+        return [self]
+
+
+def brute_overlapping(scans, t0, t1):
+    return sorted((s for s in scans if s.startTime < t1 and
+                   (s.stopTime is None or s.stopTime > t0)),
+                  key=lambda s: s.startTime)
+
+
+def test_scan_index():
+    rng = np.random.RandomState(1)
+    index = ScanIndex()
+    scans = []
+    for start in rng.uniform(0, 100, 300):
+        scan = FakeScan(start)
+        if rng.uniform() < 0.9:
+            scan.stopTime = start + rng.exponential(2.0)
+        scans.append(scan)
+        index.add(scan)
+    assert len(index) == 300
+    for i in range(0, 300, 3):
+        index.remove(scans[i])
+    scans = [s for (i, s) in enumerate(scans) if i % 3]
+    for scan in scans[::4]:
+        scan.stopTime = scan.startTime + 0.5 \
+            if scan.stopTime is None else None
+        index.update(scan)
+    assert index.max_duration == max(s.stopTime - s.startTime
+                                     for s in scans if s.stopTime)
+    for (t0, t1) in rng.uniform(-5, 105, (200, 2)):
+        (t0, t1) = (min(t0, t1), max(t0, t1))
+        assert index.overlapping(t0, t1) == brute_overlapping(scans, t0, t1)
+        active = [s for s in brute_overlapping(scans, t0, t0)
+                  if s.startTime <= t0]
+        assert index.active(t0) == active
+        later = [s for s in scans if s.startTime > t0]
+        assert index.next_start(t0) is \
+            (min(later, key=lambda s: s.startTime) if later else None)
+
+
+def test_controller_scan_index():
+    ctrl = make_controller()
+    t0 = 57897.9
+    for ds in ('A', 'B'):
+        for i in range(3):
+            ctrl.add_obs(obs_doc(i + 1, t0 + 0.01 * i + 0.001 * (ds == 'B'),
+                                 datasetId=ds))
+            if ds == 'A' and i == 1:
+                ctrl.add_obs(obs_doc(2, t0 + 0.015, subscanNo=2,
+                                     datasetId='A'))
+    index = ctrl.scan_index
+    assert len(index) == 6
+    active = index.active(t0 + 0.0155)
+    assert [(s.datasetId, s.scanNo) for s in active] == [('A', 2), ('B', 2)]
+    assert active[0].subscans[-1].stopTime == t0 + 0.02
+    assert index.next_start(t0 + 0.0155).scanNo == 3
+    assert [s.scanNo for s in index.active(t0 + 1.0)] == [3, 3]
+
+    ctrl.add_obs(obs_doc(4, t0 + 0.03, source='FINISH', datasetId='A'))
+    assert len(index) == 3
+    assert [s.datasetId for s in index.overlapping(t0, t0 + 1.0)] == ['B'] * 3
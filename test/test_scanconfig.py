@@ -7,3 +7,28 @@ _data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
 def test_scan_config():
     sc = evla_mcast.scan_config.ScanConfig(vci=_data_dir+'test_vci.xml', obs=_data_dir+'test_obs.xml', ant=_data_dir+'test_antprop.xml', requires=['ant', 'vci', 'obs'])
     assert sc.datasetId == 'L_realfast.57897.87981900463'
+
+def test_intents():
+    d = evla_mcast.scan_config.ScanConfig.parse_intents(
+        ['ScanIntent="OBSERVE_TARGET"', 'PsrNumChan=64',
+         'AntennaRaRate="0.5"', 'OTF=1', "Escaped='a\\tb'"])
+    assert d['ScanIntent'] == 'OBSERVE_TARGET'
+    assert d['Escaped'] == 'a\tb'
+    typed = evla_mcast.scan_config.convert_intents(d)
+    assert typed.scan_intent == 'OBSERVE_TARGET'
+    assert typed.nchan == 64
+    assert typed.otf_rate_ra == 0.5
+    assert typed.otf is True
+    assert typed.npol == 4
+    sc = evla_mcast.scan_config.ScanConfig(obs=_data_dir+'test_obs.xml')
+    assert sc.scan_intent == 'SYSTEM_CONFIGURATION'
+    assert sc.intents['VLITE_OFF'] == '0'
+
+def test_radec_str():
+    sc = evla_mcast.scan_config.ScanConfig(obs=_data_dir+'test_obs.xml')
+    ra_str = sc.ra_str
+    assert ra_str == evla_mcast.angles.fmt_angle(sc.ra_hrs, ":", ":")[1:]
+    assert sc.ra_str is ra_str
+    assert sc.dec_str == evla_mcast.angles.fmt_angle(sc.dec_deg, ":", ":")
+    sc.set_obs(sc.obs)
+    assert sc._radec_str == {}
@@ -0,0 +1,103 @@
+import pytest
+import multiprocessing
+import numpy as np
+from evla_mcast import shm_store
+from test_controller import make_controller, obs_doc
+
+pytestmark = pytest.mark.skipif(shm_store.shared_memory is None,
+                                reason='multiprocessing.shared_memory is '
+                                'not available')
+
+
+def worker_sum(scanId):
+    with shm_store.SharedConfig(scanId, prefix='evtest') as shared:
+        total = float(shared['sky_center_freq'].sum())
+        names = shared.names['antennas']
+    return (total, len(names))
+
+
+def test_shm_store():
+    store = shm_store.ShmConfigStore(prefix='evtest')
+    ctrl = make_controller(shm_store=store)
+    t0 = 57897.9
+    ctrl.add_obs(obs_doc(1, t0))
+    ctrl.add_obs(obs_doc(2, t0 + 0.01))
+    (sc, ) = ctrl.handled
+    assert sc.scanId in store
+    assert store.refcount(sc.scanId) == 1
+
+    shared = shm_store.SharedConfig(sc.scanId, prefix='evtest')
+    subs = sc.get_subbands()
+    freqs = shared['sky_center_freq']
+    np.testing.assert_allclose(freqs, [s.sky_center_freq for s in subs])
+    assert not freqs.flags.writeable
+    assert shared['baselines'].shape == (25 * 24 // 2, 3)
+    np.testing.assert_allclose(shared['baselines'], sc.get_geometry().bl)
+    assert shared.names['IFid'] == [s.IFid for s in subs]
+    assert shared.config().stopTime == sc.stopTime
+    assert not shared.stale
+    del freqs
+
+    # Republishing (as the controller does when stop times or subscans
+    # change) flags the attached block stale and keeps the reference
+    # count
+    generation = shared.generation
+    sc.subscans[-1].stopTime = t0 + 0.009
+    store.publish(sc)
+    assert shared.stale
+    assert store.refcount(sc.scanId) == 1
+    shared.close()
+    shared = shm_store.SharedConfig(sc.scanId, prefix='evtest')
+    assert shared.generation == generation + 1
+    assert not shared.stale
+    assert shared.config().stopTime == t0 + 0.009
+    shared.close()
+
+    ctx = multiprocessing.get_context('fork')
+    pool = ctx.Pool(1)
+    try:
+        (total, nant) = pool.apply(worker_sum, (sc.scanId, ))
+    finally:
+        pool.close()
+        pool.join()
+    assert total == pytest.approx(sum(s.sky_center_freq for s in subs))
+    assert nant == 25
+
+    # Released when the dataset finishes
+    ctrl.add_obs(obs_doc(3, t0 + 0.02, source='FINISH'))
+    assert len(store) == 0
+    with pytest.raises(OSError):
+        shm_store.SharedConfig(sc.scanId, prefix='evtest')
+
+
+def test_shm_refcount():
+    store = shm_store.ShmConfigStore(prefix='evtest')
+    ctrl = make_controller()
+    ctrl.add_obs(obs_doc(1, 57897.9))
+    ctrl.add_obs(obs_doc(2, 57897.91))
+    (sc, ) = ctrl.handled
+    store.publish(sc)
+    store.publish(sc)
+    assert store.refcount(sc.scanId) == 1
+    store.acquire(sc.scanId)
+    assert store.refcount(sc.scanId) == 2
+    store.release(sc.scanId)
+    assert sc.scanId in store
+    store.release(sc.scanId)
+    assert sc.scanId not in store
+    store.close()
+
+
+def test_shm_stream_vci():
+    from evla_mcast import vci_stream
+    from evla_mcast.scan_config import ScanConfig
+    from test_controller import _data_dir
+    store = shm_store.ShmConfigStore(prefix='evtest')
+    sc = ScanConfig(vci=vci_stream.parse_vci(_data_dir + 'test_vci.xml'),
+                    obs=_data_dir + 'test_obs.xml',
+                    ant=_data_dir + 'test_antprop.xml',
+                    requires=['ant', 'vci', 'obs'])
+    with pytest.raises(ValueError):
+        store.publish(sc)
+    assert sc.scanId not in store
+    store.close()
@@ -0,0 +1,71 @@
+import asyncore
+import time
+
+from lxml import objectify
+
+from evla_mcast import mcast_clients
+from evla_mcast.simulate import SBGenerator, Simulator
+from evla_mcast.scan_config import ScanConfig
+from evla_mcast.controller import Controller
+
+_group = '239.192.3.250'
+
+
+class ListeningController(Controller):
+    def __init__(self, **kwargs):
+        Controller.__init__(self, **kwargs)
+        self.handled = []
+        self.finished = []
+
+    def handle_config(self, config):
+        self.handled.append(config)
+
+    def handle_finish(self, dataset):
+        self.finished.append(dataset)
+
+
+def test_generator():
+    gen = SBGenerator(nant=30, nsubband=12)
+    events = gen.sbs(nsubarray=2, nscan=3, nsubscan=2)
+    kinds = [e[1] for e in events]
+    assert kinds.count('ant') == 2
+    assert kinds.count('vci') == 2
+    assert kinds.count('obs') == 2 * (3 * 2 + 1)
+    assert [e[0] for e in events] == sorted(e[0] for e in events)
+    parsers = dict(obs=mcast_clients._obs_parser,
+                   vci=mcast_clients._vci_parser,
+                   ant=mcast_clients._ant_parser)
+    docs = dict((kind, objectify.fromstring(doc, parser=parsers[kind]))
+                for (t, kind, configId, doc) in events)
+    sc = ScanConfig(vci=docs['vci'], obs=docs['obs'], ant=docs['ant'],
+                    requires=['obs', 'vci', 'ant'])
+    assert sc.numAntenna == 30
+    assert len(sc.get_antennas()) == 30
+    subs = sc.get_subbands()
+    nbb = len(set(s.IFid for s in subs))
+    assert len(subs) == 12 * nbb
+    assert sorted(s.sbid for s in subs) == sorted(list(range(12)) * nbb)
+
+
+def test_simulator_loopback():
+    gen = SBGenerator(nant=5, nsubband=2)
+    sim = Simulator(gen, obs_group=_group, obs_port=53220, ant_group=_group,
+                    ant_port=53221, rate=200.0, burst=2).start()
+    ctrl = ListeningController(obs_group=_group, obs_port=53220,
+                               ant_group=_group, ant_port=53221,
+                               interface='127.0.0.1')
+    try:
+        events = gen.sbs(nsubarray=1, nscan=3)
+        thread = sim.send_in_thread(events)
+        t0 = time.time()
+        while (thread.is_alive() or not ctrl.finished) \
+                and time.time() - t0 < 10.0:
+            asyncore.loop(timeout=0.05, count=1)
+    finally:
+        ctrl.obs_client.close()
+        ctrl.ant_client.close()
+        sim.close()
+    assert sim.sent == dict(obs=4, ant=1)
+    assert sim.server.requests >= 1
+    assert [sc.scanNo for sc in ctrl.handled] == [1, 2, 3]
+    assert ctrl.handled[0].numAntenna == 5
@@ -0,0 +1,35 @@
+import math
+import numpy as np
+from evla_mcast import angles
+from evla_mcast.spatial import SkyIndex
+
+_rng = np.random.RandomState(1)
+_n = 5000
+_ra = _rng.uniform(0, 2 * math.pi, _n)
+_dec = np.arcsin(_rng.uniform(-1, 1, _n))
+
+
+def test_cone_search():
+    index = SkyIndex(_ra, _dec, leafsize=16)
+    for (ra, dec, radius) in ((1.0, 0.3, 0.05), (0.0, math.pi / 2, 0.2),
+                              (6.28, -0.1, 0.1), (2.0, 1.0, 0.0)):
+        sep = angles.sep_array(ra, dec, _ra, _dec)
+        (idx, s) = index.cone_search(ra, dec, radius)
+        assert idx.tolist() == np.nonzero(sep <= radius)[0].tolist()
+        np.testing.assert_allclose(s, sep[idx], atol=1e-12)
+        (idx, s) = index.cone_search(ra, dec, radius, sort=True)
+        assert np.all(np.diff(s) >= 0)
+
+
+def test_nearest(tmpdir):
+    index = SkyIndex(_ra, _dec)
+    fname = str(tmpdir.join('index.npz'))
+    index.save(fname)
+    loaded = SkyIndex.load(fname)
+    for (ra, dec) in ((1.0, 0.3), (4.0, -1.5)):
+        sep = angles.sep_array(ra, dec, _ra, _dec)
+        for idx in (index, loaded):
+            (i, s) = idx.nearest(ra, dec, k=5)
+            assert i.tolist() == np.argsort(sep)[:5].tolist()
+            np.testing.assert_allclose(s, np.sort(sep)[:5], atol=1e-12)
+    assert len(SkyIndex().cone_search(0, 0, 1)[0]) == 0
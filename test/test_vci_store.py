@@ -0,0 +1,79 @@
+import pytest
+import os
+import os.path
+import time
+from evla_mcast import mcast_clients
+from evla_mcast.vci_store import VCIStore
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+_group = '239.192.3.250'
+
+
+def read_data(name):
+    with open(_data_dir + name, 'rb') as f:
+        return f.read()
+
+
+def test_vci_store(tmpdir):
+    vci = read_data('test_vci.xml')
+    store = VCIStore(str(tmpdir))
+    assert store.get('cfg1') is None
+    store.put('cfg1', vci)
+    assert 'cfg1' in store
+    assert store.get('cfg1') == vci
+    assert store.nbytes < len(vci)  # compressed
+    assert store.load('cfg1').attrib['configId'] == \
+        'L_realfast.57897.87981900463.2'
+
+    # Persistent, and corrupt files are dropped
+    store = VCIStore(str(tmpdir), compress=False)
+    store.put('cfg2', vci)
+    assert store.configIds() == ['cfg1', 'cfg2']
+    fname = os.path.join(str(tmpdir), store._name('cfg2'))
+    with open(fname, 'r+b') as f:
+        f.seek(-10, 2)
+        f.write(b'0123456789')
+    assert store.get('cfg2') is None
+    assert 'cfg2' not in store
+    assert len(store) == 1
+
+    # Least recently used entries are evicted
+    size = store.nbytes  # one compressed document
+    store = VCIStore(str(tmpdir.join('small')), max_bytes=3 * size)
+    for i in range(3):
+        store.put('cfg%d' % i, vci)
+        t = time.time() - 100 + i
+        os.utime(os.path.join(store.path, store._name('cfg%d' % i)), (t, t))
+    store.get('cfg0')
+    store.put('cfg3', vci)
+    assert store.configIds() == ['cfg0', 'cfg2', 'cfg3']
+
+
+class Collector(object):
+    def __init__(self):
+        self.vci = []
+        self.obs = []
+
+    def add_vci(self, vci):
+        self.vci.append(vci)
+
+    def add_obs(self, obs, recv_time=None):
+        self.obs.append(obs)
+
+
+def test_obs_client_store(tmpdir):
+    store = VCIStore(str(tmpdir))
+    store.put('L_realfast.57897.87981900463.2', read_data('test_vci.xml'))
+    ctrl = Collector()
+    client = mcast_clients.ObsClient(ctrl, group=_group, port=53204,
+                                     interface='127.0.0.1',
+                                     vci_store=store)
+    client.close()
+    # configUrl is not reachable, the VCI must come from the store
+    client.read = read_data('test_obs.xml')
+    client.recv_time = None
+    client.parse()
+    assert len(ctrl.obs) == 1
+    assert len(ctrl.vci) == 1
+    assert ctrl.vci[0].attrib['configId'] == 'L_realfast.57897.87981900463.2'
@@ -0,0 +1,83 @@
+import pytest
+import evla_mcast
+from evla_mcast import vci_stream
+from evla_mcast.scan_config import ScanConfig
+import os.path
+
+_data_dir = os.path.abspath(os.path.dirname(__file__)) + '/data/'
+
+_vdif = (b'<ns2:summedArray sid="1"><ns2:vdif stationId="1" '
+         b'aDestIP="10.80.200.201" bDestIP="10.80.200.202"/>'
+         b'</ns2:summedArray></ns2:subBand>')
+
+
+def vci_with_vdif():
+    # Test VCI with binning and VDIF output enabled for the first subband
+    with open(_data_dir + 'test_vci.xml', 'rb') as f:
+        vci = f.read()
+    vci = vci.replace(b'</ns2:subBand>', _vdif, 1)
+    vci = vci.replace(b'swbbName="AC_8BIT"',
+                      b'swbbName="AC_8BIT" binningPeriod="1000.0"')
+    return vci
+
+
+def subband_info(sub):
+    return (sub.IFid, sub.swIndex, sub.sbid, sub.bw, sub.sky_center_freq,
+            sub.receiver, sub.pp, sub.spectralChannels, sub.hw_time_res,
+            sub.final_time_res, sub.vdif is not None)
+
+
+def test_parse_vci():
+    vci = vci_stream.parse_vci(_data_dir + 'test_vci.xml')
+    assert vci.attrib['configId'] == 'L_realfast.57897.87981900463.2'
+    assert len(vci.listOfStations.station) == 25
+    assert len(vci.stationInputOutput) == 1
+    assert len(vci.stationInputOutput[0].baseBand) == 2
+
+
+def test_scan_config_matches_objectify():
+    from lxml import objectify
+    from evla_mcast.mcast_clients import _vci_parser
+    data = vci_with_vdif()
+    configs = [ScanConfig(vci=vci, obs=_data_dir+'test_obs.xml',
+                          ant=_data_dir+'test_antprop.xml',
+                          requires=['ant', 'vci', 'obs'])
+               for vci in (objectify.fromstring(data, parser=_vci_parser),
+                           vci_stream.parse_vci(data))]
+    (obj, rec) = configs
+    assert obj.listOfStations == rec.listOfStations
+    assert obj.baseBandNames == rec.baseBandNames
+    assert obj.binningPeriod == rec.binningPeriod == {'AC': 1000.0}
+    for kw in ({}, {'only_vdif': True}, {'match_ips': ['10.80.200.202']}):
+        osubs = [subband_info(s) for s in obj.get_subbands(**kw)]
+        rsubs = [subband_info(s) for s in rec.get_subbands(**kw)]
+        assert osubs == rsubs
+    assert len(rec.get_subbands(match_ips=['10.80.200.202'])) == 1
+    assert len(rec.get_subbands(match_ips=['10.0.0.1'])) == 0
+
+
+def test_vdif_routing():
+    from evla_mcast import scan_config
+    data = vci_with_vdif()
+    configs = [ScanConfig(vci=vci_stream.parse_vci(data),
+                          obs=_data_dir+'test_obs.xml',
+                          ant=_data_dir+'test_antprop.xml',
+                          requires=['ant', 'vci', 'obs']) for i in range(2)]
+    routing = configs[0].get_routing()
+    assert routing.ips == ['10.80.200.201', '10.80.200.202']
+    assert len(routing.vdif_entries) == 1
+    assert routing.match(['10.80.200.201', '10.80.200.202']) == \
+        routing.vdif_entries
+    assert routing.match(['10.0.0.1']) == []
+    # Same configId and VCI element -> shared index and reused subbands
+    sc = ScanConfig(vci=configs[0].vci, obs=_data_dir+'test_obs.xml',
+                    ant=_data_dir+'test_antprop.xml',
+                    requires=['ant', 'vci', 'obs'])
+    assert sc.get_routing() is routing
+    subs = sc.get_subbands(match_ips=['10.80.200.202'])
+    assert sc.get_subbands(match_ips=['10.80.200.202'])[0] is subs[0]
+    # A new VCI document with the same configId replaces the index
+    assert configs[1].get_routing() is not routing
+    assert scan_config.get_routing(configs[1].vci,
+                                   configs[1]._vci_backend) is \
+        configs[1].get_routing()